@@ -0,0 +1,7 @@
+"""
+Standalone performance benchmarks.
+
+Run from the ``backend`` directory, e.g. ``python -m benchmarks.report_listing``.
+Each benchmark uses a throwaway SQLite database and MEDIA_ROOT so it never
+touches development data.
+"""
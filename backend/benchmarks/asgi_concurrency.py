@@ -0,0 +1,110 @@
+"""
+Benchmark light-request latency next to heavy requests, WSGI against ASGI.
+
+Usage: python -m benchmarks.asgi_concurrency [--rows 200000] [--heavy 2] [--light 4] [--requests 50]
+
+Starts the app once under gunicorn (``config.wsgi``, sync workers as in the
+Procfile) and once under uvicorn (``config.asgi``), each with one worker
+process. ``--heavy`` clients keep downloading a CSV export of a large
+dataset while ``--light`` clients fetch dataset summaries; the table shows
+light-request latency percentiles. Under WSGI a light request waits for
+whichever export holds the worker, under ASGI it is answered in between.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+
+from .common import SERVERS, cleanup, create_dataset, percentile, run_server, setup_django
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url, headers={'Authorization': f'Token {token}'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        while response.read(1 << 16):
+            pass
+
+
+def run(server, args, token, summary_path, export_path):
+    with run_server(server, args.workers) as base:
+        stop = threading.Event()
+        latencies = []
+        heavy_done = []
+
+        def heavy():
+            while not stop.is_set():
+                fetch(base + export_path, token)
+                heavy_done.append(1)
+
+        def light():
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                fetch(base + summary_path, token)
+                latencies.append(time.perf_counter() - start)
+
+        heavy_threads = [threading.Thread(target=heavy, daemon=True) for _ in range(args.heavy)]
+        light_threads = [threading.Thread(target=light) for _ in range(args.light)]
+        for thread in heavy_threads:
+            thread.start()
+        time.sleep(0.5)  # let the exports get going first
+        start = time.perf_counter()
+        for thread in light_threads:
+            thread.start()
+        for thread in light_threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        stop.set()
+        for thread in heavy_threads:
+            thread.join()
+
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'light_per_s': len(latencies) / seconds,
+        'exports': len(heavy_done),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--heavy', type=int, default=2, help='concurrent export clients')
+    parser.add_argument('--light', type=int, default=4, help='concurrent summary clients')
+    parser.add_argument('--requests', type=int, default=50, help='summary requests per light client')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes')
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    workdir = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+
+        user = User.objects.create_user('bench', password='bench-password')
+        token = Token.objects.create(user=user).key
+        big = create_dataset(user, args.rows, filename='big.csv')
+        small = create_dataset(user, 100, filename='small.csv')
+        summary_path = f'/api/datasets/{small.pk}/summary/'
+        export_path = f'/api/datasets/{big.pk}/export/'
+
+        results = {server: run(server, args, token, summary_path, export_path) for server in args.servers}
+    finally:
+        cleanup(workdir)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print(f'{"server":>8} {"p50 ms":>9} {"p95 ms":>9} {"light/s":>9} {"exports":>8}')
+    for server, result in results.items():
+        print(f'{server:>8} {result["p50_ms"]:>9.1f} {result["p95_ms"]:>9.1f} '
+              f'{result["light_per_s"]:>9.1f} {result["exports"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
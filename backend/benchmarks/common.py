@@ -0,0 +1,137 @@
+"""
+Shared setup for benchmarks: an isolated Django environment and app servers.
+"""
+
+import math
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+
+def setup_django(workdir=None):
+    """Configure Django against a scratch SQLite DB and MEDIA_ROOT; returns the work dir."""
+    workdir = workdir or tempfile.mkdtemp(prefix='equipment-bench-')
+    # Environment rather than settings, so spawned worker processes see it too
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.sqlite3")}'
+    os.environ['MEDIA_ROOT'] = os.path.join(workdir, 'media')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.BACKGROUND_TASKS_EAGER = True
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0, interactive=False)
+    return workdir
+
+
+def cleanup(workdir):
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def measure(result, trace_memory=False):
+    """
+    Record wall time (``seconds``) into ``result``.
+
+    With ``trace_memory`` the tracemalloc peak is recorded as ``peak_bytes``
+    too. Tracing slows Python code down several times, so time and memory
+    should come from separate runs.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+        if trace_memory:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+
+def percentile(values, q):
+    """Return the ``q``-th percentile (0-100) of ``values``, nearest-rank."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def create_dataset(user, rows, filename='bench.csv', types=('Pump', 'Valve', 'Reactor', 'Compressor')):
+    """Insert a synthetic row-storage dataset of ``rows`` readings directly."""
+    from equipment.models import Equipment, EquipmentDataset, EquipmentType
+
+    dataset = EquipmentDataset.objects.create(user=user, filename=filename, total_count=rows)
+    type_ids = EquipmentType.objects.resolve(types)
+    batch = []
+    for i in range(rows):
+        batch.append(Equipment(
+            dataset=dataset,
+            name=f'EQ-{i:08d}',
+            equipment_type_id=type_ids[types[i % len(types)]],
+            flowrate=100 + i % 50,
+            pressure=5 + i % 20,
+            temperature=80 + i % 100,
+        ))
+        if len(batch) == 10000:
+            Equipment.objects.bulk_create(batch)
+            batch = []
+    Equipment.objects.bulk_create(batch)
+    return dataset
+
+
+SERVERS = {
+    'wsgi': lambda port, workers: ['gunicorn', 'config.wsgi', '--workers', str(workers),
+                                   '--bind', f'127.0.0.1:{port}', '--timeout', '300'],
+    'asgi': lambda port, workers: ['uvicorn', 'config.asgi:application', '--workers', str(workers),
+                                   '--port', str(port), '--no-access-log'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(kind, workers=1, extra_args=(), env=None, timeout=30):
+    """
+    Serve the app under gunicorn (``wsgi``) or uvicorn (``asgi``) and yield its base URL.
+
+    The server inherits the scratch database and media root set up by
+    ``setup_django``. Login throttling is effectively off, since every
+    benchmark client comes from 127.0.0.1.
+    """
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    server_env = dict(os.environ, DEBUG='False', AUTH_THROTTLE_IP_RATE='100000/s',
+                      AUTH_THROTTLE_USERNAME_RATE='100000/s', **(env or {}))
+    process = subprocess.Popen(SERVERS[kind](port, workers) + list(extra_args), env=server_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{kind} server exited during startup')
+            try:
+                urllib.request.urlopen(base + '/api/datasets/', timeout=5).close()
+                break
+            except urllib.error.HTTPError:
+                break  # Answered (401 without a token), so it is up
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'{kind} server did not start')
+                time.sleep(0.2)
+        yield base
+    finally:
+        process.terminate()
+        process.wait()
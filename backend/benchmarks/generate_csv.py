@@ -0,0 +1,77 @@
+"""
+Generate synthetic equipment CSVs in the upload format.
+
+Usage: python -m benchmarks.generate_csv ROWS OUTPUT [--seed 0]
+
+Columns and equipment types follow ``sample_equipment_data*.csv``. Each
+type draws its readings from its own normal distribution, roughly matching
+the sample files (heaters run hot, coolers cold, tanks have no flow).
+Output is deterministic for a given row count and seed, so benchmark runs
+can be compared, and is written row by row, so 10M-row files need no more
+memory than small ones.
+"""
+
+import argparse
+import csv
+import random
+
+HEADER = ('Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature')
+
+# type: (weight, (mean, stddev) for flowrate, pressure, temperature)
+PROFILES = {
+    'Pump': (3, (140, 25), (5.5, 1.5), (85, 20)),
+    'Valve': (3, (75, 12), (4.2, 0.8), (75, 20)),
+    'Compressor': (2, (230, 60), (8.5, 1.5), (78, 12)),
+    'Reactor': (2, (60, 50), (7.0, 2.0), (165, 20)),
+    'Heat Exchanger': (2, (190, 25), (6.2, 1.0), (100, 15)),
+    'Condenser': (1, (162, 5), (4.5, 0.5), (126, 3)),
+    'Cooler': (1, (92, 4), (3.5, 0.5), (14, 2)),
+    'Distillation Column': (1, (132, 8), (2.2, 0.4), (149, 5)),
+    'Filter': (1, (52, 4), (2.5, 0.3), (41, 2)),
+    'Heater': (1, (80, 3), (5.8, 0.6), (228, 8)),
+    'Mixer': (1, (99, 4), (3.0, 0.4), (37, 2)),
+    'Separator': (1, (169, 4), (5.0, 0.5), (80, 3)),
+    'Tank': (1, (0, 0), (1.2, 0.3), (25, 3)),
+}
+
+
+def iter_rows(rows, seed=0):
+    """Yield ``rows`` synthetic CSV rows (without the header)."""
+    rng = random.Random(seed)
+    types = list(PROFILES)
+    weights = [PROFILES[name][0] for name in types]
+    counters = dict.fromkeys(types, 0)
+    prefixes = {name: name.replace(' ', '') for name in types}
+    for _ in range(rows):
+        name = rng.choices(types, weights)[0]
+        counters[name] += 1
+        _, flowrate, pressure, temperature = PROFILES[name]
+        yield (
+            f'{prefixes[name]}-{counters[name]:03d}',
+            name,
+            round(max(0.0, rng.gauss(*flowrate)), 1),
+            round(max(0.0, rng.gauss(*pressure)), 1),
+            round(rng.gauss(*temperature), 1),
+        )
+
+
+def write_csv(out, rows, seed=0):
+    """Write a header plus ``rows`` synthetic rows to the text file ``out``."""
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(HEADER)
+    writer.writerows(iter_rows(rows, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.output, 'w', newline='') as out:
+        write_csv(out, args.rows, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Load-test the API with concurrent simulated dashboard users.
+
+Usage: python -m benchmarks.load_test [--users 10 20 40] [--duration 30] [--server wsgi]
+                                      [--workers 2] [--threads 1] [--json results.json]
+
+Starts the app under gunicorn (``wsgi``) or uvicorn (``asgi``) against a
+scratch database, then for each ``--users`` level runs that many threads
+for ``--duration`` seconds. Each thread replays a dashboard session: log
+in, then repeatedly list datasets and open one (detail and summary). With
+probability ``--report-rate`` it also downloads the PDF report through a
+signed link, and with ``--upload-rate`` it uploads a generated CSV. Between
+steps it pauses for an exponentially distributed think time with mean
+``--think`` seconds. Sessions log out at the end.
+
+For each level the script prints throughput and, per request type, the
+count, error rate and p50/p95/p99 latency. Stepping up ``--users`` until
+p95 or the error rate degrades shows what one node can serve.
+"""
+
+import argparse
+import io
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+
+from .common import SERVERS, cleanup, create_dataset, percentile, run_server, setup_django
+from .generate_csv import write_csv
+
+PASSWORD = 'load-test-password'
+
+
+class Stats:
+    """Latencies and errors per request type, shared by all sessions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, seconds):
+        requests = {}
+        for name, latencies in sorted(self.latencies.items()):
+            requests[name] = {
+                'count': len(latencies),
+                'error_rate': self.errors[name] / len(latencies),
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            'requests_per_s': total / seconds,
+            'error_rate': sum(self.errors.values()) / total if total else 0,
+            'p95_ms': percentile(everything, 95) * 1000 if everything else 0,
+            'requests': requests,
+        }
+
+
+class Session:
+    """One simulated user talking to the server over HTTP."""
+
+    def __init__(self, base, stats):
+        self.base = base
+        self.stats = stats
+        self.token = None
+
+    def request(self, name, method, path, body=None, content_type=None, authenticated=True):
+        """Send a request, record its latency and return the body (``None`` on error)."""
+        url = path if path.startswith('http') else self.base + path
+        headers = {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        if authenticated and self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                content = response.read()
+            ok = True
+        except OSError:  # Includes HTTPError for 4xx/5xx responses
+            content, ok = None, False
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return content
+
+    def json(self, name, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else None
+        content = self.request(name, method, path, body, 'application/json' if body else None)
+        return json.loads(content) if content else None
+
+    def upload(self, csv_bytes):
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'
+        ).encode() + csv_bytes + f'\r\n--{boundary}--\r\n'.encode()
+        self.request('upload', 'POST', '/api/upload/', body, f'multipart/form-data; boundary={boundary}')
+
+
+def run_session(base, username, stats, args, deadline, seed):
+    rng = random.Random(seed)
+    session = Session(base, stats)
+    login = session.json('login', 'POST', '/api/auth/login/', {'username': username, 'password': PASSWORD})
+    if not login:
+        return
+    session.token = login['token']
+
+    while time.monotonic() < deadline:
+        datasets = session.json('list', 'GET', '/api/datasets/')
+        if datasets:
+            dataset_id = rng.choice(datasets)['id']
+            session.request('detail', 'GET', f'/api/datasets/{dataset_id}/')
+            session.request('summary', 'GET', f'/api/datasets/{dataset_id}/summary/')
+            if rng.random() < args.report_rate:
+                link = session.json('download_url', 'POST', f'/api/datasets/{dataset_id}/download-url/',
+                                    {'resource': 'report'})
+                if link:
+                    # An absolute signed link, as a browser would open it
+                    session.request('report', 'GET', link['url'], authenticated=False)
+        if rng.random() < args.upload_rate:
+            out = io.StringIO()
+            write_csv(out, args.upload_rows, seed=rng.randrange(1 << 30))
+            session.upload(out.getvalue().encode())
+        if args.think:
+            time.sleep(rng.expovariate(1 / args.think))
+
+    session.request('logout', 'POST', '/api/auth/logout/')
+
+
+def run_level(base, usernames, args):
+    stats = Stats()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=run_session, args=(base, username, stats, args, deadline, args.seed + i))
+        for i, username in enumerate(usernames)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary(time.perf_counter() - start)
+
+
+def print_level(users, result):
+    print(f'\n{users} users: {result["requests_per_s"]:.1f} req/s, '
+          f'{result["error_rate"] * 100:.1f}% errors, p95 {result["p95_ms"]:.0f} ms')
+    print(f'{"request":>13} {"count":>7} {"err %":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for name, request in result['requests'].items():
+        print(f'{name:>13} {request["count"]:>7} {request["error_rate"] * 100:>6.1f} '
+              f'{request["p50_ms"]:>8.1f} {request["p95_ms"]:>8.1f} {request["p99_ms"]:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 20, 40],
+                        help='concurrent users, one run per level')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level')
+    parser.add_argument('--server', choices=list(SERVERS), default='wsgi')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--think', type=float, default=0.5, help='mean pause between steps (seconds)')
+    parser.add_argument('--upload-rate', type=float, default=0.02, help='chance of an upload per step')
+    parser.add_argument('--report-rate', type=float, default=0.05, help='chance of a PDF download per step')
+    parser.add_argument('--upload-rows', type=int, default=1000)
+    parser.add_argument('--dataset-rows', type=int, default=500, help='rows of each pre-loaded dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    workdir = setup_django()
+    try:
+        from django.contrib.auth.models import User
+
+        usernames = [f'load-{i}' for i in range(max(args.users))]
+        for username in usernames:
+            user = User.objects.create_user(username, password=PASSWORD)
+            for i in range(2):
+                create_dataset(user, args.dataset_rows, filename=f'{username}-{i}.csv')
+
+        extra_args = ['--threads', str(args.threads)] if args.server == 'wsgi' and args.threads > 1 else []
+        results = {}
+        with run_server(args.server, args.workers, extra_args) as base:
+            for users in args.users:
+                results[users] = run_level(base, usernames[:users], args)
+                print_level(users, results[users])
+    finally:
+        cleanup(workdir)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'levels': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
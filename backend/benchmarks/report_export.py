@@ -0,0 +1,51 @@
+"""
+Benchmark bulk ZIP export of reports, serial against a process pool.
+
+Usage: python -m benchmarks.report_export [--datasets 16] [--rows 2000] [--workers 0 2 4]
+
+Each run starts from an empty report cache, renders full-listing reports
+for every dataset and streams the archive to a file. Rendering is CPU-bound
+Python, so the pool should scale with cores until the single process
+writing the archive becomes the limit.
+"""
+
+import argparse
+import os
+import shutil
+
+from .common import cleanup, create_dataset, measure, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--datasets', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+    args = parser.parse_args()
+
+    workdir = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from equipment import exports, reports
+
+        user = User.objects.create_user('bench', password='bench-password')
+        for i in range(args.datasets):
+            create_dataset(user, args.rows, filename=f'bench-{i}.csv')
+        datasets = list(exports.select_datasets())
+
+        print(f'{"workers":>8} {"seconds":>9} {"ZIP MB":>9} {"reports/s":>10}')
+        for workers in args.workers:
+            shutil.rmtree(reports.report_dir(), ignore_errors=True)
+            path = os.path.join(workdir, f'export-{workers}.zip')
+            result = {}
+            with open(path, 'wb') as out, measure(result):
+                for chunk in exports.stream_report_zip(datasets, reports.LISTING_FULL, workers):
+                    out.write(chunk)
+            print(f'{workers:>8} {result["seconds"]:>9.2f} {os.path.getsize(path) / 2**20:>9.1f} '
+                  f'{len(datasets) / result["seconds"]:>10.1f}')
+    finally:
+        cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark PDF report rendering against dataset size.
+
+Usage: python -m benchmarks.report_listing [--rows 1000 10000 100000]
+
+For each size this renders the preview and full-listing reports and prints
+render time, tracemalloc peak and output size. The preview should cost the
+same at every size. The full listing should scale linearly in time. Its
+peak memory is dominated by the page streams ReportLab keeps until the PDF
+is saved (a few times the compressed file size), not by row or flowable
+objects: only one page-sized table is alive at a time.
+"""
+
+import argparse
+import os
+
+from .common import cleanup, create_dataset, measure, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    workdir = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from equipment import reports
+
+        user = User.objects.create_user('bench', password='bench-password')
+        print(f'{"rows":>8} {"listing":>8} {"seconds":>9} {"peak MB":>9} {"PDF KB":>9} {"rows/s":>9}')
+        for rows in args.rows:
+            dataset = create_dataset(user, rows, filename=f'bench-{rows}.csv')
+            for listing in reports.LISTINGS:
+                # Timed run first, then a traced run for peak memory
+                timing, memory = {}, {}
+                path = os.path.join(workdir, f'report-{rows}-{listing}.pdf')
+                for result, trace_memory in ((timing, False), (memory, True)):
+                    with open(path, 'wb') as out, measure(result, trace_memory=trace_memory):
+                        reports.build_report(dataset, out, listing)
+                listed = rows if listing == reports.LISTING_FULL else min(rows, reports.PREVIEW_ROWS)
+                print(f'{rows:>8} {listing:>8} {timing["seconds"]:>9.2f} '
+                      f'{memory["peak_bytes"] / 2**20:>9.1f} {os.path.getsize(path) / 1024:>9.0f} '
+                      f'{listed / timing["seconds"]:>9.0f}')
+    finally:
+        cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark concurrent uploads and reads on SQLite, with and without the SQLite profile.
+
+Usage: python -m benchmarks.sqlite_concurrency [--writers 4] [--readers 4] [--duration 20]
+                                               [--workers 4] [--upload-rows 200]
+
+For each mode (``default``: SQLite's rollback journal, no busy timeout
+beyond the driver's and deferred transactions; ``profile``:
+``equipment/sqlite.py``) a fresh scratch database is set up and the app is
+started under gunicorn with ``--workers`` processes, so requests contend
+for the database file as on a single-node install. ``--writers`` clients
+keep uploading a generated CSV while ``--readers`` clients keep fetching
+their dataset list and summary, for ``--duration`` seconds. The table shows
+throughput, the share of failed requests (typically "database is locked")
+and p95 latency for uploads and reads.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from .common import cleanup, create_dataset, run_server, setup_django
+from .generate_csv import write_csv
+from .load_test import Session, Stats
+
+MODES = {'default': 'False', 'profile': 'True'}
+
+
+def client(base, token, stats, deadline, step):
+    session = Session(base, stats)
+    session.token = token
+    while time.monotonic() < deadline:
+        step(session)
+
+
+def run_mode(mode, args):
+    """Run one mode in this (fresh) process and return its results."""
+    # Before setup_django, so the migrations and the server workers get the mode too
+    os.environ['SQLITE_PROFILE'] = MODES[mode]
+    workdir = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from rest_framework.authtoken.models import Token
+
+        def token(username):
+            return Token.objects.create(user=User.objects.create_user(username, password='bench-password')).key
+
+        readers = []
+        for i in range(args.readers):
+            key = token(f'reader-{i}')
+            dataset = create_dataset(Token.objects.get(key=key).user, args.dataset_rows)
+            readers.append((key, dataset.pk))
+        writers = [token(f'writer-{i}') for i in range(args.writers)]
+        out = io.StringIO()
+        write_csv(out, args.upload_rows, args.seed)
+        csv_bytes = out.getvalue().encode()
+        connection.close()
+
+        def upload(session):
+            session.upload(csv_bytes)
+
+        def read(dataset_id):
+            def step(session):
+                session.request('read', 'GET', '/api/datasets/')
+                session.request('read', 'GET', f'/api/datasets/{dataset_id}/summary/')
+            return step
+
+        stats = Stats()
+        with run_server('wsgi', args.workers) as base:
+            deadline = time.monotonic() + args.duration
+            threads = [threading.Thread(target=client, args=(base, key, stats, deadline, upload))
+                       for key in writers]
+            threads += [threading.Thread(target=client, args=(base, key, stats, deadline, read(dataset_id)))
+                        for key, dataset_id in readers]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return stats.summary(time.perf_counter() - start)['requests']
+    finally:
+        cleanup(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=4, help='concurrent upload clients')
+    parser.add_argument('--readers', type=int, default=4, help='concurrent list/summary clients')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per mode')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--upload-rows', type=int, default=200)
+    parser.add_argument('--dataset-rows', type=int, default=2000, help='rows of each reader\'s dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    # Settings are read once per process, so each mode sets up Django in a fresh one
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for mode in args.modes:
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(run_mode, (mode, args))
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print(f'{"mode":>8} {"uploads/s":>10} {"err %":>6} {"p95 ms":>8} {"reads/s":>8} {"err %":>6} {"p95 ms":>8}')
+    for mode, result in results.items():
+        row = f'{mode:>8}'
+        for name, width in (('upload', 10), ('read', 8)):
+            request = result.get(name, {'count': 0, 'error_rate': 0, 'p95_ms': 0})
+            per_s = request['count'] * (1 - request['error_rate']) / args.duration
+            row += f' {per_s:>{width}.1f} {request["error_rate"] * 100:>6.1f} {request["p95_ms"]:>8.0f}'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark the API end to end against SQLite and save machine-readable results.
+
+Usage: python -m benchmarks.suite [--rows 1000 10000 100000] [--output results.json]
+                                  [--compare baseline.json]
+
+For each size a synthetic CSV (``benchmarks.generate_csv``) is uploaded,
+then the list, detail, summary and report endpoints are called. Requests
+are built up front and passed straight to the URL-resolved views, so the
+timings cover server-side work only. Every operation is timed over several
+iterations (p50, p99, throughput), then run once more under tracemalloc for
+its peak memory. Reports are removed from the cache before each iteration,
+so they measure rendering.
+
+Results go to a JSON file together with the commit, Python version and
+machine. ``--compare`` prints the p50 change against an earlier file and
+exits with status 1 if anything got slower than ``--tolerance``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from .common import cleanup, measure, percentile, setup_django
+from .generate_csv import write_csv
+
+
+def call(request):
+    """Run a prepared request through its view and consume the response."""
+    from django.urls import resolve
+
+    match = resolve(request.path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+    if response.status_code >= 400:
+        raise RuntimeError(f'{request.method} {request.path} returned {response.status_code}')
+    return response
+
+
+def run_operation(make_request, iterations, before=None):
+    """Time ``iterations`` calls, then trace one more; ``before`` runs untimed each time."""
+    timings = []
+    for _ in range(iterations + 1):
+        if before:
+            before()
+        request = make_request()
+        result = {}
+        with measure(result, trace_memory=len(timings) == iterations):
+            call(request)
+        if len(timings) < iterations:
+            timings.append(result['seconds'])
+    return timings, result['peak_bytes']
+
+
+def summarize(rows, operation, timings, peak_bytes, rows_processed):
+    mean = statistics.mean(timings)
+    return {
+        'rows': rows,
+        'operation': operation,
+        'iterations': len(timings),
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'mean_ms': mean * 1000,
+        'ops_per_s': 1 / mean,
+        'rows_per_s': rows_processed / mean if rows_processed else None,
+        'peak_mb': peak_bytes / 2**20,
+    }
+
+
+def benchmark_size(user, rows, args, workdir):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from equipment import reports
+
+    factory = APIRequestFactory(SERVER_NAME='localhost')
+
+    def authenticated(request):
+        force_authenticate(request, user=user)
+        return request
+
+    path = os.path.join(workdir, f'equipment-{rows}-{args.seed}.csv')
+    with open(path, 'w', newline='') as out:
+        write_csv(out, rows, args.seed)
+
+    def upload_request():
+        with open(path, 'rb') as csv_file:
+            return authenticated(factory.post('/api/upload/', {'file': csv_file}, format='multipart'))
+
+    def get(url):
+        return lambda: authenticated(factory.get(url))
+
+    results = []
+    timings, peak = run_operation(upload_request, args.heavy_repeat)
+    results.append(summarize(rows, 'upload', timings, peak, rows))
+
+    from equipment.models import EquipmentDataset
+    dataset = EquipmentDataset.objects.filter(user=user).latest('uploaded_at')
+
+    operations = [
+        ('list', get('/api/datasets/'), args.repeat, None, None),
+        ('summary', get(f'/api/datasets/{dataset.pk}/summary/'), args.repeat, None, None),
+    ]
+    if rows <= args.detail_max_rows:
+        operations.append(('detail', get(f'/api/datasets/{dataset.pk}/'), args.repeat, None, rows))
+
+    def clear_reports():
+        reports.delete_reports(dataset.pk)
+
+    operations.append(('report', get(f'/api/datasets/{dataset.pk}/report/'),
+                       args.heavy_repeat, clear_reports, min(rows, reports.PREVIEW_ROWS)))
+    if rows <= args.full_report_max_rows:
+        operations.append(('report_full', get(f'/api/datasets/{dataset.pk}/report/?listing=full'),
+                           args.heavy_repeat, clear_reports, rows))
+
+    for operation, make_request, iterations, before, rows_processed in operations:
+        timings, peak = run_operation(make_request, iterations, before)
+        results.append(summarize(rows, operation, timings, peak, rows_processed))
+    os.unlink(path)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p50 changes against a baseline file; return True if any regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r['rows'], r['operation']): r for r in json.load(f)['results']}
+
+    regressed = False
+    print(f'\n{"rows":>9} {"operation":>12} {"base p50":>10} {"p50":>10} {"change":>8}')
+    for result in results:
+        before = baseline.get((result['rows'], result['operation']))
+        if before is None:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms']
+        flag = ' REGRESSION' if ratio > tolerance else ''
+        regressed = regressed or bool(flag)
+        print(f'{result["rows"]:>9} {result["operation"]:>12} {before["p50_ms"]:>10.1f} '
+              f'{result["p50_ms"]:>10.1f} {ratio:>7.2f}x{flag}')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20, help='iterations of light requests')
+    parser.add_argument('--heavy-repeat', type=int, default=3, help='iterations of uploads and reports')
+    parser.add_argument('--detail-max-rows', type=int, default=100000,
+                        help='skip the detail endpoint (every row as JSON) above this size')
+    parser.add_argument('--full-report-max-rows', type=int, default=100000,
+                        help='skip the full-listing report above this size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='p50 ratio above which --compare reports a regression')
+    args = parser.parse_args()
+
+    workdir = setup_django()
+    try:
+        from django.conf import settings
+        from django.contrib.auth.models import User
+
+        # DEBUG keeps every query in memory, which would skew the memory figures
+        settings.DEBUG = False
+        user = User.objects.create_user('bench', password='bench-password')
+
+        results = []
+        print(f'{"rows":>9} {"operation":>12} {"p50 ms":>10} {"p99 ms":>10} {"ops/s":>8} '
+              f'{"rows/s":>10} {"peak MB":>8}')
+        for rows in args.rows:
+            for result in benchmark_size(user, rows, args, workdir):
+                results.append(result)
+                rows_per_s = f'{result["rows_per_s"]:>10.0f}' if result['rows_per_s'] else f'{"-":>10}'
+                print(f'{rows:>9} {result["operation"]:>12} {result["p50_ms"]:>10.1f} '
+                      f'{result["p99_ms"]:>10.1f} {result["ops_per_s"]:>8.1f} {rows_per_s} '
+                      f'{result["peak_mb"]:>8.1f}')
+        storage_backend = settings.EQUIPMENT_STORAGE_BACKEND
+    finally:
+        cleanup(workdir)
+
+    document = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'storage_backend': storage_backend,
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
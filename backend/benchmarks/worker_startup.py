@@ -0,0 +1,60 @@
+"""
+Benchmark worker cold start: import time and resident memory.
+
+Usage: python -m benchmarks.worker_startup [--runs 5]
+
+Each run is a fresh interpreter that sets up Django and imports the WSGI
+application and URLconf, as a gunicorn worker does (or the master, with
+``--preload``). ``lazy`` is the app as shipped; ``eager`` also imports the
+libraries that are now loaded on first use, i.e. what every worker paid
+before.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROGRAM = '''
+import resource, time
+start = time.perf_counter()
+import django
+django.setup()
+import config.wsgi, config.urls
+{extra}
+seconds = time.perf_counter() - start
+print(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+EAGER = 'import pandas, numpy, reportlab.platypus, reportlab.graphics.charts.barcharts'
+
+
+def run(extra):
+    result = subprocess.run(
+        [sys.executable, '-c', PROGRAM.format(extra=extra)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings'),
+    )
+    seconds, max_rss_kb = result.stdout.split()
+    return float(seconds), int(max_rss_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"mode":>8} {"median ms":>10} {"min ms":>8} {"RSS MB":>8}')
+    for mode, extra in (('lazy', ''), ('eager', EAGER)):
+        samples = [run(extra) for _ in range(args.runs)]
+        seconds = [sample[0] for sample in samples]
+        rss = statistics.median(sample[1] for sample in samples)
+        print(f'{mode:>8} {statistics.median(seconds) * 1000:>10.0f} {min(seconds) * 1000:>8.0f} {rss:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+ASGI config for the project.
+
+Serves the async variants of the light endpoints and runs blocking views in
+worker threads (see ``equipment.async_views``), so one process keeps
+answering light requests while uploads and reports are being processed.
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+application = get_asgi_application()
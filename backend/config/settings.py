@@ -3,8 +3,10 @@ Django settings for Chemical Equipment Parameter Visualizer.
 """
 
 from pathlib import Path
+from urllib.parse import urlparse
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'equipment.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -74,6 +77,49 @@ else:
         }
     }
 
+# Optional read replica (DATABASE_REPLICA_URL) for the safe dataset endpoints,
+# see equipment/replicas.py. Users who just uploaded or deleted a dataset keep
+# reading from the primary for DATABASE_REPLICA_STICKY_SECONDS.
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.config(env='DATABASE_REPLICA_URL', conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['equipment.replicas.ReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '30'))
+
+# Connection pooling (see equipment/dbpool.py): with DATABASE_POOL_MAX_SIZE > 0
+# each process shares at most that many connections per database between its
+# threads, instead of holding one per thread. Checkouts wait up to
+# DATABASE_POOL_TIMEOUT seconds; connections idle for DATABASE_POOL_CHECK_AFTER
+# seconds are health-checked first and replaced after DATABASE_POOL_MAX_LIFETIME.
+# SQLite databases get a pooled SQLite stand-in, for local runs and tests.
+DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', '0'))
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'equipment.pooled_postgresql',
+    'django.db.backends.sqlite3': 'equipment.pooled_sqlite',
+}
+if DATABASE_POOL_MAX_SIZE:
+    for database in DATABASES.values():
+        database['ENGINE'] = POOLED_ENGINES.get(database['ENGINE'], database['ENGINE'])
+        # Connections go back to the pool at the end of each request
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'max_size': DATABASE_POOL_MAX_SIZE,
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+            'check_after': float(os.getenv('DATABASE_POOL_CHECK_AFTER', '30')),
+            'max_lifetime': float(os.getenv('DATABASE_POOL_MAX_LIFETIME', '3600')),
+        }
+
+# SQLite profile applied to every SQLite connection (see equipment/sqlite.py):
+# WAL journal, SQLITE_SYNCHRONOUS (NORMAL is safe with WAL), memory-mapped
+# reads, a SQLITE_CACHE_SIZE_KB page cache, waiting SQLITE_BUSY_TIMEOUT_MS for
+# locks and write transactions that take the write lock as they begin.
+# SQLITE_PROFILE=False keeps SQLite's defaults.
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'True').lower() in ('true', '1', 'yes')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -102,17 +148,143 @@ CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if os.ge
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'equipment.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app. Throttles key clients on REMOTE_ADDR
+    # with 0; behind N proxies, on the Nth X-Forwarded-For entry from the right
+    # (the one the outermost proxy recorded). Entries left of it are forgeable.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+}
+
+# Django cache shared by every worker process, from CACHE_URL: redis://,
+# memcached://host:port, file:///path (processes on one machine), db://table
+# (run createcachetable) or locmem:// (this process only). The token cache,
+# login throttles and read-replica pins need a shared cache: with locmem://
+# tokens are only cached per process, throttles count per process and a
+# read replica is refused.
+CACHE_URL = os.getenv('CACHE_URL', f'file://{BASE_DIR / ".cache"}')
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
 }
+_cache_url = urlparse(CACHE_URL)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[_cache_url.scheme],
+        'LOCATION': {
+            'redis': CACHE_URL, 'rediss': CACHE_URL, 'file': _cache_url.path,
+        }.get(_cache_url.scheme, _cache_url.netloc),
+    }
+}
+CACHE_SHARED = _cache_url.scheme != 'locmem'
+if 'replica' in DATABASES and not CACHE_SHARED:
+    # Pins set by one worker would not be seen by the others
+    raise ImproperlyConfigured('DATABASE_REPLICA_URL needs a shared CACHE_URL, not locmem://')
+
+# Token lookups are cached per process for AUTH_TOKEN_LOCAL_TTL seconds (keep
+# it short: other processes see logouts only after it) and, when CACHE_SHARED,
+# in the Django cache for AUTH_TOKEN_CACHE_TTL seconds. AUTH_TOKEN_EXPIRY > 0
+# expires tokens that many seconds after login.
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_TTL', '5'))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_SIZE', '1024'))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
+AUTH_TOKEN_EXPIRY = int(os.getenv('AUTH_TOKEN_EXPIRY', '0'))
+
+# Login/registration admission control: token buckets per client IP and per
+# username ('<n>/<s|min|hour|day>', kept in the Django cache or, for a single
+# worker process only, 'local' process memory), and at most
+# AUTH_HASH_CONCURRENCY password hashes across the processes sharing the
+# cache (exact with redis/memcached, best-effort with file/db), waiting up
+# to AUTH_HASH_WAIT seconds for a slot before a 503
+AUTH_THROTTLE_BACKEND = os.getenv('AUTH_THROTTLE_BACKEND', 'cache')
+AUTH_THROTTLE_IP_RATE = os.getenv('AUTH_THROTTLE_IP_RATE', '20/min')
+AUTH_THROTTLE_USERNAME_RATE = os.getenv('AUTH_THROTTLE_USERNAME_RATE', '10/min')
+AUTH_HASH_CONCURRENCY = int(os.getenv('AUTH_HASH_CONCURRENCY', '2'))
+AUTH_HASH_WAIT = float(os.getenv('AUTH_HASH_WAIT', '2'))
+
+# Lifetime in seconds of signed report/export download links
+DOWNLOAD_URL_MAX_AGE = int(os.getenv('DOWNLOAD_URL_MAX_AGE', '300'))
+
+# Request profiling: Server-Timing headers on a sampled fraction of requests
+# (0-1) and a warning log for requests slower than PROFILING_SLOW_MS (0 = off).
+# With both at 0 the middleware is skipped entirely
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', '0'))
+
+# Metrics at /api/metrics/. With METRICS_DIR each process writes its values
+# there (at most every METRICS_FLUSH_INTERVAL seconds) and the endpoint sums
+# all processes; clear the directory when the server starts
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+
+# Query budgets declared per endpoint in equipment/urls.py: 'raise' or 'log'
+# when a view goes over its budget, 'off' to skip the checks
+QUERY_BUDGETS = os.getenv('QUERY_BUDGETS', 'raise' if DEBUG else 'off')
+
+# Set by config.asgi: serve async views and run blocking views on
+# ASGI_BLOCKING_WORKERS threads (0 = Django's single shared sync thread)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes')
+ASGI_BLOCKING_WORKERS = int(os.getenv('ASGI_BLOCKING_WORKERS', '4'))
+
+# Number of most recent datasets kept per user; older uploads are purged
+DATASET_RETENTION_LIMIT = int(os.getenv('DATASET_RETENTION_LIMIT', '5'))
+
+# Deleted datasets are hidden at once and their rows purged in batches of this size
+DATASET_PURGE_BATCH_SIZE = int(os.getenv('DATASET_PURGE_BATCH_SIZE', '5000'))
+
+# In-process background task pool (purges and other deferred work)
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', '2'))
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', 'False').lower() in ('true', '1', 'yes')
+
+# Per-user storage quotas (0 = unlimited). Uploads are parsed in chunks of
+# UPLOAD_PARSE_CHUNK_ROWS so oversized files are rejected before any insert.
+QUOTA_MAX_ROWS = int(os.getenv('QUOTA_MAX_ROWS', '0'))
+QUOTA_MAX_BYTES = int(os.getenv('QUOTA_MAX_BYTES', '0'))
+UPLOAD_PARSE_CHUNK_ROWS = int(os.getenv('UPLOAD_PARSE_CHUNK_ROWS', '50000'))
+
+# Storage backend for new uploads: 'rows' (one DB row per reading) or
+# 'columnar' (memory-mapped NumPy column files under MEDIA_ROOT)
+EQUIPMENT_STORAGE_BACKEND = os.getenv('EQUIPMENT_STORAGE_BACKEND', 'rows')
+COLUMNAR_FLOAT_DTYPE = os.getenv('COLUMNAR_FLOAT_DTYPE', 'float64')
+
+# Rendered PDF reports are cached under MEDIA_ROOT/reports. When Django sits
+# behind nginx, set this to an internal location aliased to that directory
+# (e.g. '/protected/reports/') to have nginx send the file via X-Accel-Redirect.
+REPORT_X_ACCEL_REDIRECT_PREFIX = os.getenv('REPORT_X_ACCEL_REDIRECT_PREFIX', '')
+
+# Full-listing reports (?listing=full) stream rows from storage in chunks of
+# REPORT_LISTING_CHUNK_ROWS into tables of REPORT_LISTING_ROWS_PER_TABLE rows
+REPORT_LISTING_ROWS_PER_TABLE = int(os.getenv('REPORT_LISTING_ROWS_PER_TABLE', '40'))
+REPORT_LISTING_CHUNK_ROWS = int(os.getenv('REPORT_LISTING_CHUNK_ROWS', '2000'))
+
+# A report request joins a pending or running job for the same dataset and
+# listing queued within the last REPORT_JOB_REUSE_SECONDS instead of queuing
+# another render; older ones are presumed lost with their worker
+REPORT_JOB_REUSE_SECONDS = int(os.getenv('REPORT_JOB_REUSE_SECONDS', '300'))
+
+# Chart drawings kept per process, and how long rendered PNG/SVG bytes stay
+# in the Django cache
+CHART_DRAWING_CACHE_SIZE = int(os.getenv('CHART_DRAWING_CACHE_SIZE', '256'))
+CHART_RENDER_CACHE_TIMEOUT = int(os.getenv('CHART_RENDER_CACHE_TIMEOUT', '86400'))
+
+# Rows fetched from storage and encoded per chunk by /datasets/<id>/export/
+DATASET_EXPORT_CHUNK_ROWS = int(os.getenv('DATASET_EXPORT_CHUNK_ROWS', '5000'))
+
+# Worker processes rendering reports for bulk ZIP exports (0 = render in the
+# requesting process)
+REPORT_EXPORT_WORKERS = int(os.getenv('REPORT_EXPORT_WORKERS', str(os.cpu_count() or 1)))
 
 # Media files (uploads)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', str(BASE_DIR / 'media'))
 
 # Static files with WhiteNoise
 STATIC_ROOT = BASE_DIR / 'staticfiles'
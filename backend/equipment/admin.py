@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import EquipmentDataset, Equipment
+from .models import EquipmentDataset, Equipment, EquipmentType, StorageUsage
+from .retention import delete_datasets
 
 
 @admin.register(EquipmentDataset)
@@ -9,10 +10,31 @@ class EquipmentDatasetAdmin(admin.ModelAdmin):
     list_filter = ['uploaded_at', 'user']
     search_fields = ['filename']
     readonly_fields = ['uploaded_at']
+    
+    # Deletes go through retention like the API's, so quotas are released,
+    # the dataset is hidden straight away and its rows and files are purged
+    def delete_model(self, request, obj):
+        delete_datasets([obj.pk])
+    
+    def delete_queryset(self, request, queryset):
+        delete_datasets(queryset.values_list('pk', flat=True))
 
 
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ['name', 'equipment_type', 'flowrate', 'pressure', 'temperature', 'dataset']
     list_filter = ['equipment_type', 'dataset']
-    search_fields = ['name', 'equipment_type']
+    search_fields = ['name', 'equipment_type__name']
+    list_select_related = ['equipment_type', 'dataset']
+
+
+@admin.register(EquipmentType)
+class EquipmentTypeAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+
+
+@admin.register(StorageUsage)
+class StorageUsageAdmin(admin.ModelAdmin):
+    list_display = ['user', 'row_count', 'byte_count']
+    search_fields = ['user__username']
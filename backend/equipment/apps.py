@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
+
+    def ready(self):
+        # Connects the token cache invalidation, query profiling, query
+        # budget and SQLite profile signal handlers
+        from . import authentication, profiling, querybudget, sqlite  # noqa: F401
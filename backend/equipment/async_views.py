@@ -0,0 +1,231 @@
+"""
+Async views for ASGI deployments (``config.asgi``, ``ASYNC_VIEWS``).
+
+DRF views are synchronous, and under ASGI Django runs every sync view and
+every async ORM call on one shared thread per process, so a single upload
+or report render would stall all other requests. Instead:
+
+* login, dataset list, detail and summary are plain async views using the
+  async ORM, answering JSON in the same shape as their DRF counterparts;
+* blocking work (password hashing, pandas parsing, ReportLab rendering,
+  large serializations) and the remaining DRF views run on a pool of
+  ``ASGI_BLOCKING_WORKERS`` threads, off the event loop and off the shared
+  thread. Streaming responses from those views are consumed in a thread of
+  their own, so exports still stream instead of being buffered.
+
+With ``ASGI_BLOCKING_WORKERS = 0`` blocking work runs through Django's
+shared sync thread instead, which is what the test suite uses.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import close_old_connections, connections
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+
+from . import metrics, views
+from .authentication import CachedTokenAuthentication, get_token
+from .models import EquipmentDataset
+from .serializers import (
+    UserSerializer,
+    EquipmentDatasetListSerializer,
+    EquipmentDatasetDetailSerializer,
+    DatasetSummarySerializer,
+)
+from .storage import get_statistics
+from .throttling import AuthIPThrottle, AuthUsernameThrottle, password_hashing_slot
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASGI_BLOCKING_WORKERS,
+                                           thread_name_prefix='asgi-blocking')
+        return _executor
+
+
+def _with_connections(func, *args, **kwargs):
+    # Worker threads are not covered by Django's per-request connection cleanup
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run blocking ``func`` on the worker pool and await its result."""
+    if not settings.ASGI_BLOCKING_WORKERS:
+        return await sync_to_async(func)(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # Carry context variables (the request's profile) over like sync_to_async does
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(context.run, _with_connections, func, *args, **kwargs)
+    )
+
+
+async def _iterate_in_thread(iterator):
+    """Drive a blocking iterator from one dedicated thread, chunk by chunk."""
+    if not settings.ASGI_BLOCKING_WORKERS:
+        step = sync_to_async(next)
+        while (chunk := await step(iterator, None)) is not None:
+            yield chunk
+        return
+
+    # A single thread keeps any database cursor on the connection it was opened on
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='asgi-stream')
+    loop = asyncio.get_running_loop()
+    try:
+        while (chunk := await loop.run_in_executor(executor, next, iterator, None)) is not None:
+            yield chunk
+    finally:
+        await loop.run_in_executor(executor, connections.close_all)
+        executor.shutdown(wait=False)
+
+
+def offload(view):
+    """Wrap a sync view so it runs on the worker pool instead of the event loop."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await run_blocking(view, request, *args, **kwargs)
+        if response.streaming and not response.is_async:
+            response.streaming_content = _iterate_in_thread(iter(response.streaming_content))
+        return response
+    return wrapper
+
+
+_token_auth = CachedTokenAuthentication()
+
+
+def _error(message, status_code, key='error', headers=None):
+    return JsonResponse({key: message}, status=status_code, headers=headers)
+
+
+async def _authenticate(request):
+    """Return ``(user, None)`` for a valid ``Authorization: Token`` header, else ``(None, response)``."""
+    try:
+        result = await sync_to_async(_token_auth.authenticate)(request)
+    except exceptions.AuthenticationFailed as e:
+        result, detail = None, e.detail
+    else:
+        detail = exceptions.NotAuthenticated.default_detail
+    if result is None:
+        return None, _error(str(detail), status.HTTP_401_UNAUTHORIZED, key='detail',
+                            headers={'WWW-Authenticate': 'Token'})
+    # As DRF does, so code further down (replica routing) sees the user
+    request.user = result[0]
+    return result[0], None
+
+
+def _login(username, password):
+    with password_hashing_slot():
+        user = authenticate(username=username, password=password)
+    return user, (get_token(user) if user else None)
+
+
+async def login_view(request):
+    """Async variant of ``views.login_view``."""
+    if request.method != 'POST':
+        return _error(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED, key='detail')
+
+    drf_request = Request(request, parsers=[JSONParser(), FormParser(), MultiPartParser()])
+    for throttle in (AuthIPThrottle(), AuthUsernameThrottle()):
+        if not await sync_to_async(throttle.allow_request)(drf_request, None):
+            throttled = exceptions.Throttled(throttle.wait())
+            return _error(str(throttled.detail), throttled.status_code, key='detail',
+                          headers={'Retry-After': str(throttled.wait)})
+
+    username = drf_request.data.get('username')
+    password = drf_request.data.get('password')
+    if not username or not password:
+        return _error('Please provide both username and password', status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user, token = await run_blocking(_login, username, password)
+    except exceptions.APIException as e:
+        return _error(str(e.detail), e.status_code, key='detail')
+    if not user:
+        return _error('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+    return JsonResponse({'user': UserSerializer(user).data, 'token': token.key})
+
+
+# Token API without sessions, exempt from CSRF like the DRF views
+login_view.csrf_exempt = True
+
+
+async def dataset_list(request):
+    """Async variant of ``views.DatasetListView``."""
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    datasets = [
+        dataset async for dataset in
+        EquipmentDataset.objects.filter(user=user)[:settings.DATASET_RETENTION_LIMIT]
+    ]
+    return JsonResponse(EquipmentDatasetListSerializer(datasets, many=True).data, safe=False)
+
+
+_sync_dataset_detail = views.DatasetDetailView.as_view()
+
+
+async def dataset_detail(request, pk):
+    """Async variant of ``views.DatasetDetailView`` for GET; other methods use the DRF view."""
+    if request.method != 'GET':
+        return await run_blocking(_sync_dataset_detail, request, pk=pk)
+
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    try:
+        dataset = await EquipmentDataset.objects.aget(pk=pk, user=user)
+    except EquipmentDataset.DoesNotExist:
+        return _error('Not found.', status.HTTP_404_NOT_FOUND, key='detail')
+    # Reads every item from storage and encodes it: keep it off the event loop
+    return await run_blocking(lambda: JsonResponse(EquipmentDatasetDetailSerializer(dataset).data))
+
+
+dataset_detail.csrf_exempt = True
+
+
+async def dataset_summary(request, pk):
+    """Async variant of ``views.DatasetSummaryView``."""
+    with metrics.SUMMARY_SECONDS.time():
+        return await _dataset_summary(request, pk)
+
+
+async def _dataset_summary(request, pk):
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    try:
+        dataset = await EquipmentDataset.objects.aget(pk=pk, user=user)
+    except EquipmentDataset.DoesNotExist:
+        return _error('Dataset not found', status.HTTP_404_NOT_FOUND)
+
+    stats = dataset.statistics
+    if stats is None:
+        stats = await run_blocking(get_statistics, dataset)
+    summary = {
+        'total_count': dataset.total_count,
+        'avg_flowrate': dataset.avg_flowrate,
+        'avg_pressure': dataset.avg_pressure,
+        'avg_temperature': dataset.avg_temperature,
+        'type_distribution': stats['type_distribution'],
+        'min_values': stats['min_values'],
+        'max_values': stats['max_values']
+    }
+    return JsonResponse(DatasetSummarySerializer(summary).data)
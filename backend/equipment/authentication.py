@@ -0,0 +1,151 @@
+"""
+Token authentication with a two-level cache.
+
+DRF's ``TokenAuthentication`` joins ``Token`` and ``User`` on every request.
+``CachedTokenAuthentication`` keeps the resolved user in a small in-process
+LRU (``AUTH_TOKEN_LOCAL_TTL`` seconds) backed by the shared Django cache
+(``AUTH_TOKEN_CACHE_TTL`` seconds), so most requests authenticate without a
+query. Deleting or replacing a token and saving its user drop the shared
+entry at once; other processes may keep their local copy for up to
+``AUTH_TOKEN_LOCAL_TTL`` seconds, so keep that short. Without a shared cache
+(``CACHE_SHARED`` off) only the local LRU is used, since revocations could
+not reach the other processes.
+
+Entries hold the user's id, flags and token creation time, never the user
+row itself (which carries the password hash). Requests get a user instance
+with those fields loaded and the rest deferred.
+
+With ``AUTH_TOKEN_EXPIRY`` set, tokens older than that many seconds are
+rejected and deleted, and login hands out a new one.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from . import metrics
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _cache_key(key):
+    return f'auth-token:{key}'
+
+
+def token_expired(created):
+    expiry = settings.AUTH_TOKEN_EXPIRY
+    return bool(expiry) and created < timezone.now() - timedelta(seconds=expiry)
+
+
+def get_token(user):
+    """Return the user's token, replacing it first if it has expired."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expired(token.created):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def invalidate(key):
+    """Forget a token in this process and in the shared cache."""
+    with _local_lock:
+        _local.pop(key, None)
+    if settings.CACHE_SHARED:
+        cache.delete(_cache_key(key))
+
+
+def clear_local():
+    with _local_lock:
+        _local.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that caches the token-to-user lookup."""
+
+    def authenticate_credentials(self, key):
+        entry = self._get_local(key)
+        metrics.cache_result('auth_token_local', entry is not None)
+        if entry is None:
+            if settings.CACHE_SHARED:
+                entry = cache.get(_cache_key(key))
+                metrics.cache_result('auth_token_shared', entry is not None)
+            if entry is None:
+                entry = self._load(key)
+                if settings.CACHE_SHARED:
+                    cache.set(_cache_key(key), entry, settings.AUTH_TOKEN_CACHE_TTL)
+            self._set_local(key, entry)
+
+        if not entry['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if token_expired(entry['created']):
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        # The remaining fields load from the database if a view reads them
+        user = get_user_model().from_db('default', USER_FIELDS, [entry[field] for field in USER_FIELDS])
+        return (user, key)
+
+    def _load(self, key):
+        user_fields = [f'user__{field}' for field in USER_FIELDS]
+        try:
+            token = Token.objects.select_related('user').only('created', *user_fields).get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        entry = {field: getattr(token.user, field) for field in USER_FIELDS}
+        entry['created'] = token.created
+        return entry
+
+    def _get_local(self, key):
+        with _local_lock:
+            item = _local.get(key)
+            if item is None:
+                return None
+            entry, stored_at = item
+            if time.monotonic() - stored_at > settings.AUTH_TOKEN_LOCAL_TTL:
+                del _local[key]
+                return None
+            _local.move_to_end(key)
+            return entry
+
+    def _set_local(self, key, entry):
+        with _local_lock:
+            _local[key] = (entry, time.monotonic())
+            _local.move_to_end(key)
+            while len(_local) > settings.AUTH_TOKEN_LOCAL_CACHE_SIZE:
+                _local.popitem(last=False)
+
+
+def _invalidate_with_commit(key):
+    # Again after commit, in case a request re-cached the old row meanwhile
+    invalidate(key)
+    transaction.on_commit(lambda: invalidate(key))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def _token_changed(sender, instance, **kwargs):
+    _invalidate_with_commit(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    # Deactivation, permission and profile changes must not be served stale
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        _invalidate_with_commit(key)
@@ -0,0 +1,92 @@
+"""
+Server-side charts built with ``reportlab.graphics``.
+
+Charts are vector ``Drawing`` objects built from a dataset's stored
+statistics, so they never touch equipment rows. Datasets do not change
+after upload, so drawings are kept in a small in-process LRU and reused by
+every report variant. Rendered PNG/SVG bytes go into the Django cache for
+the chart endpoints. The ReportLab code lives in ``drawings`` and
+``renderSVG``/``renderPM``, all imported on first use. PNG output needs the
+optional ``rlPyCairo`` package; without it PNG requests get 501.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .storage import get_statistics
+
+# Bump when chart layout changes so cached renderings are not reused
+CHART_VERSION = 1
+
+FORMATS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+
+
+class ChartRenderError(Exception):
+    """Raised when a chart cannot be rendered in the requested format."""
+
+
+# Built by ``drawings.BUILDERS``
+CHARTS = ('types', 'averages', 'minmax')
+
+_drawings = OrderedDict()
+_drawings_lock = threading.Lock()
+
+
+def get_drawing(dataset, name):
+    """Return the (cached) ``Drawing`` for chart ``name`` of ``dataset``."""
+    key = (dataset.pk, name, CHART_VERSION)
+    with _drawings_lock:
+        if key in _drawings:
+            _drawings.move_to_end(key)
+            return _drawings[key]
+
+    from . import drawings
+    drawing = drawings.BUILDERS[name](dataset, get_statistics(dataset))
+
+    with _drawings_lock:
+        _drawings[key] = drawing
+        while len(_drawings) > settings.CHART_DRAWING_CACHE_SIZE:
+            _drawings.popitem(last=False)
+    return drawing
+
+
+def render_chart(dataset, name, fmt):
+    """Return chart ``name`` of ``dataset`` rendered as ``fmt`` bytes (cached)."""
+    key = f'equipment-chart:{dataset.pk}:{name}:{fmt}:v{CHART_VERSION}'
+    content = cache.get(key)
+    metrics.cache_result('chart', content is not None)
+    if content is not None:
+        return content
+
+    drawing = get_drawing(dataset, name)
+    if fmt == 'svg':
+        from reportlab.graphics import renderSVG
+        content = renderSVG.drawToString(drawing).encode('utf-8')
+    else:
+        from reportlab.graphics import renderPM
+        from reportlab.graphics.utils import RenderPMError
+        try:
+            content = renderPM.drawToString(drawing, fmt='PNG', dpi=144)
+        except RenderPMError as e:
+            raise ChartRenderError('PNG rendering requires the optional rlPyCairo package') from e
+
+    cache.set(key, content, settings.CHART_RENDER_CACHE_TIMEOUT)
+    return content
+
+
+def delete_charts(dataset_id):
+    """Drop cached drawings and renderings for a dataset."""
+    with _drawings_lock:
+        for key in [key for key in _drawings if key[0] == dataset_id]:
+            del _drawings[key]
+    cache.delete_many([
+        f'equipment-chart:{dataset_id}:{name}:{fmt}:v{CHART_VERSION}'
+        for name in CHARTS for fmt in FORMATS
+    ])
@@ -0,0 +1,192 @@
+"""
+Database connection pools for Django 4.2.
+
+Django 4.2 has no connection pool (one arrives with Django 5.1 and psycopg
+3), so with ``CONN_MAX_AGE`` every thread of every worker holds a
+connection of its own, and a connection idle past the server's timeout
+fails on its next use. With ``DATABASE_POOL_MAX_SIZE`` set, settings switch
+each database to a pooled engine instead: ``equipment.pooled_postgresql``
+in production, and ``equipment.pooled_sqlite`` as a stand-in for local runs
+and tests. Both keep one ``ConnectionPool`` per database alias and process:
+
+* Django's connect takes a connection from the pool and its close hands it
+  back, rolled back. With ``CONN_MAX_AGE = 0`` a thread only holds one for
+  the length of a request, so threads share at most ``max_size``;
+* a checkout waits up to ``timeout`` seconds for a free connection, then
+  fails with ``PoolTimeout``;
+* connections idle for more than ``check_after`` seconds are health-checked
+  with ``SELECT 1`` on checkout. Broken ones, and those older than
+  ``max_lifetime``, are replaced by a fresh connection.
+
+Options live in ``DATABASES[alias]['OPTIONS']['pool']`` (``max_size``,
+``timeout``, ``check_after``, ``max_lifetime``), the key Django 5.1 uses.
+Opened and closed connections, checkouts, waits and failed health checks
+are recorded in ``equipment.metrics``. Pools are per process: with several
+gunicorn workers the server holds up to workers x ``max_size`` connections;
+put PgBouncer in front of PostgreSQL to cap that across processes.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+from . import metrics
+
+DEFAULTS = {'max_size': 4, 'timeout': 10.0, 'check_after': 30.0, 'max_lifetime': 3600.0}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """No pooled connection became free within the pool's ``timeout``."""
+
+
+class ConnectionPool:
+    """At most ``max_size`` DB-API connections to one database, shared between threads."""
+
+    def __init__(self, alias, max_size, timeout, check_after, max_lifetime):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        self.opened = {}  # connection: opened at
+        self._opening = 0
+        self._idle = deque()  # (connection, returned at), most recently returned last
+        self._lock = threading.Condition()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self.opened) + self._opening, 'idle': len(self._idle),
+                    'max_size': self.max_size}
+
+    def getconn(self, connect):
+        """Check out a connection, opening one with ``connect`` if none is idle and the pool is not full."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self._lock:
+                while not self._idle and len(self.opened) + self._opening >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.DB_POOL_CHECKOUTS.inc(alias=self.alias, result='timeout')
+                        raise PoolTimeout(
+                            f'No connection to database {self.alias!r} became free within '
+                            f'{self.timeout:g}s ({self.max_size} in use)'
+                        )
+                    self._lock.wait(remaining)
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                else:
+                    connection = None
+                    self._opening += 1  # Hold the slot while connecting
+            if connection is None:
+                connection = self._open(connect)
+                break
+            if self._healthy(connection, returned_at):
+                break
+            self._discard(connection)
+
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.monotonic() - start, alias=self.alias)
+        metrics.DB_POOL_CHECKOUTS.inc(alias=self.alias, result='ok')
+        return connection
+
+    def putconn(self, connection, discard=False):
+        """Hand a checked-out connection back, or close it for good with ``discard``."""
+        if connection not in self.opened:
+            connection.close()  # Checked out of a pool that has since been replaced
+            return
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        if discard or time.monotonic() - self.opened[connection] > self.max_lifetime:
+            self._discard(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._opening -= 1
+            self.opened[connection] = time.monotonic()
+        metrics.DB_POOL_CONNECTIONS.inc(alias=self.alias, event='opened')
+        return connection
+
+    def _healthy(self, connection, returned_at):
+        now = time.monotonic()
+        if now - self.opened[connection] > self.max_lifetime:
+            return False
+        if now - returned_at < self.check_after:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            connection.rollback()
+        except Exception:
+            metrics.DB_POOL_HEALTH_CHECK_FAILURES.inc(alias=self.alias)
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._lock:
+            del self.opened[connection]
+            self._lock.notify()
+        metrics.DB_POOL_CONNECTIONS.inc(alias=self.alias, event='closed')
+        try:
+            connection.close()
+        except Exception:
+            pass  # Already broken
+
+
+def get_pool(wrapper):
+    """Return this process's pool for ``wrapper``'s database."""
+    # The test runner renames databases under the same alias
+    key = (wrapper.alias, wrapper.settings_dict['NAME'], os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # Connections inherited from a parent process are left alone
+                options = {**DEFAULTS, **wrapper.settings_dict['OPTIONS'].get('pool', {})}
+                pool = _pools[key] = ConnectionPool(wrapper.alias, **options)
+    return pool
+
+
+class PooledDatabaseWrapperMixin:
+    """Mixed into a backend's ``DatabaseWrapper``: connect and close through a pool."""
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        # Opening through this wrapper keeps the per-wrapper state Django sets while connecting
+        return get_pool(self).getconn(functools.partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            # A connection that raised and no longer answers is not handed back
+            broken = self.errors_occurred and not self.is_usable()
+            with self.wrap_database_errors:
+                get_pool(self).putconn(self.connection, discard=broken)
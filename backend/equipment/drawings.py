@@ -0,0 +1,100 @@
+"""
+ReportLab ``Drawing`` builders for the chart names in ``charts.CHARTS``.
+
+Kept apart from ``charts`` so ``reportlab.graphics`` is only imported once
+a chart is actually drawn, not by every worker at startup.
+"""
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+from .storage import NUMERIC_FIELDS
+
+WIDTH = 420
+HEIGHT = 220
+PALETTE = [colors.HexColor(c) for c in (
+    '#2563eb', '#16a34a', '#f59e0b', '#dc2626', '#7c3aed', '#0891b2', '#db2777', '#65a30d'
+)]
+
+
+def _titled_drawing(title):
+    drawing = Drawing(WIDTH, HEIGHT)
+    drawing.add(String(WIDTH / 2, HEIGHT - 16, title, fontName='Helvetica-Bold',
+                       fontSize=12, textAnchor='middle'))
+    return drawing
+
+
+def type_distribution_chart(dataset, stats):
+    drawing = _titled_drawing('Equipment Type Distribution')
+    distribution = sorted(stats['type_distribution'].items())
+    if not distribution:
+        return drawing
+
+    pie = Pie()
+    pie.x, pie.y = 40, 20
+    pie.width = pie.height = 160
+    pie.data = [count for _, count in distribution]
+    pie.slices.strokeColor = colors.white
+    for i in range(len(distribution)):
+        pie.slices[i].fillColor = PALETTE[i % len(PALETTE)]
+    drawing.add(pie)
+
+    legend = Legend()
+    legend.x, legend.y = 240, HEIGHT - 50
+    legend.alignment = 'right'
+    legend.fontSize = 9
+    legend.colorNamePairs = [
+        (PALETTE[i % len(PALETTE)], f'{name} ({count})')
+        for i, (name, count) in enumerate(distribution)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def averages_chart(dataset, stats):
+    drawing = _titled_drawing('Average Parameters')
+    chart = _bar_chart([[dataset.avg_flowrate, dataset.avg_pressure, dataset.avg_temperature]])
+    chart.bars[0].fillColor = PALETTE[0]
+    drawing.add(chart)
+    return drawing
+
+
+def min_max_chart(dataset, stats):
+    drawing = _titled_drawing('Minimum and Maximum Values')
+    chart = _bar_chart([
+        [stats['min_values'][field] for field in NUMERIC_FIELDS],
+        [stats['max_values'][field] for field in NUMERIC_FIELDS],
+    ])
+    chart.bars[0].fillColor = PALETTE[1]
+    chart.bars[1].fillColor = PALETTE[3]
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = WIDTH - 90, HEIGHT - 30
+    legend.fontSize = 9
+    legend.colorNamePairs = [(PALETTE[1], 'Min'), (PALETTE[3], 'Max')]
+    drawing.add(legend)
+    return drawing
+
+
+def _bar_chart(data):
+    chart = VerticalBarChart()
+    chart.x, chart.y = 50, 30
+    chart.width, chart.height = WIDTH - 160, HEIGHT - 70
+    chart.data = data
+    chart.categoryAxis.categoryNames = ['Flowrate', 'Pressure', 'Temperature']
+    chart.categoryAxis.labels.fontSize = 9
+    chart.valueAxis.valueMin = min(0, *(value for series in data for value in series))
+    chart.valueAxis.labels.fontSize = 8
+    chart.barSpacing = 2
+    return chart
+
+
+BUILDERS = {
+    'types': type_distribution_chart,
+    'averages': averages_chart,
+    'minmax': min_max_chart,
+}
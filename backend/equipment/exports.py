@@ -0,0 +1,258 @@
+"""
+Dataset and report exports.
+
+Dataset rows are exported as CSV, Parquet or XLSX straight from storage in
+chunks. Reports for many datasets are rendered in parallel on a process
+pool (each worker writes into the normal report cache, so already-rendered
+reports are reused) and then streamed one by one into a ZIP archive. Both
+are produced as a stream of chunks, so no export is ever held in memory as
+a whole.
+"""
+
+import csv
+import io
+import logging
+import multiprocessing
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from . import reports
+from .models import EquipmentDataset
+from .storage import NUMERIC_FIELDS, get_storage
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Same header as the CSV upload format, so exports can be uploaded again
+EXPORT_COLUMNS = ('Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+XLSX_MAX_ROWS = 1048576
+
+
+class ExportUnavailable(Exception):
+    """Raised when a dataset cannot be exported in the requested format."""
+
+
+class _ChunkSink:
+    """Write-only file object collecting what an encoder writes to it."""
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self.closed = True
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _row_chunks(dataset):
+    """Yield lists of up to ``DATASET_EXPORT_CHUNK_ROWS`` row tuples in export column order."""
+    chunk_size = settings.DATASET_EXPORT_CHUNK_ROWS
+    chunk = []
+    for row in get_storage(dataset).iter_rows(dataset, chunk_size=chunk_size):
+        chunk.append((row['name'], row['equipment_type']) + tuple(row[field] for field in NUMERIC_FIELDS))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _stream_csv(dataset):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _row_chunks(dataset):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _stream_parquet(dataset, pa, pq):
+    schema = pa.schema([
+        (EXPORT_COLUMNS[0], pa.string()),
+        (EXPORT_COLUMNS[1], pa.string()),
+    ] + [(column, pa.float64()) for column in EXPORT_COLUMNS[2:]])
+    sink = _ChunkSink()
+    # One row group per chunk, handed on as soon as it is encoded
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _row_chunks(dataset):
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column) for column in zip(*chunk)], schema=schema
+            ))
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def _stream_xlsx(dataset, openpyxl):
+    # XLSX is a ZIP whose directory is written last, so the write-only
+    # workbook is saved to a temporary file and that file is streamed
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Equipment')
+    sheet.append(EXPORT_COLUMNS)
+    for chunk in _row_chunks(dataset):
+        for row in chunk:
+            sheet.append(row)
+    with tempfile.TemporaryFile() as out:
+        workbook.save(out)
+        out.seek(0)
+        while chunk := out.read(COPY_CHUNK_SIZE):
+            yield chunk
+
+
+def stream_dataset(dataset, fmt):
+    """
+    Return an iterator over the bytes of ``dataset`` exported as ``fmt``.
+
+    Raises ``ExportUnavailable`` up front when the format's optional
+    dependency is missing or the dataset does not fit the format.
+    """
+    if fmt == 'csv':
+        return _stream_csv(dataset)
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportUnavailable('Parquet export requires the pyarrow package')
+        return _stream_parquet(dataset, pa, pq)
+    if fmt == 'xlsx':
+        try:
+            import openpyxl
+        except ImportError:
+            raise ExportUnavailable('XLSX export requires the openpyxl package')
+        if dataset.total_count >= XLSX_MAX_ROWS:
+            raise ExportUnavailable(f'XLSX sheets hold at most {XLSX_MAX_ROWS - 1} rows; use csv or parquet')
+        return _stream_xlsx(dataset, openpyxl)
+    raise ValueError(f'Unknown export format: {fmt}')
+
+
+def _render_in_worker(dataset_id, listing):
+    dataset = EquipmentDataset.objects.get(pk=dataset_id)
+    return str(reports.render_report(dataset, listing))
+
+
+def render_reports(datasets, listing=reports.LISTING_PREVIEW, workers=None):
+    """
+    Yield ``(dataset, path, error)`` for each dataset once its report exists.
+
+    Cached reports are yielded straight away; the rest are rendered on a
+    pool of ``workers`` processes (``REPORT_EXPORT_WORKERS`` by default, 0
+    renders in this process) and yielded as they finish. ``error`` is the
+    exception for reports that failed, in which case ``path`` is None.
+    """
+    if workers is None:
+        workers = settings.REPORT_EXPORT_WORKERS
+
+    pending = []
+    for dataset in datasets:
+        path = reports.report_path(dataset.pk, listing)
+        if path.exists():
+            yield dataset, path, None
+        elif not workers:
+            try:
+                yield dataset, reports.render_report(dataset, listing), None
+            except Exception as e:
+                logger.exception('Export of report for dataset %s failed', dataset.pk)
+                yield dataset, None, e
+        else:
+            pending.append(dataset)
+
+    if not pending:
+        return
+
+    # Spawned workers start clean instead of inheriting this process's
+    # database connections and background threads
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(pending)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    ) as pool:
+        futures = {
+            pool.submit(_render_in_worker, dataset.pk, listing): dataset
+            for dataset in pending
+        }
+        for future in as_completed(futures):
+            dataset = futures[future]
+            try:
+                yield dataset, Path(future.result()), None
+            except Exception as e:
+                logger.exception('Export of report for dataset %s failed', dataset.pk)
+                yield dataset, None, e
+
+
+def filename_stem(dataset):
+    """The uploaded file name without extension, safe for downloads and archives."""
+    return get_valid_filename(Path(dataset.filename).stem) or 'dataset'
+
+
+def archive_name(dataset, listing=reports.LISTING_PREVIEW):
+    """Path of a dataset's report inside the export archive."""
+    suffix = '' if listing == reports.LISTING_PREVIEW else f'-{listing}'
+    return f'{get_valid_filename(dataset.user.username)}/{dataset.pk}-{filename_stem(dataset)}{suffix}.pdf'
+
+
+def stream_report_zip(datasets, listing=reports.LISTING_PREVIEW, workers=None):
+    """
+    Yield the bytes of a ZIP archive holding the reports of ``datasets``.
+
+    ``ZipFile`` writes to a non-seekable sink here, so entries use data
+    descriptors and each chunk is handed on as soon as it is written.
+    Reports that failed to render are listed in ``errors.txt``.
+    """
+    sink = _ChunkSink()
+    errors = []
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for dataset, path, error in render_reports(datasets, listing, workers):
+            if error is not None:
+                errors.append(f'{dataset.pk} ({dataset.filename}): {error}')
+                continue
+            # PDF streams are already compressed, so entries are stored
+            info = zipfile.ZipInfo.from_file(path, arcname=archive_name(dataset, listing))
+            with open(path, 'rb') as src, archive.open(info, 'w') as dst:
+                while chunk := src.read(COPY_CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield from sink.drain()
+
+
+def select_datasets(usernames=None, dataset_ids=None):
+    """Active datasets to export, optionally limited to some users or ids."""
+    datasets = EquipmentDataset.objects.select_related('user').order_by('user__username', 'id')
+    if usernames:
+        datasets = datasets.filter(user__username__in=usernames)
+    if dataset_ids:
+        datasets = datasets.filter(pk__in=dataset_ids)
+    return datasets
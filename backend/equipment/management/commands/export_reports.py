@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment import reports
+from equipment.exports import select_datasets, stream_report_zip
+
+
+class Command(BaseCommand):
+    help = 'Render PDF reports for many datasets in parallel and write them to one ZIP file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the ZIP file to write.')
+        parser.add_argument('--user', action='append', dest='usernames', default=[],
+                            help='Only export datasets of this user (repeatable).')
+        parser.add_argument('--dataset', action='append', dest='dataset_ids', type=int, default=[],
+                            help='Only export this dataset id (repeatable).')
+        parser.add_argument('--listing', choices=reports.LISTINGS, default=reports.LISTING_PREVIEW,
+                            help='Equipment listing to include in each report.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Rendering processes (default: REPORT_EXPORT_WORKERS, 0 = serial).')
+
+    def handle(self, *args, **options):
+        datasets = list(select_datasets(options['usernames'], options['dataset_ids']))
+        if not datasets:
+            raise CommandError('No datasets match the given filters.')
+
+        self.stdout.write(f'Exporting {len(datasets)} reports to {options["output"]}')
+        with open(options['output'], 'wb') as out:
+            for chunk in stream_report_zip(datasets, options['listing'], options['workers']):
+                out.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from equipment.models import EquipmentDataset
+from equipment.retention import purge_dataset
+
+
+class Command(BaseCommand):
+    help = 'Purge equipment rows of soft-deleted datasets in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows deleted per statement (default: DATASET_PURGE_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        pending = list(
+            EquipmentDataset.all_objects
+            .filter(deleted_at__isnull=False)
+            .values_list('id', flat=True)
+        )
+        if not pending:
+            self.stdout.write('No datasets awaiting purge.')
+            return
+
+        for dataset_id in pending:
+            def report(deleted, dataset_id=dataset_id):
+                self.stdout.write(f'Dataset {dataset_id}: {deleted} rows deleted')
+
+            total = purge_dataset(dataset_id, batch_size=options['batch_size'], progress=report)
+            self.stdout.write(self.style.SUCCESS(f'Purged dataset {dataset_id} ({total} rows)'))
@@ -0,0 +1,263 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters and histograms live in a module-level registry. ``/api/metrics/``
+renders them in the Prometheus text exposition format (version 0.0.4).
+
+Each gunicorn worker has a registry of its own. With ``METRICS_DIR`` set,
+every process writes a JSON snapshot of its values to a file there, at
+most every ``METRICS_FLUSH_INTERVAL`` seconds as it records. The endpoint
+sums the files of all processes, so a scrape sees the whole server whichever
+worker answers it. Files of exited workers are kept so counters never go
+backwards; clear the directory when the server is (re)started, as with
+``prometheus_client``'s multiprocess mode.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Registry:
+    """A set of metrics, their values and this process's snapshot file."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._pid = os.getpid()
+        self._file = None
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _check_fork(self):
+        # A forked worker starts from zero with a file of its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file = None
+            self._flushed_at = 0.0
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def recorded(self):
+        """Called under ``lock`` after every update; flushes when due."""
+        if settings.METRICS_DIR and time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self._write()
+
+    def snapshot(self):
+        """Return this process's values as ``{name: [[label values, value], ...]}``."""
+        with self.lock:
+            self._check_fork()
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            name: [[list(labels), value] for labels, value in metric.values.items()]
+            for name, metric in self.metrics.items()
+        }
+
+    def _write(self):
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self._file is None:
+            self._file = directory / f'{self._pid}-{uuid.uuid4().hex[:8]}.json'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as out:
+            json.dump(self._snapshot(), out)
+        os.replace(tmp_path, self._file)
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """Write this process's snapshot now (no-op without ``METRICS_DIR``)."""
+        with self.lock:
+            self._check_fork()
+            if settings.METRICS_DIR:
+                self._write()
+
+    def collect(self):
+        """Return ``{name: {label values: value}}`` summed over every process."""
+        if not settings.METRICS_DIR:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in Path(settings.METRICS_DIR).glob('*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue  # Removed or replaced while reading
+
+        totals = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue  # Written by an older version of the code
+                for labels, value in series:
+                    key = tuple(labels)
+                    totals[name][key] = metric.merge(totals[name].get(key), value)
+        return totals
+
+    def exposition(self):
+        """Render every metric in the Prometheus text format."""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for labels, value in sorted(values.items()):
+                lines.extend(metric.sample_lines(dict(zip(metric.labelnames, labels)), value))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """A monotonically increasing count, exposed as ``<name>``."""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.registry._check_fork()
+            self.values[key] = self.values.get(key, 0) + amount
+            self.registry.recorded()
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def sample_lines(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+
+class Histogram(Metric):
+    """
+    Observations counted into cumulative ``le`` buckets.
+
+    Values are stored per label set as ``[bucket counts..., sum, count]``.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=SECONDS_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.registry._check_fork()
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+            self.registry.recorded()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def sample_lines(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(bound)})} {cumulative}')
+        lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": "+Inf"})} {value[-1]}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {value[-1]}')
+        return lines
+
+
+UPLOAD_BYTES = Histogram(
+    'equipment_upload_bytes', 'Size of uploaded CSV files.',
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 5e7, 1e8, 5e8),
+)
+INGEST_ROWS = Counter('equipment_ingest_rows_total', 'Equipment rows stored from uploads.')
+UPLOAD_PHASE_SECONDS = Histogram(
+    'equipment_upload_phase_seconds', 'Time per upload phase (parse, store).', ['phase'],
+)
+SUMMARY_SECONDS = Histogram('equipment_summary_seconds', 'Dataset summary request latency.')
+REPORT_RENDER_SECONDS = Histogram(
+    'equipment_report_render_seconds', 'PDF report render time (cache misses only).', ['listing'],
+)
+CACHE_REQUESTS = Counter(
+    'equipment_cache_requests_total', 'Cache lookups by cache and result (hit, miss).', ['cache', 'result'],
+)
+
+DB_POOL_CONNECTIONS = Counter(
+    'equipment_db_pool_connections_total',
+    'Pooled database connections by event (opened, closed); open = opened - closed.', ['alias', 'event'],
+)
+DB_POOL_CHECKOUTS = Counter(
+    'equipment_db_pool_checkouts_total', 'Pooled connection checkouts by result (ok, timeout).', ['alias', 'result'],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    'equipment_db_pool_wait_seconds', 'Time to check out a pooled connection, including health checks.', ['alias'],
+)
+DB_POOL_HEALTH_CHECK_FAILURES = Counter(
+    'equipment_db_pool_health_check_failures_total', 'Pooled connections found broken on checkout.', ['alias'],
+)
+
+
+def cache_result(name, hit):
+    """Count a lookup in cache ``name``."""
+    CACHE_REQUESTS.inc(cache=name, result='hit' if hit else 'miss')
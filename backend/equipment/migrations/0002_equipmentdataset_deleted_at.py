@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:09
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='equipmentdataset',
+            options={'base_manager_name': 'all_objects', 'ordering': ['-uploaded_at']},
+        ),
+        migrations.AlterModelManagers(
+            name='equipmentdataset',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
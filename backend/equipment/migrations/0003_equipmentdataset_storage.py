@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_equipmentdataset_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='storage',
+            field=models.CharField(choices=[('rows', 'Rows'), ('columnar', 'Columnar')], default='rows', max_length=16),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def populate_equipment_types(apps, schema_editor):
+    EquipmentType = apps.get_model('equipment', 'EquipmentType')
+    Equipment = apps.get_model('equipment', 'Equipment')
+
+    names = Equipment.objects.order_by().values_list('equipment_type', flat=True).distinct()
+    for name in names:
+        equipment_type, _ = EquipmentType.objects.get_or_create(name=name)
+        Equipment.objects.filter(equipment_type=name).update(type_ref=equipment_type)
+
+
+def restore_equipment_type_names(apps, schema_editor):
+    EquipmentType = apps.get_model('equipment', 'EquipmentType')
+    Equipment = apps.get_model('equipment', 'Equipment')
+
+    for equipment_type in EquipmentType.objects.all():
+        Equipment.objects.filter(type_ref=equipment_type).update(equipment_type=equipment_type.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_equipmenttype'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_equipment_types, restore_equipment_type_names),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_populate_equipment_types'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='equipment',
+            name='equipment_type',
+        ),
+        migrations.RenameField(
+            model_name='equipment',
+            old_name='type_ref',
+            new_name='equipment_type',
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='equipment_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='equipment_items', to='equipment.equipmenttype'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_storage_usage(apps, schema_editor):
+    EquipmentDataset = apps.get_model('equipment', 'EquipmentDataset')
+    StorageUsage = apps.get_model('equipment', 'StorageUsage')
+
+    totals = (
+        EquipmentDataset.objects.filter(deleted_at__isnull=True)
+        .order_by().values('user_id').annotate(rows=models.Sum('total_count'))
+    )
+    StorageUsage.objects.bulk_create([
+        StorageUsage(user_id=item['user_id'], row_count=item['rows'] or 0)
+        for item in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('equipment', '0006_equipment_type_foreign_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='stored_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('byte_count', models.BigIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='storage_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_storage_usage, migrations.RunPython.noop),
+    ]
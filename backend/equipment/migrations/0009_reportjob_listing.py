@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='listing',
+            field=models.CharField(choices=[('preview', 'Preview'), ('full', 'Full')], default='preview', max_length=16),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_reportjob_listing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='statistics',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
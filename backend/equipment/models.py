@@ -1,7 +1,16 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
 
+class ActiveDatasetManager(models.Manager):
+    """Hides datasets that have been soft-deleted and are awaiting purge."""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class EquipmentDataset(models.Model):
     """
     Represents an uploaded CSV file with its metadata and summary statistics.
@@ -10,24 +19,64 @@ class EquipmentDataset(models.Model):
     filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     total_count = models.IntegerField(default=0)
+    stored_bytes = models.BigIntegerField(default=0)
     avg_flowrate = models.FloatField(default=0)
     avg_pressure = models.FloatField(default=0)
     avg_temperature = models.FloatField(default=0)
+    statistics = models.JSONField(null=True, blank=True)
+    storage = models.CharField(max_length=16, default='rows',
+                               choices=[('rows', 'Rows'), ('columnar', 'Columnar')])
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    objects = ActiveDatasetManager()
+    all_objects = models.Manager()
     
     class Meta:
         ordering = ['-uploaded_at']
+        base_manager_name = 'all_objects'
     
     def __str__(self):
         return f"{self.filename} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
 
 
+class EquipmentTypeManager(models.Manager):
+    
+    def resolve(self, names):
+        """Get or create types for ``names`` in bulk; returns a name -> id mapping."""
+        names = set(names)
+        types = dict(self.filter(name__in=names).order_by().values_list('name', 'id'))
+        missing = names - types.keys()
+        if missing:
+            # Only inserts new names: on PostgreSQL every conflicting row still
+            # takes a value from the small id sequence
+            self.bulk_create([self.model(name=name) for name in missing], ignore_conflicts=True)
+            types.update(self.filter(name__in=missing).values_list('name', 'id'))
+        return types
+
+
+class EquipmentType(models.Model):
+    """
+    Lookup table for equipment type names, referenced by a small integer key.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=100, unique=True)
+    
+    objects = EquipmentTypeManager()
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
 class Equipment(models.Model):
     """
     Individual equipment record from uploaded CSV.
     """
     dataset = models.ForeignKey(EquipmentDataset, on_delete=models.CASCADE, related_name='equipment_items')
     name = models.CharField(max_length=255)
-    equipment_type = models.CharField(max_length=100)
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.PROTECT, related_name='equipment_items')
     flowrate = models.FloatField()
     pressure = models.FloatField()
     temperature = models.FloatField()
@@ -37,3 +86,46 @@ class Equipment(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.equipment_type})"
+
+
+class StorageUsage(models.Model):
+    """
+    Running totals of rows and bytes a user has stored, used for quotas.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='storage_usage')
+    row_count = models.BigIntegerField(default=0)
+    byte_count = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.row_count} rows, {self.byte_count} bytes"
+
+
+class ReportJob(models.Model):
+    """
+    A PDF report render queued on the background worker pool.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    dataset = models.ForeignKey(EquipmentDataset, on_delete=models.CASCADE, related_name='report_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    listing = models.CharField(max_length=16, default='preview',
+                               choices=[('preview', 'Preview'), ('full', 'Full')])
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Report job {self.id} ({self.status})"
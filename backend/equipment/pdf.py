@@ -0,0 +1,207 @@
+"""
+ReportLab layout of the PDF report.
+
+Imported by ``reports.build_report`` on first use, so workers that never
+render a report do not load ``reportlab.platypus``.
+"""
+
+import itertools
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from . import charts
+from .reports import LISTING_FULL, LISTING_PREVIEW, PREVIEW_ROWS
+from .storage import get_statistics, get_storage
+
+LISTING_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
+])
+
+
+def build_report(dataset, out, listing=LISTING_PREVIEW):
+    """Lay out the report for ``dataset`` into ``out``; see ``reports.build_report``."""
+    doc = SimpleDocTemplate(out, pagesize=A4, rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=72)
+    
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Title
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1
+    )
+    elements.append(Paragraph("Equipment Analysis Report", title_style))
+    elements.append(Spacer(1, 12))
+    
+    # Dataset info
+    info_style = styles['Normal']
+    elements.append(Paragraph(f"<b>File:</b> {dataset.filename}", info_style))
+    elements.append(Paragraph(f"<b>Uploaded:</b> {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}", info_style))
+    elements.append(Paragraph(f"<b>Total Equipment:</b> {dataset.total_count}", info_style))
+    elements.append(Spacer(1, 20))
+    
+    # Summary statistics
+    elements.append(Paragraph("Summary Statistics", styles['Heading2']))
+    elements.append(Spacer(1, 10))
+    
+    summary_data = [
+        ['Metric', 'Average', 'Min', 'Max'],
+    ]
+    
+    # Statistics are stored on the dataset; only printed rows are fetched
+    storage = get_storage(dataset)
+    stats = get_statistics(dataset)
+    type_counts = stats['type_distribution']
+    total = sum(type_counts.values())
+    if total:
+        mins, maxs = stats['min_values'], stats['max_values']
+        summary_data.extend([
+            ['Flowrate', f'{dataset.avg_flowrate:.2f}', f'{mins["flowrate"]:.2f}', f'{maxs["flowrate"]:.2f}'],
+            ['Pressure', f'{dataset.avg_pressure:.2f}', f'{mins["pressure"]:.2f}', f'{maxs["pressure"]:.2f}'],
+            ['Temperature', f'{dataset.avg_temperature:.2f}', f'{mins["temperature"]:.2f}', f'{maxs["temperature"]:.2f}']
+        ])
+    
+    summary_table = Table(summary_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 20))
+    
+    # Equipment type distribution
+    elements.append(Paragraph("Equipment Type Distribution", styles['Heading2']))
+    elements.append(Spacer(1, 10))
+    
+    type_data = [['Equipment Type', 'Count', 'Percentage']]
+    for eq_type, count in sorted(type_counts.items()):
+        percentage = (count / total * 100) if total else 0
+        type_data.append([eq_type, str(count), f'{percentage:.1f}%'])
+    
+    type_table = Table(type_data, colWidths=[2.5*inch, 1.2*inch, 1.2*inch])
+    type_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
+    ]))
+    elements.append(type_table)
+    elements.append(Spacer(1, 20))
+    
+    # Charts (cached vector drawings shared with the chart endpoints). Layout
+    # marks flowables it moves to a new page, so each document gets a copy.
+    if total:
+        elements.append(Paragraph("Charts", styles['Heading2']))
+        elements.append(Spacer(1, 10))
+        for name in charts.CHARTS:
+            elements.append(charts.get_drawing(dataset, name).copy())
+            elements.append(Spacer(1, 12))
+    
+    # Equipment list
+    elements.append(Paragraph("Equipment List", styles['Heading2']))
+    elements.append(Spacer(1, 10))
+    
+    if listing == LISTING_FULL:
+        listing_flowables = _full_listing(dataset, storage)
+    else:
+        if dataset.total_count > PREVIEW_ROWS:
+            elements.append(Paragraph(
+                f"Showing the first {PREVIEW_ROWS} of {dataset.total_count} items.", info_style
+            ))
+            elements.append(Spacer(1, 6))
+        listing_flowables = [_listing_table(storage.iter_rows(dataset, limit=PREVIEW_ROWS))]
+    
+    doc.build(LazyFlowables(itertools.chain(elements, listing_flowables)))
+
+
+def _listing_table(rows, table_class=Table):
+    eq_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']]
+    for eq in rows:
+        eq_data.append([
+            eq['name'], eq['equipment_type'], 
+            f'{eq["flowrate"]:.1f}', f'{eq["pressure"]:.1f}', f'{eq["temperature"]:.1f}'
+        ])
+    
+    eq_table = table_class(eq_data, colWidths=[1.4*inch, 1.2*inch, 0.9*inch, 0.9*inch, 1*inch],
+                           repeatRows=1)
+    eq_table.setStyle(LISTING_TABLE_STYLE)
+    return eq_table
+
+
+def _full_listing(dataset, storage):
+    """Yield page-sized listing tables, pulling rows from storage in chunks."""
+    rows_per_table = settings.REPORT_LISTING_ROWS_PER_TABLE
+    rows = storage.iter_rows(dataset, chunk_size=settings.REPORT_LISTING_CHUNK_ROWS)
+    while True:
+        segment = list(itertools.islice(rows, rows_per_table))
+        if not segment:
+            return
+        yield _listing_table(segment, table_class=LongTable)
+
+
+class LazyFlowables:
+    """
+    List-like queue of flowables filled from an iterator on demand.
+
+    ``doc.build`` only ever looks at and edits the front of its flowables
+    list, so buffering a couple of items ahead is enough. This keeps only
+    the flowables for the current page in memory instead of the whole
+    document.
+    """
+    lookahead = 3
+    
+    def __init__(self, iterable):
+        self._source = iter(iterable)
+        self._buffer = []
+    
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                break
+    
+    def __len__(self):
+        self._fill(self.lookahead)
+        return len(self._buffer)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else self.lookahead)
+        else:
+            self._fill(index + 1)
+        return self._buffer[index]
+    
+    def __setitem__(self, index, value):
+        self._buffer[index] = value
+    
+    def __delitem__(self, index):
+        self._buffer.__delitem__(index)
+    
+    def insert(self, index, value):
+        self._buffer.insert(index, value)
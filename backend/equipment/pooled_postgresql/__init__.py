@@ -0,0 +1 @@
+"""PostgreSQL backend connecting through ``equipment.dbpool``."""
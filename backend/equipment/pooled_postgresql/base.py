@@ -0,0 +1,10 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from ..dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    # Set by Django while opening a connection, which a reused pooled one skips;
+    # the level itself stays on the connection
+    isolation_level = IsolationLevel.READ_COMMITTED
@@ -0,0 +1 @@
+"""SQLite backend connecting through ``equipment.dbpool``: a local stand-in for the pooled PostgreSQL backend."""
@@ -0,0 +1,132 @@
+"""
+Per-request profiling with ``Server-Timing`` headers.
+
+``ProfilingMiddleware`` times every request, which costs two clock reads,
+and logs a warning for those slower than ``PROFILING_SLOW_MS``. A sampled
+fraction (``PROFILING_SAMPLE_RATE``) is also profiled in detail:
+
+* database query count and time, from an execute wrapper installed on every
+  connection as it is created, so queries made on worker threads count too;
+* named phases marked in views with ``with phase('parse'):`` etc.
+
+and gets a ``Server-Timing`` header (``total``, ``db`` and one entry per
+phase) that browser dev tools show next to the request. Unsampled requests
+only pay a context variable lookup per query and phase. With both settings
+at 0 the middleware is not installed at all.
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('equipment_profile', default=None)
+
+
+class Profile:
+    """Query and phase timings collected for one sampled request."""
+    __slots__ = ('queries', 'db_seconds', 'phases')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.phases = {}
+
+    def server_timing(self, total):
+        entries = [f'total;dur={total * 1000:.1f}',
+                   f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"']
+        entries.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items())
+        return ', '.join(entries)
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as phase ``name`` of the current request, if it is sampled."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] = profile.phases.get(name, 0) + time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of sampled requests."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Fires on every (re)connect of the same wrapper, so only add it once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfilingMiddleware:
+    """Time requests, log slow ones and add ``Server-Timing`` to sampled ones."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE and not settings.PROFILING_SLOW_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self._finish(request, response, profile, start)
+
+    async def __acall__(self, request):
+        profile, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self._finish(request, response, profile, start)
+
+    def _start(self):
+        profile = token = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profile = Profile()
+            token = _current.set(profile)
+        return profile, token, time.perf_counter()
+
+    def _finish(self, request, response, profile, start):
+        total = time.perf_counter() - start
+        if profile is not None:
+            response['Server-Timing'] = profile.server_timing(total)
+        if settings.PROFILING_SLOW_MS and total * 1000 >= settings.PROFILING_SLOW_MS:
+            logger.warning('Slow request %s %s: %d in %.0f ms%s', request.method, request.path,
+                           response.status_code, total * 1000,
+                           f' ({profile.server_timing(total)})' if profile is not None else '')
+        return response
@@ -0,0 +1,153 @@
+"""
+Query budgets: per-view ceilings on database work.
+
+Each endpoint in ``equipment/urls.py`` declares the most queries it should
+run, the most rows it should fetch and how often one SELECT may repeat
+(the N+1 pattern) with ``query_budget``:
+
+    @query_budget(queries=3, rows=1)
+    def view(request): ...
+
+    with query_budget(queries=10):
+        ...
+
+Queries and fetched rows are counted by an execute wrapper installed on
+every connection as it is created, which looks up the budgets active in
+the current context. Async views and views run on worker threads are
+covered as long as the context is carried over (``sync_to_async`` and
+``async_views.run_blocking`` both do). Work done while a streaming response
+is consumed, after the view has returned, is not counted.
+
+``QUERY_BUDGETS`` picks what happens when a budget is exceeded: ``raise``
+``QueryBudgetExceeded`` (the default with ``DEBUG``, so the test suite
+fails), ``log`` a warning, or ``off`` to skip the checks entirely. Budgets
+that saw writes only ever log: by the time the budget is checked the view's
+transaction has committed, and an error would invite the client to retry a
+write that succeeded.
+"""
+
+import functools
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_active = ContextVar('equipment_query_budgets', default=())
+
+FETCH_METHODS = ('fetchone', 'fetchmany', 'fetchall')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view goes over its query budget and ``QUERY_BUDGETS = 'raise'``."""
+
+
+class query_budget:
+    """
+    Decorator and context manager declaring a view's database budget.
+
+    ``queries`` caps the number of statements and ``rows`` the rows
+    fetched; ``None`` leaves either uncapped, for views whose work grows
+    with the dataset by design. ``repeats`` caps how many times the same
+    SELECT may run.
+    """
+
+    def __init__(self, queries, rows=None, repeats=1, name=None):
+        self.queries = queries
+        self.rows = rows
+        self.repeats = repeats
+        self.name = name
+        self._tokens = []
+
+    def __call__(self, view):
+        name = self.name or getattr(view, 'view_class', view).__name__
+        budget = functools.partial(query_budget, self.queries, self.rows, self.repeats, name)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                with budget():
+                    return await view(*args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                with budget():
+                    return view(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self.executed = 0
+        self.fetched = 0
+        self.wrote = False
+        self.selects = Counter()
+        if settings.QUERY_BUDGETS != 'off':
+            self._tokens.append(_active.set(_active.get() + (self,)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if settings.QUERY_BUDGETS == 'off' or not self._tokens:
+            return
+        _active.reset(self._tokens.pop())
+        if exc_type is not None:
+            return
+
+        problems = []
+        if self.queries is not None and self.executed > self.queries:
+            problems.append(f'{self.executed} queries (budget {self.queries})')
+        if self.rows is not None and self.fetched > self.rows:
+            problems.append(f'{self.fetched} rows fetched (budget {self.rows})')
+        for sql, count in self.selects.items():
+            if count > self.repeats:
+                problems.append(f'the same query ran {count} times: {sql[:200]}')
+        if not problems:
+            return
+
+        message = f'{self.name or "block"} went over its query budget: ' + '; '.join(problems)
+        if settings.QUERY_BUDGETS == 'raise' and not self.wrote:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def _count_rows(fetch, budgets, single):
+    @functools.wraps(fetch)
+    def wrapper(*args, **kwargs):
+        result = fetch(*args, **kwargs)
+        count = (result is not None) if single else len(result)
+        for budget in budgets:
+            budget.fetched += count
+        return result
+    return wrapper
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper charging queries and fetched rows to the active budgets."""
+    budgets = _active.get()
+    if budgets:
+        statement = sql.lstrip()[:7].upper()
+        is_select = statement.startswith('SELECT')
+        is_write = statement.startswith(WRITE_STATEMENTS)
+        for budget in budgets:
+            budget.executed += 1
+            if is_select:
+                budget.selects[sql] += 1
+            budget.wrote = budget.wrote or is_write
+        cursor = context['cursor']
+        if is_select and '_query_budgets' not in vars(cursor):
+            # Instance attributes shadow CursorWrapper's delegating __getattr__
+            cursor._query_budgets = budgets
+            for method in FETCH_METHODS:
+                setattr(cursor, method, _count_rows(getattr(cursor, method), budgets, method == 'fetchone'))
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Fires on every (re)connect of the same wrapper, so only add it once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,62 @@
+"""
+Per-user storage quotas.
+
+Each user has a ``StorageUsage`` row holding running totals of stored rows
+and bytes. Uploads reserve against it and deletes release from it, so
+quota checks never need to count ``Equipment`` rows. A limit of 0 means
+unlimited.
+"""
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import StorageUsage
+
+
+class QuotaExceeded(Exception):
+    """Raised when an upload would push a user past their storage quota."""
+
+
+def get_usage(user):
+    usage, _ = StorageUsage.objects.get_or_create(user=user)
+    return usage
+
+
+def check(usage, rows=0, nbytes=0):
+    """Raise ``QuotaExceeded`` if adding ``rows``/``nbytes`` would go over quota."""
+    max_rows = settings.QUOTA_MAX_ROWS
+    max_bytes = settings.QUOTA_MAX_BYTES
+    if max_rows and usage.row_count + rows > max_rows:
+        raise QuotaExceeded(
+            f'Row quota exceeded: {usage.row_count} of {max_rows} rows used, upload has {rows}'
+        )
+    if max_bytes and usage.byte_count + nbytes > max_bytes:
+        raise QuotaExceeded(
+            f'Storage quota exceeded: {usage.byte_count} of {max_bytes} bytes used, upload has {nbytes}'
+        )
+
+
+def reserve(usage, rows, nbytes):
+    """
+    Atomically add ``rows``/``nbytes`` to the user's usage.
+
+    The limits are part of the UPDATE's WHERE clause, so concurrent uploads
+    cannot jointly overshoot the quota.
+    """
+    counters = StorageUsage.objects.filter(pk=usage.pk)
+    if settings.QUOTA_MAX_ROWS:
+        counters = counters.filter(row_count__lte=settings.QUOTA_MAX_ROWS - rows)
+    if settings.QUOTA_MAX_BYTES:
+        counters = counters.filter(byte_count__lte=settings.QUOTA_MAX_BYTES - nbytes)
+    if not counters.update(row_count=F('row_count') + rows, byte_count=F('byte_count') + nbytes):
+        usage.refresh_from_db()
+        check(usage, rows, nbytes)
+        raise QuotaExceeded('Storage quota exceeded')
+
+
+def release(user_id, rows, nbytes):
+    """Give back storage previously reserved by ``user_id``."""
+    StorageUsage.objects.filter(user_id=user_id).update(
+        row_count=F('row_count') - rows,
+        byte_count=F('byte_count') - nbytes,
+    )
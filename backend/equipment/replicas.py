@@ -0,0 +1,142 @@
+"""
+Read-replica routing.
+
+With ``DATABASE_REPLICA_URL`` set, settings add a ``replica`` database and
+``ReplicaRouter``. Views wrapped with ``replica_reads`` (the safe dataset
+endpoints in ``equipment/urls.py``) read this app's models from the replica
+on GET and HEAD. Everything else stays on the primary:
+
+* writes always go to the primary, and once a request has written, its
+  later reads do too (read-after-write);
+* users and tokens are always read from the primary, so a new registration
+  or login works straight away;
+* after an upload or a delete, ``stick(user)`` pins that user's reads to
+  the primary for ``DATABASE_REPLICA_STICKY_SECONDS``, so they see the
+  change even while the replica lags. Pins live in the Django cache, so
+  settings refuse a replica with a per-process ``locmem://`` cache.
+
+Streaming responses (exports) keep reading from the replica while they are
+consumed, after the view has returned.
+"""
+
+import functools
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_routing = ContextVar('equipment_replica_routing', default=None)
+
+
+def _sticky_key(user_id):
+    return f'equipment:replica-sticky:{user_id}'
+
+
+def stick(user):
+    """Read ``user``'s data from the primary for the next ``DATABASE_REPLICA_STICKY_SECONDS``."""
+    if REPLICA in settings.DATABASES and settings.DATABASE_REPLICA_STICKY_SECONDS:
+        cache.set(_sticky_key(user.pk), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+class Routing:
+    """Where the current request may read from."""
+    __slots__ = ('request', 'user_id', 'wrote', 'sticky')
+
+    def __init__(self, request):
+        self.request = request
+        self.user_id = None
+        self.wrote = False
+        self.sticky = None
+
+    def use_replica(self):
+        if self.wrote:
+            return False
+        if self.sticky is None:
+            # Decided once the view knows whose data it reads
+            user_id = self.user_id
+            if user_id is None:
+                user = getattr(self.request, 'user', None)
+                if user is None or not user.is_authenticated:
+                    return True
+                user_id = user.pk
+            self.sticky = cache.get(_sticky_key(user_id), False)
+        return not self.sticky
+
+
+def identify(user_id):
+    """Name the user the current request reads for, when it is not ``request.user`` (signed links)."""
+    routing = _routing.get()
+    if routing is not None:
+        routing.user_id = user_id
+
+
+def _route_stream(chunks, routing):
+    # Each chunk is produced under the request's routing, whichever context consumes it
+    chunks = iter(chunks)
+    while True:
+        token = _routing.set(routing)
+        try:
+            chunk = next(chunks, None)
+        finally:
+            _routing.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def replica_reads(view):
+    """Let safe requests to ``view`` read from the replica."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await view(request, *args, **kwargs)
+            token = _routing.set(Routing(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _routing.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+            routing = Routing(request)
+            token = _routing.set(routing)
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                _routing.reset(token)
+            # File responses read no rows, and replacing their content would lose sendfile
+            if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+                response.streaming_content = _route_stream(response.streaming_content, routing)
+            return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads of this app's models to the replica when the current request allows it."""
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and model._meta.app_label == 'equipment' and routing.use_replica():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
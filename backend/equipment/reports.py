@@ -0,0 +1,92 @@
+"""
+PDF report rendering and on-disk report cache.
+
+Datasets never change after upload, so each report is rendered once per
+dataset and ``REPORT_TEMPLATE_VERSION`` and kept under
+``MEDIA_ROOT/reports``. Bump the version whenever the layout changes so
+stale files are no longer served. The layout itself is in ``pdf``.
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .models import EquipmentDataset, ReportJob
+
+logger = logging.getLogger(__name__)
+
+REPORT_TEMPLATE_VERSION = 3
+
+LISTING_PREVIEW = 'preview'
+LISTING_FULL = 'full'
+LISTINGS = (LISTING_PREVIEW, LISTING_FULL)
+PREVIEW_ROWS = 50
+
+
+def report_dir():
+    return Path(settings.MEDIA_ROOT) / 'reports'
+
+
+def report_path(dataset_id, listing=LISTING_PREVIEW):
+    suffix = '' if listing == LISTING_PREVIEW else f'-{listing}'
+    return report_dir() / f'{dataset_id}{suffix}-v{REPORT_TEMPLATE_VERSION}.pdf'
+
+
+def build_report(dataset, out, listing=LISTING_PREVIEW):
+    """
+    Write the PDF report for ``dataset`` to the file object ``out``.
+
+    ``listing`` is ``preview`` for the first ``PREVIEW_ROWS`` items or
+    ``full`` for every item. The full listing streams rows from storage into
+    page-sized tables, so memory stays bounded however large the dataset.
+    """
+    from . import pdf
+    pdf.build_report(dataset, out, listing)
+
+
+def render_report(dataset, listing=LISTING_PREVIEW):
+    """Return the cached report path for ``dataset``, rendering it if missing."""
+    path = report_path(dataset.pk, listing)
+    cached = path.exists()
+    metrics.cache_result('report', cached)
+    if cached:
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}-')
+    try:
+        with os.fdopen(fd, 'wb') as out, metrics.REPORT_RENDER_SECONDS.time(listing=listing):
+            build_report(dataset, out, listing)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def delete_reports(dataset_id):
+    """Remove every cached report (any listing or template version) for a dataset."""
+    for path in report_dir().glob(f'{dataset_id}-*v*.pdf'):
+        path.unlink(missing_ok=True)
+
+
+def run_report_job(job_id):
+    """Render the report for a queued ``ReportJob`` and record the outcome."""
+    ReportJob.objects.filter(pk=job_id).update(status=ReportJob.RUNNING)
+    job = ReportJob.objects.select_related('dataset').get(pk=job_id)
+    try:
+        if job.dataset.deleted_at is not None:
+            raise EquipmentDataset.DoesNotExist('Dataset was deleted')
+        render_report(job.dataset, job.listing)
+    except Exception as e:
+        logger.exception('Report job %s failed', job_id)
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return
+    ReportJob.objects.filter(pk=job_id).update(status=ReportJob.DONE, finished_at=timezone.now())
@@ -0,0 +1,103 @@
+"""
+Dataset retention and deletion helpers.
+
+Deleting a dataset is split in two steps. The dataset is soft-deleted at
+once, which hides it from every endpoint, and its equipment rows are then
+purged in bounded batches in the background. Neither step loads equipment
+rows into Python, so memory stays constant regardless of dataset size.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import quotas, tasks
+from .models import EquipmentDataset, Equipment, ReportJob
+from .charts import delete_charts
+from .reports import delete_reports
+from .sqlite import write_transaction
+from .storage import BACKENDS
+
+logger = logging.getLogger(__name__)
+
+
+def purge_dataset(dataset_id, batch_size=None, progress=None):
+    """
+    Hard-delete a soft-deleted dataset, removing its rows in batches.
+
+    Each batch is one range delete bounded by primary key, so only a single
+    id is ever fetched per batch. ``progress`` is called with the running
+    number of deleted rows after every batch. Returns that total.
+    """
+    batch_size = batch_size or settings.DATASET_PURGE_BATCH_SIZE
+    using = router.db_for_write(Equipment)
+    rows = Equipment.objects.filter(dataset_id=dataset_id).order_by()
+    deleted = 0
+
+    while True:
+        boundary = list(rows.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size])
+        batch = rows.filter(id__lte=boundary[0]) if boundary else rows
+        # Nothing references equipment rows, so this is a single DELETE
+        # rather than collecting the batch first
+        with write_transaction(using=using):
+            deleted += batch.delete()[0]
+        logger.info('Purging dataset %s: %d equipment rows deleted', dataset_id, deleted)
+        if progress:
+            progress(deleted)
+        if not boundary:
+            break
+
+    for backend in BACKENDS.values():
+        backend.delete(dataset_id)
+    delete_reports(dataset_id)
+    delete_charts(dataset_id)
+    ReportJob.objects.filter(dataset_id=dataset_id).delete()
+    EquipmentDataset.all_objects.filter(pk=dataset_id, deleted_at__isnull=False).delete()
+    return deleted
+
+
+def delete_datasets(dataset_ids):
+    """
+    Soft-delete datasets now and schedule their purge once committed.
+
+    The datasets' rows and bytes are released from their owners' quotas
+    straight away, using the totals recorded on each dataset.
+    """
+    dataset_ids = list(dataset_ids)
+    if not dataset_ids:
+        return 0
+
+    with write_transaction():
+        datasets = list(
+            EquipmentDataset.objects.select_for_update()
+            .filter(id__in=dataset_ids)
+            .values_list('id', 'user_id', 'total_count', 'stored_bytes')
+        )
+        dataset_ids = [dataset_id for dataset_id, *_ in datasets]
+        EquipmentDataset.objects.filter(id__in=dataset_ids).update(deleted_at=timezone.now())
+
+        released = defaultdict(lambda: [0, 0])
+        for _, user_id, rows, nbytes in datasets:
+            released[user_id][0] += rows
+            released[user_id][1] += nbytes
+        for user_id, (rows, nbytes) in released.items():
+            quotas.release(user_id, rows, nbytes)
+
+    for dataset_id in dataset_ids:
+        transaction.on_commit(lambda pk=dataset_id: tasks.submit(purge_dataset, pk))
+    return len(dataset_ids)
+
+
+def enforce_retention(user):
+    """Drop a user's datasets beyond ``DATASET_RETENTION_LIMIT``, oldest first."""
+    limit = settings.DATASET_RETENTION_LIMIT
+    stale_ids = (
+        EquipmentDataset.objects
+        .filter(user=user)
+        .order_by('-uploaded_at', '-id')
+        .values_list('id', flat=True)[limit:]
+    )
+    return delete_datasets(stale_ids)
@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import EquipmentDataset, Equipment
+from .models import EquipmentDataset, ReportJob, StorageUsage
+from .downloads import sign_url
+from .storage import get_storage
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -20,14 +24,6 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class EquipmentSerializer(serializers.ModelSerializer):
-    """Serializer for individual equipment items."""
-    
-    class Meta:
-        model = Equipment
-        fields = ['id', 'name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
-
-
 class EquipmentDatasetListSerializer(serializers.ModelSerializer):
     """Serializer for dataset list view (summary only)."""
     
@@ -39,12 +35,16 @@ class EquipmentDatasetListSerializer(serializers.ModelSerializer):
 
 class EquipmentDatasetDetailSerializer(serializers.ModelSerializer):
     """Serializer for dataset detail view (includes equipment items)."""
-    equipment_items = EquipmentSerializer(many=True, read_only=True)
+    equipment_items = serializers.SerializerMethodField()
     
     class Meta:
         model = EquipmentDataset
         fields = ['id', 'filename', 'uploaded_at', 'total_count', 
                   'avg_flowrate', 'avg_pressure', 'avg_temperature', 'equipment_items']
+    
+    def get_equipment_items(self, obj):
+        # Read through the dataset's storage backend so columnar datasets work too
+        return list(get_storage(obj).iter_rows(obj))
 
 
 class DatasetSummarySerializer(serializers.Serializer):
@@ -56,3 +56,45 @@ class DatasetSummarySerializer(serializers.Serializer):
     type_distribution = serializers.DictField()
     min_values = serializers.DictField()
     max_values = serializers.DictField()
+
+
+class StorageUsageSerializer(serializers.ModelSerializer):
+    """Serializer for a user's storage usage and quota limits."""
+    max_rows = serializers.SerializerMethodField()
+    max_bytes = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = StorageUsage
+        fields = ['row_count', 'byte_count', 'max_rows', 'max_bytes']
+    
+    def get_max_rows(self, obj):
+        return settings.QUOTA_MAX_ROWS or None
+    
+    def get_max_bytes(self, obj):
+        return settings.QUOTA_MAX_BYTES or None
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for background report jobs, with polling and download URLs."""
+    url = serializers.SerializerMethodField()
+    report_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'dataset', 'listing', 'status', 'error', 'created_at', 'finished_at',
+                  'url', 'report_url']
+    
+    def _absolute(self, path):
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+    
+    def get_url(self, obj):
+        return self._absolute(reverse('report-job-detail', args=[obj.id]))
+    
+    def get_report_url(self, obj):
+        if obj.status != ReportJob.DONE:
+            return None
+        # Signed, so the link also works as a plain browser download
+        path = reverse('dataset-report', args=[obj.dataset_id])
+        params = {'listing': obj.listing} if obj.listing != 'preview' else None
+        return self._absolute(sign_url(obj.dataset.user_id, path, params))
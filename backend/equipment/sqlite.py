@@ -0,0 +1,88 @@
+"""
+SQLite profile for single-node installs.
+
+With SQLite's defaults (rollback journal, no busy timeout, deferred
+transactions) a reader blocks an upload's commit and vice versa, and
+concurrent requests fail with "database is locked". With ``SQLITE_PROFILE``
+on, every SQLite connection is configured as it is opened:
+
+* ``journal_mode=WAL``: readers no longer block the writer or each other;
+* ``synchronous`` (``SQLITE_SYNCHRONOUS``, ``NORMAL`` by default): with WAL
+  this only syncs at checkpoints, and a power loss can drop the last
+  commits but not corrupt the database;
+* ``mmap_size`` and ``cache_size`` (``SQLITE_MMAP_SIZE`` bytes,
+  ``SQLITE_CACHE_SIZE_KB``): reads come from the page cache instead of
+  ``read()`` calls;
+* ``busy_timeout`` (``SQLITE_BUSY_TIMEOUT_MS``): wait for the write lock
+  instead of failing straight away;
+
+Write paths (the upload's ingest, purges, quota updates) use
+``write_transaction()`` rather than ``transaction.atomic()``. Under the
+profile it starts the transaction with ``BEGIN IMMEDIATE``, taking the write
+lock up front: a deferred transaction that reads before it writes, as the
+ingest does, cannot wait for the lock, since once another commit lands its
+snapshot is stale and it fails regardless of the busy timeout. Every other
+transaction stays deferred, so reads never queue behind a writer. Django 5.1
+exposes the former as the ``transaction_mode`` option, for all transactions.
+
+Other database vendors are left alone.
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def pragmas():
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': settings.SQLITE_SYNCHRONOUS,
+        'mmap_size': settings.SQLITE_MMAP_SIZE,
+        # Negative values are a size in KiB rather than a number of pages
+        'cache_size': -settings.SQLITE_CACHE_SIZE_KB,
+        'busy_timeout': settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PROFILE:
+        return
+    # On the raw connection, so the pragmas do not count as the request's queries
+    for name, value in pragmas().items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def write_transaction(using=None):
+    """
+    ``transaction.atomic()`` for blocks that write.
+
+    On SQLite with the profile on, an outermost block begins with ``BEGIN
+    IMMEDIATE``; nested in another transaction it is a plain savepoint, as
+    the lock mode is fixed once a transaction has begun.
+    """
+    connection = transaction.get_connection(using)
+    if (connection.vendor != 'sqlite' or not settings.SQLITE_PROFILE
+            or connection.in_atomic_block or not connection.get_autocommit()):
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # With autocommit off Django leaves beginning the transaction to us, and
+    # treats the atomic block below as nested in it
+    transaction.set_autocommit(False, using=using)
+    try:
+        connection.cursor().execute('BEGIN IMMEDIATE')
+        with transaction.atomic(using=using):
+            yield
+        transaction.commit(using=using)
+    except BaseException:
+        transaction.rollback(using=using)
+        raise
+    finally:
+        # Runs the block's on_commit callbacks once committed
+        transaction.set_autocommit(True, using=using)
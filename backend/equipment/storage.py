@@ -0,0 +1,254 @@
+"""
+Storage backends for equipment readings.
+
+``rows`` keeps one ``Equipment`` row per reading. ``columnar`` keeps each
+dataset as a directory of NumPy column files under ``MEDIA_ROOT`` which are
+read back memory-mapped, so analytics never build per-row Python objects.
+NumPy is imported by the columnar methods on first use.
+Every dataset records the backend it was written with.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Min
+
+from .models import Equipment, EquipmentType
+
+ROWS = 'rows'
+COLUMNAR = 'columnar'
+
+NUMERIC_FIELDS = ('flowrate', 'pressure', 'temperature')
+ROW_FIELDS = ('id', 'name', 'equipment_type') + NUMERIC_FIELDS
+
+
+def _empty_statistics():
+    zeros = {field: 0 for field in NUMERIC_FIELDS}
+    return {'type_distribution': {}, 'min_values': dict(zeros), 'max_values': dict(zeros)}
+
+
+class RowStorage:
+    """One ORM row per reading; statistics come from database aggregates."""
+    name = ROWS
+
+    def write(self, dataset, df):
+        type_names = df['Type'].astype(str)
+        type_ids = EquipmentType.objects.resolve(type_names.unique())
+
+        equipment_records = []
+        for (_, row), type_name in zip(df.iterrows(), type_names):
+            equipment_records.append(Equipment(
+                dataset=dataset,
+                name=row['Equipment Name'],
+                equipment_type_id=type_ids[type_name],
+                flowrate=row['Flowrate'],
+                pressure=row['Pressure'],
+                temperature=row['Temperature']
+            ))
+        Equipment.objects.bulk_create(equipment_records)
+
+    def statistics(self, dataset):
+        equipment = Equipment.objects.filter(dataset_id=dataset.pk)
+        stats = _empty_statistics()
+
+        # Group on the small integer key and resolve the few names afterwards
+        type_counts = dict(
+            equipment.order_by().values_list('equipment_type_id').annotate(count=Count('id'))
+        )
+        if not type_counts:
+            return stats
+        type_names = EquipmentType.objects.filter(id__in=type_counts).values_list('id', 'name')
+        stats['type_distribution'] = {name: type_counts[type_id] for type_id, name in type_names}
+
+        aggregates = {}
+        for field in NUMERIC_FIELDS:
+            aggregates[f'min_{field}'] = Min(field)
+            aggregates[f'max_{field}'] = Max(field)
+        values = equipment.aggregate(**aggregates)
+        for field in NUMERIC_FIELDS:
+            stats['min_values'][field] = round(values[f'min_{field}'], 2)
+            stats['max_values'][field] = round(values[f'max_{field}'], 2)
+        return stats
+
+    def iter_rows(self, dataset, limit=None, chunk_size=2000):
+        rows = (
+            Equipment.objects
+            .filter(dataset_id=dataset.pk)
+            .order_by('name', 'id')
+            .values_list('id', 'name', 'equipment_type__name', *NUMERIC_FIELDS)
+        )
+        if limit is not None:
+            rows = rows[:limit]
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield dict(zip(ROW_FIELDS, row))
+
+    def delete(self, dataset_id):
+        # Rows are removed by the batched purge in ``retention``
+        pass
+
+
+def _encode_names(names):
+    """Pack ``names`` into a UTF-8 byte array and ``len(names) + 1`` offsets into it."""
+    import numpy as np
+
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    if offsets[-1] <= np.iinfo(np.uint32).max:
+        offsets = offsets.astype(np.uint32)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class ColumnarStorage:
+    """
+    One ``.npy`` file per column plus a JSON dictionary for the type column.
+
+    Files are stored uncompressed so they can be memory-mapped; the saving
+    over rows comes from dropping per-row ids/keys, dictionary-encoding the
+    type and using ``COLUMNAR_FLOAT_DTYPE`` for the readings. Names are
+    variable-length, so they are kept as one UTF-8 blob (``name.bin``) with
+    row offsets (``name_offsets.npy``) rather than a fixed-width array that
+    spends four bytes per character of the longest name on every row.
+    """
+    name = COLUMNAR
+
+    def path(self, dataset_id):
+        return Path(settings.MEDIA_ROOT) / 'columnar' / str(dataset_id)
+
+    def write(self, dataset, df):
+        import numpy as np
+
+        df = df.sort_values('Equipment Name', kind='stable')
+        types, codes = np.unique(df['Type'].astype(str).to_numpy(), return_inverse=True)
+        code_dtype = np.uint8 if len(types) <= np.iinfo(np.uint8).max + 1 else np.uint32
+        float_dtype = np.dtype(settings.COLUMNAR_FLOAT_DTYPE)
+
+        names, name_offsets = _encode_names(df['Equipment Name'].astype(str))
+        columns = {
+            'name_offsets': name_offsets,
+            'type': codes.astype(code_dtype),
+            'flowrate': df['Flowrate'].to_numpy(dtype=float_dtype),
+            'pressure': df['Pressure'].to_numpy(dtype=float_dtype),
+            'temperature': df['Temperature'].to_numpy(dtype=float_dtype),
+        }
+
+        target = self.path(dataset.pk)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=target.parent, prefix=f'.{dataset.pk}-'))
+        try:
+            for column, values in columns.items():
+                np.save(staging / f'{column}.npy', values, allow_pickle=False)
+            names.tofile(staging / 'name.bin')
+            (staging / 'types.json').write_text(json.dumps(types.tolist()))
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def load(self, dataset):
+        """
+        Return the type dictionary and memory-mapped column arrays.
+
+        ``name`` is the UTF-8 name blob as bytes; row ``i``'s name spans
+        ``name_offsets[i]:name_offsets[i + 1]``.
+        """
+        import numpy as np
+
+        base = self.path(dataset.pk)
+        types = json.loads((base / 'types.json').read_text())
+        columns = {
+            column: np.load(base / f'{column}.npy', mmap_mode='r', allow_pickle=False)
+            for column in ('name_offsets', 'type') + NUMERIC_FIELDS
+        }
+        # An empty file cannot be memory-mapped
+        columns['name'] = (np.memmap(base / 'name.bin', dtype=np.uint8, mode='r')
+                           if columns['name_offsets'][-1] else np.empty(0, dtype=np.uint8))
+        return types, columns
+
+    def statistics(self, dataset):
+        import numpy as np
+
+        types, columns = self.load(dataset)
+        stats = _empty_statistics()
+        if not len(columns['type']):
+            return stats
+
+        counts = np.bincount(columns['type'], minlength=len(types))
+        stats['type_distribution'] = {
+            name: int(count) for name, count in zip(types, counts) if count
+        }
+        for field in NUMERIC_FIELDS:
+            stats['min_values'][field] = round(float(columns[field].min()), 2)
+            stats['max_values'][field] = round(float(columns[field].max()), 2)
+        return stats
+
+    def iter_rows(self, dataset, limit=None, chunk_size=2000):
+        types, columns = self.load(dataset)
+        total = len(columns['type'])
+        if limit is not None:
+            total = min(total, limit)
+
+        for start in range(0, total, chunk_size):
+            stop = min(start + chunk_size, total)
+            chunk = {column: columns[column][start:stop].tolist() for column in ('type',) + NUMERIC_FIELDS}
+            bounds = columns['name_offsets'][start:stop + 1].tolist()
+            names = columns['name'][bounds[0]:bounds[-1]].tobytes()
+            first = bounds[0]
+            for offset in range(stop - start):
+                yield {
+                    'id': start + offset + 1,
+                    'name': names[bounds[offset] - first:bounds[offset + 1] - first].decode('utf-8'),
+                    'equipment_type': types[chunk['type'][offset]],
+                    'flowrate': chunk['flowrate'][offset],
+                    'pressure': chunk['pressure'][offset],
+                    'temperature': chunk['temperature'][offset],
+                }
+
+    def delete(self, dataset_id):
+        shutil.rmtree(self.path(dataset_id), ignore_errors=True)
+
+
+BACKENDS = {
+    ROWS: RowStorage(),
+    COLUMNAR: ColumnarStorage(),
+}
+
+
+def get_storage(dataset):
+    """Return the backend a dataset was written with."""
+    return BACKENDS[dataset.storage]
+
+
+def default_storage():
+    """Return the backend new uploads are written with."""
+    return BACKENDS[settings.EQUIPMENT_STORAGE_BACKEND]
+
+
+def frame_statistics(df):
+    """Compute type distribution and min/max values from an uploaded DataFrame."""
+    stats = _empty_statistics()
+    if df.empty:
+        return stats
+    counts = df['Type'].astype(str).value_counts()
+    stats['type_distribution'] = {name: int(count) for name, count in counts.items()}
+    for field, column in (('flowrate', 'Flowrate'), ('pressure', 'Pressure'), ('temperature', 'Temperature')):
+        stats['min_values'][field] = round(float(df[column].min()), 2)
+        stats['max_values'][field] = round(float(df[column].max()), 2)
+    return stats
+
+
+def get_statistics(dataset):
+    """
+    Return the dataset's stored statistics.
+
+    They are computed at upload time. Older datasets are computed once from
+    their storage backend and then saved.
+    """
+    if dataset.statistics is None:
+        dataset.statistics = get_storage(dataset).statistics(dataset)
+        type(dataset).all_objects.filter(pk=dataset.pk).update(statistics=dataset.statistics)
+    return dataset.statistics
@@ -0,0 +1,48 @@
+"""
+Minimal in-process background task runner.
+
+Work is handed to a small thread pool so requests can return before slow
+maintenance (purges, renders) finishes. Set ``BACKGROUND_TASKS_EAGER`` to
+run tasks inline, e.g. in tests or one-off management commands.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASK_WORKERS,
+                thread_name_prefix='equipment-task',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+        raise
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func`` in the background pool (or inline when eager)."""
+    if settings.BACKGROUND_TASKS_EAGER:
+        return func(*args, **kwargs)
+    return _get_executor().submit(_run, func, args, kwargs)
@@ -1,16 +1,58 @@
 import io
-from django.test import TestCase
+import itertools
+import json
+import os
+import runpy
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import zipfile
+from datetime import timedelta
+from importlib.util import find_spec
+from unittest import mock
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import EquipmentDataset, Equipment
+from rest_framework.authtoken.models import Token
+from django.utils import timezone
+from .models import EquipmentDataset, Equipment, EquipmentType, ReportJob, StorageUsage
+from . import async_views, authentication, charts, dbpool, metrics, pdf, profiling, replicas, reports, throttling, views
+from .retention import purge_dataset
+from .sqlite import write_transaction
+from .querybudget import QueryBudgetExceeded, query_budget
+from .storage import get_statistics, get_storage
+
+
+def use_temp_media_root(test):
+    """Point MEDIA_ROOT at a temporary directory for the duration of a test."""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return media_root
 
 
 class AuthenticationTest(TestCase):
     """Test authentication endpoints."""
     
     def setUp(self):
+        cache.clear()  # login throttle buckets
         self.client = APIClient()
     
     def test_register_user(self):
@@ -34,6 +76,173 @@ class AuthenticationTest(TestCase):
         self.assertIn('token', response.data)
 
 
+class CachedTokenAuthenticationTest(TestCase):
+    """Test the cached token authentication backend."""
+    
+    def setUp(self):
+        cache.clear()
+        authentication.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.login()
+    
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        return response.data['token']
+    
+    def count_queries(self, url='/api/datasets/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+    
+    def test_cached_lookup_skips_token_query(self):
+        """Test that repeat requests authenticate without the token/user join."""
+        first = self.count_queries()
+        self.assertEqual(self.count_queries(), first - 1)
+        
+        # A process with a cold local cache falls back to the shared cache
+        authentication.clear_local()
+        self.assertEqual(self.count_queries(), first - 1)
+    
+    def test_cached_entry_holds_no_user_row(self):
+        """Test that the shared cache keeps the user's id and flags, not the password hash."""
+        self.count_queries()
+        key = Token.objects.get(user=self.user).key
+        entry = cache.get(f'auth-token:{key}')
+        self.assertEqual(entry['id'], self.user.pk)
+        self.assertTrue(entry['is_active'])
+        self.assertNotIn('password', entry)
+    
+    @override_settings(CACHE_SHARED=False)
+    def test_unshared_cache_not_used(self):
+        """Test that without a shared cache only the per-process cache is used."""
+        first = self.count_queries()
+        self.assertEqual(self.count_queries(), first - 1)
+        authentication.clear_local()
+        self.assertEqual(self.count_queries(), first)
+        key = Token.objects.get(user=self.user).key
+        self.assertIsNone(cache.get(f'auth-token:{key}'))
+    
+    def test_logout_revokes_cached_token(self):
+        """Test that logout deletes the token and drops it from the cache."""
+        self.count_queries()
+        response = self.client.post('/api/auth/logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get('/api/datasets/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a user invalidates their cached token."""
+        self.count_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/datasets/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_token_rotation(self):
+        """Test that a replaced token stops working."""
+        self.count_queries()
+        Token.objects.filter(user=self.user).delete()
+        Token.objects.create(user=self.user)
+        self.assertEqual(self.client.get('/api/datasets/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    @override_settings(AUTH_TOKEN_EXPIRY=3600)
+    def test_token_expiry(self):
+        """Test that expired tokens are rejected and login issues a new one."""
+        old_key = Token.objects.get(user=self.user).key
+        self.count_queries()
+        Token.objects.filter(key=old_key).update(created=timezone.now() - timezone.timedelta(hours=2))
+        cache.clear()
+        authentication.clear_local()
+        
+        response = self.client.get('/api/datasets/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Token.objects.filter(key=old_key).exists())
+        
+        self.assertNotEqual(self.login(), old_key)
+        self.count_queries()
+
+
+@override_settings(AUTH_THROTTLE_IP_RATE='3/min', AUTH_THROTTLE_USERNAME_RATE='2/min')
+class AuthThrottleTest(TestCase):
+    """Test admission control on login and registration."""
+    
+    def setUp(self):
+        cache.clear()
+        throttling.clear_local()
+        self.client = APIClient()
+        User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+    
+    def login(self, username='testuser', ip='10.0.0.1'):
+        return self.client.post('/api/auth/login/', {'username': username, 'password': 'wrong-password'},
+                                REMOTE_ADDR=ip)
+    
+    def test_username_bucket_spans_ips(self):
+        """Test that guessing one account's password from many IPs is throttled."""
+        self.assertEqual(self.login(ip='10.0.0.1').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.login(ip='10.0.0.3')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # 30s until the next token, less the time spent hashing the two earlier attempts
+        self.assertIn(int(response['Retry-After']), range(25, 31))
+        
+        # Other accounts are unaffected
+        self.assertEqual(self.login('someone', ip='10.0.0.4').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_ip_bucket_spans_usernames(self):
+        """Test that one IP cycling through usernames is throttled."""
+        for name in ('a', 'b', 'c'):
+            self.assertEqual(self.login(name).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('d').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newuser', 'email': 'new@example.com', 'password': 'testpass123'
+        }, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_ip_bucket_ignores_forwarded_for(self):
+        """Test that a spoofed X-Forwarded-For does not give a client fresh IP buckets."""
+        for i, name in enumerate(('a', 'b', 'c', 'd')):
+            response = self.client.post('/api/auth/login/', {'username': name, 'password': 'wrong-password'},
+                                        REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    @override_settings(AUTH_THROTTLE_BACKEND='local')
+    def test_bucket_refills_over_time(self):
+        """Test that tokens come back at the configured rate."""
+        with mock.patch('equipment.throttling.time.time', return_value=1000.0):
+            self.login()
+            self.login()
+            self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with mock.patch('equipment.throttling.time.time', return_value=1030.0):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_hashing_slots_exhausted(self):
+        """Test that requests get 503 when every password-hashing slot is busy."""
+        slots = mock.Mock()
+        slots.acquire.return_value = False
+        with mock.patch('equipment.throttling._get_hash_slots', return_value=slots), \
+                mock.patch('django.contrib.auth.authenticate') as authenticate:
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        authenticate.assert_not_called()
+    
+    @override_settings(AUTH_HASH_CONCURRENCY=2)
+    def test_hashing_slots_shared(self):
+        """Test that hashing slots are taken in the shared cache, so every worker sees them."""
+        slots = throttling._get_hash_slots()
+        self.assertIsInstance(slots, throttling.SharedHashSlots)
+        held = [slots.acquire(timeout=0), slots.acquire(timeout=0)]
+        self.assertTrue(all(held))
+        # Another process's view of the same cache
+        self.assertIsNone(throttling.SharedHashSlots(2).acquire(timeout=0))
+        slots.release(held[0])
+        self.assertEqual(throttling.SharedHashSlots(2).acquire(timeout=0), held[0])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
 class CSVUploadTest(TestCase):
     """Test CSV upload functionality."""
     
@@ -50,6 +259,32 @@ class CSVUploadTest(TestCase):
         response = self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['total_count'], 2)
+        self.assertEqual(response.data['equipment_items'][0]['equipment_type'], 'Pump')
+        
+        dataset = EquipmentDataset.objects.get(pk=response.data['id'])
+        self.assertEqual(dataset.statistics['type_distribution'], {'Pump': 1, 'Reactor': 1})
+        self.assertEqual(dataset.statistics['max_values']['flowrate'], 150.5)
+    
+    def test_upload_reuses_equipment_types(self):
+        """Test that type names are stored once in the lookup table."""
+        csv_content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2\nPump-002,Pump,120.0,22.1,40.0"
+        
+        for i in range(2):
+            csv_file = SimpleUploadedFile(f"test{i}.csv", csv_content, content_type="text/csv")
+            self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+        
+        self.assertEqual(list(EquipmentType.objects.values_list('name', flat=True)), ['Pump'])
+        self.assertEqual(Equipment.objects.filter(equipment_type__name='Pump').count(), 4)
+    
+    def test_resolve_inserts_only_new_types(self):
+        """Test that known type names are looked up without an insert."""
+        pump = EquipmentType.objects.create(name='Pump')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EquipmentType.objects.resolve(['Pump']), {'Pump': pump.pk})
+        self.assertEqual(len(queries), 1)
+        
+        types = EquipmentType.objects.resolve(['Pump', 'Valve'])
+        self.assertEqual(types, dict(EquipmentType.objects.values_list('name', 'id')))
     
     def test_upload_invalid_format(self):
         """Test uploading non-CSV file."""
@@ -63,9 +298,99 @@ class CSVUploadTest(TestCase):
         
         for i in range(7):
             csv_file = SimpleUploadedFile(f"test{i}.csv", csv_content, content_type="text/csv")
-            self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
         
         self.assertEqual(EquipmentDataset.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(EquipmentDataset.all_objects.filter(user=self.user).count(), 5)
+        self.assertEqual(Equipment.objects.filter(dataset__user=self.user).count(), 5)
+    
+    @override_settings(DATASET_RETENTION_LIMIT=2)
+    def test_dataset_limit_configurable(self):
+        """Test that the retention limit comes from settings and keeps the newest uploads."""
+        csv_content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2"
+        
+        for i in range(4):
+            csv_file = SimpleUploadedFile(f"test{i}.csv", csv_content, content_type="text/csv")
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+        
+        filenames = list(EquipmentDataset.objects.filter(user=self.user).values_list('filename', flat=True))
+        self.assertEqual(sorted(filenames), ['test2.csv', 'test3.csv'])
+        self.assertEqual(Equipment.objects.count(), 2)
+
+
+class StorageQuotaTest(TestCase):
+    """Test per-user storage quotas."""
+    
+    csv_content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2\nPump-002,Pump,120.0,22.1,40.0"
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+    
+    def upload(self, name='test.csv'):
+        csv_file = SimpleUploadedFile(name, self.csv_content, content_type="text/csv")
+        return self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+    
+    @override_settings(QUOTA_MAX_ROWS=3, UPLOAD_PARSE_CHUNK_ROWS=1)
+    def test_row_quota_rejects_before_insert(self):
+        """Test that an upload over the row quota inserts nothing."""
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+        
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(EquipmentDataset.objects.count(), 1)
+        self.assertEqual(Equipment.objects.count(), 2)
+        
+        usage = self.client.get('/api/usage/').data
+        self.assertEqual(usage['row_count'], 2)
+        self.assertEqual(usage['max_rows'], 3)
+    
+    @override_settings(QUOTA_MAX_BYTES=200)
+    def test_byte_quota(self):
+        """Test that stored bytes are counted against the quota."""
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.upload().status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(StorageUsage.objects.get(user=self.user).byte_count, len(self.csv_content))
+    
+    @override_settings(QUOTA_MAX_ROWS=3)
+    def test_delete_releases_quota(self):
+        """Test that deleting a dataset frees its rows and bytes."""
+        dataset_id = self.upload().data['id']
+        self.client.delete(f'/api/datasets/{dataset_id}/')
+        
+        usage = StorageUsage.objects.get(user=self.user)
+        self.assertEqual((usage.row_count, usage.byte_count), (0, 0))
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+    
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_admin_delete_releases_quota(self):
+        """Test that deleting datasets in the admin goes through retention too."""
+        first, second = self.upload('a.csv').data['id'], self.upload('b.csv').data['id']
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.force_login(admin)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/equipment/equipmentdataset/{first}/delete/', {'post': 'yes'})
+            self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+            response = self.client.post('/admin/equipment/equipmentdataset/', {
+                'action': 'delete_selected', '_selected_action': [second], 'post': 'yes',
+            })
+            self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        
+        self.assertFalse(EquipmentDataset.all_objects.exists())
+        self.assertFalse(Equipment.objects.exists())
+        usage = StorageUsage.objects.get(user=self.user)
+        self.assertEqual((usage.row_count, usage.byte_count), (0, 0))
+    
+    @override_settings(DATASET_RETENTION_LIMIT=1)
+    def test_retention_releases_quota(self):
+        """Test that datasets dropped by retention are released too."""
+        self.upload('a.csv')
+        self.upload('b.csv')
+        self.assertEqual(StorageUsage.objects.get(user=self.user).row_count, 2)
 
 
 class DatasetAPITest(TestCase):
@@ -88,7 +413,7 @@ class DatasetAPITest(TestCase):
         Equipment.objects.create(
             dataset=self.dataset,
             name='Pump-001',
-            equipment_type='Pump',
+            equipment_type=EquipmentType.objects.create(name='Pump'),
             flowrate=150.5,
             pressure=25.3,
             temperature=45.2
@@ -96,7 +421,7 @@ class DatasetAPITest(TestCase):
         Equipment.objects.create(
             dataset=self.dataset,
             name='Reactor-001',
-            equipment_type='Reactor',
+            equipment_type=EquipmentType.objects.create(name='Reactor'),
             flowrate=0,
             pressure=15.8,
             temperature=180.5
@@ -120,12 +445,217 @@ class DatasetAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('type_distribution', response.data)
         self.assertEqual(response.data['type_distribution']['Pump'], 1)
+        self.assertEqual(response.data['min_values']['flowrate'], 0)
+        self.assertEqual(response.data['max_values']['temperature'], 180.5)
+    
+    def test_statistics_computed_once_for_legacy_datasets(self):
+        """Test that statistics missing on older datasets are computed and stored."""
+        self.assertIsNone(self.dataset.statistics)
+        self.client.get(f'/api/datasets/{self.dataset.id}/summary/')
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.statistics['type_distribution'], {'Pump': 1, 'Reactor': 1})
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/datasets/{self.dataset.id}/summary/')
+        self.assertFalse(any('"equipment_equipment"' in q['sql'] for q in queries))
+    
+    def test_delete_dataset_hides_immediately(self):
+        """Test that a deleted dataset disappears before its rows are purged."""
+        response = self.client.delete(f'/api/datasets/{self.dataset.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        
+        self.assertEqual(len(self.client.get('/api/datasets/').data), 0)
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.id}/summary/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.id}/report/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(EquipmentDataset.all_objects.filter(pk=self.dataset.id).exists())
+    
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_delete_dataset_purges_rows_in_batches(self):
+        """Test that the background purge removes rows in bounded batches."""
+        valve = EquipmentType.objects.create(name='Valve')
+        Equipment.objects.bulk_create([
+            Equipment(dataset=self.dataset, name=f'Valve-{i:03d}', equipment_type=valve,
+                      flowrate=1, pressure=2, temperature=3)
+            for i in range(5)
+        ])
+        progress = []
+        EquipmentDataset.objects.filter(pk=self.dataset.pk).update(deleted_at=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            total = purge_dataset(self.dataset.pk, batch_size=3, progress=progress.append)
+        
+        self.assertEqual(total, 7)
+        self.assertEqual(progress, [3, 6, 7])
+        self.assertFalse(Equipment.objects.filter(dataset_id=self.dataset.pk).exists())
+        self.assertFalse(EquipmentDataset.all_objects.filter(pk=self.dataset.pk).exists())
+        # Batches are deleted in place: only the boundary ids are ever read
+        reads = [query['sql'] for query in queries
+                 if query['sql'].startswith('SELECT') and '"equipment_equipment"' in query['sql']]
+        self.assertEqual(len(reads), 3)
+        self.assertTrue(all(sql.startswith('SELECT "equipment_equipment"."id" FROM') for sql in reads))
+
+
+@override_settings(EQUIPMENT_STORAGE_BACKEND='columnar', BACKGROUND_TASKS_EAGER=True)
+class ColumnarStorageTest(TestCase):
+    """Test the columnar storage backend."""
+    
+    def setUp(self):
+        self.media_root = use_temp_media_root(self)
+        
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+        
+        csv_content = (
+            b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+            b"Reactor-001,Reactor,0,15.8,180.5\n"
+            b"Pump-001,Pump,150.5,25.3,45.2\n"
+            b"Pump-002,Pump,120.0,22.1,40.0"
+        )
+        csv_file = SimpleUploadedFile("test.csv", csv_content, content_type="text/csv")
+        response = self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.dataset = EquipmentDataset.objects.get(pk=response.data['id'])
+    
+    def test_upload_stores_columns_not_rows(self):
+        """Test that columnar uploads write column files instead of equipment rows."""
+        self.assertEqual(self.dataset.storage, 'columnar')
+        self.assertFalse(Equipment.objects.exists())
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, 'columnar', str(self.dataset.id), 'flowrate.npy')))
+    
+    def test_detail_and_summary(self):
+        """Test that detail and summary read from the column files."""
+        detail = self.client.get(f'/api/datasets/{self.dataset.id}/').data
+        self.assertEqual([e['name'] for e in detail['equipment_items']], ['Pump-001', 'Pump-002', 'Reactor-001'])
+        self.assertEqual(detail['equipment_items'][2]['equipment_type'], 'Reactor')
+        
+        summary = self.client.get(f'/api/datasets/{self.dataset.id}/summary/').data
+        self.assertEqual(summary['type_distribution'], {'Pump': 2, 'Reactor': 1})
+        self.assertEqual(summary['min_values']['flowrate'], 0)
+        self.assertEqual(summary['max_values']['temperature'], 180.5)
+    
+    def test_names_stored_as_utf8(self):
+        """Test that names are kept as a UTF-8 blob with offsets and read back in any chunking."""
+        names = ['Pompe-é', 'Pump-001', 'Ünit-∆', '']
+        dataset = EquipmentDataset.objects.create(user=self.user, filename='utf8.csv', storage='columnar')
+        storage = get_storage(dataset)
+        storage.write(dataset, pd.DataFrame({
+            'Equipment Name': names, 'Type': 'Pump', 'Flowrate': 1.0, 'Pressure': 2.0, 'Temperature': 3.0,
+        }))
+        base = storage.path(dataset.pk)
+        self.assertEqual((base / 'name.bin').read_bytes(), ''.join(sorted(names)).encode('utf-8'))
+        self.assertFalse((base / 'name.npy').exists())
+        for chunk_size in (1, 3, 10):
+            rows = storage.iter_rows(dataset, chunk_size=chunk_size)
+            self.assertEqual([row['name'] for row in rows], sorted(names))
+    
+    def test_report(self):
+        """Test PDF generation against columnar storage."""
+        response = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+    
+    def test_delete_removes_column_files(self):
+        """Test that purging a columnar dataset removes its files."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/datasets/{self.dataset.id}/')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'columnar', str(self.dataset.id))))
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, DATASET_EXPORT_CHUNK_ROWS=2)
+class DatasetExportTest(TestCase):
+    """Test streaming dataset exports."""
+    
+    csv_content = (
+        b"Equipment Name,Type,Flowrate,Pressure,Temperature\r\n"
+        b"Pump-001,Pump,150.5,25.3,45.2\r\n"
+        b"Pump-002,Pump,120.0,22.1,40.0\r\n"
+        b"Reactor-001,Reactor,0.0,15.8,180.5\r\n"
+    )
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+    
+    def upload(self):
+        csv_file = SimpleUploadedFile("plant data.csv", self.csv_content, content_type="text/csv")
+        response = self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+        return response.data['id']
+    
+    def test_csv_export_round_trips_upload(self):
+        """Test that the CSV export streams the uploaded rows in upload format."""
+        dataset_id = self.upload()
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/', {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="plant_data.csv"', response['Content-Disposition'])
+        
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(b''.join(chunks), self.csv_content)
+    
+    @override_settings(EQUIPMENT_STORAGE_BACKEND='columnar')
+    def test_csv_export_from_columnar_storage(self):
+        """Test exporting a dataset kept in column files."""
+        dataset_id = self.upload()
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/')
+        self.assertEqual(b''.join(response.streaming_content), self.csv_content)
+    
+    @unittest.skipUnless(find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_export(self):
+        """Test the Parquet export, one row group per chunk."""
+        import pyarrow.parquet as pq
+        
+        dataset_id = self.upload()
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/', {'format': 'parquet'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parquet = pq.ParquetFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        table = parquet.read()
+        self.assertEqual(table.column('Equipment Name').to_pylist(), ['Pump-001', 'Pump-002', 'Reactor-001'])
+        self.assertEqual(table.column('Temperature').to_pylist(), [45.2, 40.0, 180.5])
+    
+    @unittest.skipUnless(find_spec('openpyxl'), 'openpyxl is not installed')
+    def test_xlsx_export(self):
+        """Test the XLSX export."""
+        import openpyxl
+        
+        dataset_id = self.upload()
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/', {'format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook['Equipment'].values)
+        self.assertEqual(rows[0], ('Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'))
+        self.assertEqual(rows[3], ('Reactor-001', 'Reactor', 0, 15.8, 180.5))
+    
+    def test_missing_optional_dependency(self):
+        """Test that formats needing an absent package fail with a clear error."""
+        dataset_id = self.upload()
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            response = self.client.get(f'/api/datasets/{dataset_id}/export/', {'format': 'parquet'})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertIn('pyarrow', response.data['error'])
+    
+    def test_invalid_format_and_other_users(self):
+        """Test rejecting unknown formats and other users' datasets."""
+        dataset_id = self.upload()
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/', {'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        other = User.objects.create_user('other', 'other@example.com', 'testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/api/datasets/{dataset_id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
 class PDFReportTest(TestCase):
     """Test PDF report generation."""
     
     def setUp(self):
+        self.media_root = use_temp_media_root(self)
         self.client = APIClient()
         self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
         self.client.force_authenticate(user=self.user)
@@ -141,7 +671,7 @@ class PDFReportTest(TestCase):
         Equipment.objects.create(
             dataset=self.dataset,
             name='Pump-001',
-            equipment_type='Pump',
+            equipment_type=EquipmentType.objects.create(name='Pump'),
             flowrate=150.5,
             pressure=25.3,
             temperature=45.2
@@ -152,3 +682,1037 @@ class PDFReportTest(TestCase):
         response = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['Content-Type'], 'application/pdf')
+    
+    def test_report_rendered_once_and_cached(self):
+        """Test that repeated downloads serve the cached file."""
+        with mock.patch('equipment.reports.build_report', wraps=reports.build_report) as build:
+            first = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+            second = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+        
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(b''.join(first.streaming_content), b''.join(second.streaming_content))
+        self.assertIn('equipment_report_', second['Content-Disposition'])
+        self.assertTrue(reports.report_path(self.dataset.id).exists())
+    
+    @override_settings(REPORT_LISTING_ROWS_PER_TABLE=40, REPORT_LISTING_CHUNK_ROWS=25)
+    def test_full_listing_report(self):
+        """Test that the full listing includes every row across several pages."""
+        pump = EquipmentType.objects.get(name='Pump')
+        Equipment.objects.bulk_create([
+            Equipment(dataset=self.dataset, name=f'Pump-{i:04d}', equipment_type=pump,
+                      flowrate=i, pressure=2, temperature=3)
+            for i in range(2, 201)
+        ])
+        EquipmentDataset.objects.filter(pk=self.dataset.pk).update(total_count=200)
+        
+        preview = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+        full = self.client.get(f'/api/datasets/{self.dataset.id}/report/', {'listing': 'full'})
+        self.assertEqual(full.status_code, status.HTTP_200_OK)
+        
+        count_pages = lambda response: b''.join(response.streaming_content).count(b'/Type /Page\n')
+        self.assertGreater(count_pages(full), count_pages(preview) + 2)
+        self.assertTrue(reports.report_path(self.dataset.id, 'full').exists())
+    
+    def test_report_queries_do_not_grow_with_dataset_size(self):
+        """Test that the report reads stored statistics and only the printed rows."""
+        pump = EquipmentType.objects.get(name='Pump')
+        
+        def report_queries():
+            with CaptureQueriesContext(connection) as queries:
+                reports.build_report(self.dataset, io.BytesIO())
+            return len(queries)
+        
+        get_statistics(self.dataset)
+        small = report_queries()
+        Equipment.objects.bulk_create([
+            Equipment(dataset=self.dataset, name=f'Pump-{i:04d}', equipment_type=pump,
+                      flowrate=i, pressure=2, temperature=3)
+            for i in range(2, 500)
+        ])
+        self.assertEqual(report_queries(), small)
+        self.assertEqual(small, 1)
+    
+    def test_invalid_listing(self):
+        """Test that unknown listing modes are rejected."""
+        response = self.client.get(f'/api/datasets/{self.dataset.id}/report/', {'listing': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_lazy_flowables_pull_on_demand(self):
+        """Test that the flowable queue only buffers a few items ahead."""
+        pulled = []
+        
+        def source():
+            for i in range(100):
+                pulled.append(i)
+                yield i
+        
+        queue = pdf.LazyFlowables(source())
+        self.assertEqual(queue[0], 0)
+        self.assertEqual(len(queue), pdf.LazyFlowables.lookahead)
+        del queue[0]
+        queue.insert(0, 'split')
+        self.assertEqual(queue[:2], ['split', 1])
+        self.assertLessEqual(len(pulled), 4)
+    
+    @override_settings(REPORT_X_ACCEL_REDIRECT_PREFIX='/protected/reports/')
+    def test_report_x_accel_redirect(self):
+        """Test that nginx can be asked to serve the cached file."""
+        response = self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/reports/{reports.report_path(self.dataset.id).name}')
+    
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_delete_removes_cached_report(self):
+        """Test that deleting a dataset removes its cached report."""
+        self.client.get(f'/api/datasets/{self.dataset.id}/report/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/datasets/{self.dataset.id}/')
+        self.assertFalse(reports.report_path(self.dataset.id).exists())
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ChartTest(TestCase):
+    """Test server-side chart rendering."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.dataset = EquipmentDataset.objects.create(
+            user=self.user,
+            filename='test.csv',
+            total_count=3,
+            avg_flowrate=90.17,
+            avg_pressure=21.07,
+            avg_temperature=88.57,
+            statistics={
+                'type_distribution': {'Pump': 2, 'Reactor': 1},
+                'min_values': {'flowrate': 0, 'pressure': 15.8, 'temperature': 40.0},
+                'max_values': {'flowrate': 150.5, 'pressure': 25.3, 'temperature': 180.5},
+            }
+        )
+    
+    def test_svg_chart(self):
+        """Test that charts render as SVG from stored statistics."""
+        for name in charts.CHARTS:
+            with self.assertNumQueries(1):
+                response = self.client.get(f'/api/datasets/{self.dataset.id}/charts/{name}.svg')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'image/svg+xml')
+            self.assertIn(b'<svg', response.content)
+    
+    def test_drawings_and_renderings_are_cached(self):
+        """Test that drawings and rendered bytes are reused."""
+        self.assertIs(charts.get_drawing(self.dataset, 'types'), charts.get_drawing(self.dataset, 'types'))
+        with mock.patch('reportlab.graphics.renderSVG.drawToString', return_value='<svg/>') as render:
+            charts.render_chart(self.dataset, 'averages', 'svg')
+            charts.render_chart(self.dataset, 'averages', 'svg')
+        self.assertEqual(render.call_count, 1)
+    
+    def test_png_without_backend(self):
+        """Test that PNG requests fail cleanly when no raster backend is installed."""
+        with mock.patch('equipment.charts.render_chart', side_effect=charts.ChartRenderError('no backend')):
+            response = self.client.get(f'/api/datasets/{self.dataset.id}/charts/types.png')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+    
+    def test_unknown_chart_and_format(self):
+        """Test validation of chart names and formats."""
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.id}/charts/radar.svg').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.id}/charts/types.gif').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ReportJobTest(TestCase):
+    """Test background report jobs."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+        
+        self.dataset = EquipmentDataset.objects.create(
+            user=self.user,
+            filename='test.csv',
+            total_count=1,
+            avg_flowrate=150.5,
+            avg_pressure=25.3,
+            avg_temperature=45.2
+        )
+        Equipment.objects.create(
+            dataset=self.dataset,
+            name='Pump-001',
+            equipment_type=EquipmentType.objects.create(name='Pump'),
+            flowrate=150.5,
+            pressure=25.3,
+            temperature=45.2
+        )
+    
+    def test_job_renders_and_redirects(self):
+        """Test that a queued job renders the report and then redirects to it."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ReportJob.PENDING)
+        self.assertTrue(reports.report_path(self.dataset.id).exists())
+        
+        poll = self.client.get(response.data['url'], {'redirect': '0'})
+        self.assertEqual(poll.data['status'], ReportJob.DONE)
+        self.assertIn(f'/api/datasets/{self.dataset.id}/report/?sig=', poll.data['report_url'])
+        
+        ready = self.client.get(response.data['url'])
+        self.assertEqual(ready.status_code, status.HTTP_303_SEE_OTHER)
+        self.assertTrue(ready['Location'].startswith(f'/api/datasets/{self.dataset.id}/report/?sig='))
+        
+        # The signed link works without any credentials
+        self.client.force_authenticate(user=None)
+        download = self.client.get(ready['Location'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+    
+    def test_pending_job_reports_status(self):
+        """Test polling a job that has not run yet."""
+        response = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        poll = self.client.get(response.data['url'])
+        self.assertEqual(poll.status_code, status.HTTP_200_OK)
+        self.assertEqual(poll.data['status'], ReportJob.PENDING)
+        self.assertIsNone(poll.data['report_url'])
+    
+    def test_pending_job_reused(self):
+        """Test that asking again while a render is queued joins it instead of queuing another."""
+        first = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        again = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        self.assertEqual(again.data['id'], first.data['id'])
+        full = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/', {'listing': 'full'})
+        self.assertNotEqual(full.data['id'], first.data['id'])
+        
+        # A job stuck for longer than the reuse window is presumed lost
+        ReportJob.objects.filter(pk=first.data['id']).update(created_at=timezone.now() - timedelta(hours=1))
+        retry = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        self.assertNotEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(ReportJob.objects.count(), 3)
+    
+    def test_cached_report_reuses_done_job(self):
+        """Test that requests for an already rendered report return the same finished job."""
+        reports.render_report(self.dataset)
+        first = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        again = self.client.post(f'/api/datasets/{self.dataset.id}/report/jobs/')
+        self.assertEqual(first.data['status'], ReportJob.DONE)
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(ReportJob.objects.count(), 1)
+    
+    def test_job_not_visible_to_other_users(self):
+        """Test that users cannot poll each other's jobs."""
+        job = ReportJob.objects.create(dataset=self.dataset)
+        other = User.objects.create_user('other', 'other@example.com', 'testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/api/reports/jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(REPORT_EXPORT_WORKERS=0)
+class ReportExportTest(TestCase):
+    """Test bulk ZIP export of reports."""
+    
+    def setUp(self):
+        self.media_root = use_temp_media_root(self)
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        pump = EquipmentType.objects.create(name='Pump')
+        self.datasets = []
+        for username in ('alice', 'bob'):
+            user = User.objects.create_user(username, f'{username}@example.com', 'testpass123')
+            dataset = EquipmentDataset.objects.create(
+                user=user, filename=f'{username} readings.csv', total_count=1,
+                avg_flowrate=150.5, avg_pressure=25.3, avg_temperature=45.2
+            )
+            Equipment.objects.create(dataset=dataset, name='Pump-001', equipment_type=pump,
+                                     flowrate=150.5, pressure=25.3, temperature=45.2)
+            self.datasets.append(dataset)
+    
+    def test_admin_downloads_zip_of_reports(self):
+        """Test that the export streams one PDF per dataset, grouped by user."""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/reports/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertTrue(response.streaming)
+        
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), [
+            f'alice/{self.datasets[0].id}-alice_readings.pdf',
+            f'bob/{self.datasets[1].id}-bob_readings.pdf',
+        ])
+        for name in archive.namelist():
+            self.assertTrue(archive.read(name).startswith(b'%PDF'))
+        self.assertTrue(reports.report_path(self.datasets[0].id).exists())
+    
+    def test_export_filters_by_user(self):
+        """Test limiting the export to one user's datasets."""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/reports/export/', {'user': 'bob', 'listing': 'full'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f'bob/{self.datasets[1].id}-bob_readings-full.pdf'])
+    
+    def test_export_requires_admin(self):
+        """Test that regular users cannot export other users' reports."""
+        self.client.force_authenticate(user=self.datasets[0].user)
+        response = self.client.get('/api/reports/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_failed_reports_listed_in_errors_file(self):
+        """Test that one failing report does not abort the export."""
+        real_render = reports.render_report
+        
+        def render(dataset, listing):
+            if dataset.pk == self.datasets[0].pk:
+                raise ValueError('broken dataset')
+            return real_render(dataset, listing)
+        
+        self.client.force_authenticate(user=self.admin)
+        with mock.patch('equipment.reports.render_report', side_effect=render), \
+                self.assertLogs('equipment.exports', level='ERROR'):
+            response = self.client.get('/api/reports/export/')
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+        self.assertIn('broken dataset', archive.read('errors.txt').decode())
+    
+    def test_management_command_writes_zip(self):
+        """Test the export_reports management command."""
+        output = os.path.join(self.media_root, 'export.zip')
+        call_command('export_reports', output, '--user', 'alice', stdout=io.StringIO())
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(archive.namelist(), [f'alice/{self.datasets[0].id}-alice_readings.pdf'])
+
+
+class SignedDownloadURLTest(TestCase):
+    """Test signed report and export download links."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.dataset = EquipmentDataset.objects.create(
+            user=self.user, filename='test.csv', total_count=1,
+            avg_flowrate=150.5, avg_pressure=25.3, avg_temperature=45.2
+        )
+        Equipment.objects.create(dataset=self.dataset, name='Pump-001',
+                                 equipment_type=EquipmentType.objects.create(name='Pump'),
+                                 flowrate=150.5, pressure=25.3, temperature=45.2)
+    
+    def issue(self, **data):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f'/api/datasets/{self.dataset.id}/download-url/', data)
+        self.client.force_authenticate(user=None)
+        return response
+    
+    def test_signed_report_download_without_queries_for_auth(self):
+        """Test that a signed link downloads the report with only the dataset query."""
+        response = self.issue(resource='report')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['expires_in'], 300)
+        reports.render_report(self.dataset)
+        
+        with CaptureQueriesContext(connection) as queries:
+            download = self.client.get(response.data['url'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('equipment_equipmentdataset', queries[0]['sql'])
+    
+    def test_signed_export_download(self):
+        """Test a signed link to a CSV export."""
+        url = self.issue(resource='export', format='csv').data['url']
+        download = self.client.get(url)
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'Equipment Name,Type'))
+    
+    def test_invalid_export_format_rejected(self):
+        """Test that unknown or non-string export formats get 400, not 500."""
+        self.assertEqual(self.issue(resource='export', format='pdf').status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f'/api/datasets/{self.dataset.id}/download-url/',
+                                    {'resource': 'export', 'format': ['csv']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_tampered_or_retargeted_link_rejected(self):
+        """Test that a link only opens the resource it was issued for."""
+        url = self.issue(resource='report').data['url']
+        self.assertEqual(self.client.get(url + 'x').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(url + '&listing=full').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        sig = url.split('sig=')[1]
+        other = f'/api/datasets/{self.dataset.id}/export/?sig={sig}'
+        self.assertEqual(self.client.get(other).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_expired_link_rejected(self):
+        """Test that links stop working after DOWNLOAD_URL_MAX_AGE."""
+        url = self.issue(resource='report').data['url']
+        with override_settings(DOWNLOAD_URL_MAX_AGE=-1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('expired', str(response.data['detail']))
+    
+    def test_raw_token_no_longer_accepted(self):
+        """Test that the old ?auth=<token> parameter is ignored."""
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(f'/api/datasets/{self.dataset.id}/report/', {'auth': token.key})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_cannot_issue_for_other_users_dataset(self):
+        """Test that links are only issued for the caller's own datasets."""
+        other = User.objects.create_user('other', 'other@example.com', 'testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(f'/api/datasets/{self.dataset.id}/download-url/', {'resource': 'report'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(ASGI_BLOCKING_WORKERS=0, BACKGROUND_TASKS_EAGER=True)
+class AsyncViewTest(TestCase):
+    """Test the async view variants served under ASGI."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        cache.clear()
+        authentication.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.token = Token.objects.create(user=self.user).key
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        csv_content = (
+            b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+            b"Pump-001,Pump,150.5,25.3,45.2\n"
+            b"Reactor-001,Reactor,0,15.8,180.5"
+        )
+        csv_file = SimpleUploadedFile("test.csv", csv_content, content_type="text/csv")
+        self.dataset_id = self.client.post('/api/upload/', {'file': csv_file}, format='multipart').data['id']
+        self.factory = AsyncRequestFactory()
+        self.auth = {'Authorization': f'Token {self.token}'}
+    
+    async def test_read_views_match_drf_views(self):
+        """Test that list, detail and summary answer like their DRF counterparts."""
+        cases = [
+            (async_views.dataset_list, '/api/datasets/', {}),
+            (async_views.dataset_detail, f'/api/datasets/{self.dataset_id}/', {'pk': self.dataset_id}),
+            (async_views.dataset_summary, f'/api/datasets/{self.dataset_id}/summary/', {'pk': self.dataset_id}),
+        ]
+        for view, url, kwargs in cases:
+            response = await view(self.factory.get(url, headers=self.auth), **kwargs)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected = await sync_to_async(self.client.get)(url)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+    
+    async def test_requires_token(self):
+        """Test that async views reject missing and unknown tokens."""
+        response = await async_views.dataset_list(self.factory.get('/api/datasets/'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        
+        request = self.factory.get('/', headers={'Authorization': 'Token not-a-token'})
+        response = await async_views.dataset_summary(request, pk=self.dataset_id)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_other_users_dataset_not_found(self):
+        """Test that datasets of other users are not served."""
+        other = await User.objects.acreate(username='other')
+        token = await Token.objects.acreate(user=other)
+        request = self.factory.get('/', headers={'Authorization': f'Token {token.key}'})
+        response = await async_views.dataset_detail(request, pk=self.dataset_id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    async def test_login(self):
+        """Test the async login view."""
+        request = self.factory.post(
+            '/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'},
+            content_type='application/json'
+        )
+        response = await async_views.login_view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['token'], self.token)
+        
+        request = self.factory.post(
+            '/api/auth/login/', {'username': 'testuser', 'password': 'wrong'},
+            content_type='application/json'
+        )
+        response = await async_views.login_view(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_offloaded_export_still_streams(self):
+        """Test that a blocking DRF view's streaming response is consumed asynchronously."""
+        view = async_views.offload(views.DatasetExportView.as_view())
+        request = self.factory.get(f'/api/datasets/{self.dataset_id}/export/', headers=self.auth)
+        response = await view(request, pk=self.dataset_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertTrue(content.startswith(b'Equipment Name,Type'))
+        self.assertIn(b'Reactor-001,Reactor', content)
+
+
+class StartupImportTest(unittest.TestCase):
+    """Test that worker startup does not load the heavy libraries."""
+    heavy_modules = ('pandas', 'numpy', 'reportlab', 'pyarrow', 'openpyxl')
+    # Loading the URLconf (and with it every view) must stay under this budget
+    budget_ms = int(os.getenv('IMPORT_TIME_BUDGET_MS', '400'))
+    
+    def import_times(self):
+        """Run ``python -X importtime`` on a worker's imports; map module -> cumulative ms."""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             'import django; django.setup(); import config.wsgi, config.urls'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings'),
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, module = line.split('|')
+            times[module.strip()] = int(cumulative) / 1000
+        return times
+    
+    def test_heavy_libraries_not_imported(self):
+        """Test that pandas, NumPy and ReportLab are only imported on first use."""
+        times = self.import_times()
+        loaded = [module for module in times if module.split('.')[0] in self.heavy_modules]
+        self.assertEqual(loaded, [])
+    
+    def test_import_time_budget(self):
+        """Test that importing the URLconf stays within the budget (best of three runs)."""
+        best = min(self.import_times()['config.urls'] for _ in range(3))
+        self.assertLess(best, self.budget_ms)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0)
+class ProfilingMiddlewareTest(TestCase):
+    """Test Server-Timing profiling and slow request logging."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=self.user)
+    
+    def upload(self):
+        csv_content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2"
+        csv_file = SimpleUploadedFile("test.csv", csv_content, content_type="text/csv")
+        return self.client.post('/api/upload/', {'file': csv_file}, format='multipart')
+    
+    def timings(self, response):
+        """Parse a Server-Timing header into {name: (duration, description)}."""
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            entries[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+        return entries
+    
+    def test_upload_phases(self):
+        """Test that sampled uploads report total, database and phase timings."""
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        timings = self.timings(response)
+        for name in ('total', 'db', 'parse', 'stats', 'store', 'serialize'):
+            self.assertIn(name, timings)
+        self.assertGreater(int(timings['db'][1].split()[0]), 0)
+        self.assertGreaterEqual(timings['total'][0], timings['parse'][0])
+    
+    def test_report_render_phase(self):
+        """Test that report downloads report their render phase."""
+        dataset_id = self.upload().data['id']
+        response = self.client.get(f'/api/datasets/{dataset_id}/report/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('render', self.timings(response))
+    
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_MS=1)
+    def test_slow_requests_logged_without_sampling(self):
+        """Test that slow requests are logged while unsampled ones get no header."""
+        # Every clock read is two seconds after the previous one
+        with mock.patch('equipment.profiling.time.perf_counter', side_effect=itertools.count(0, 2.0)):
+            with self.assertLogs('equipment.profiling', level='WARNING') as logs:
+                response = self.client.get('/api/datasets/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('Slow request GET /api/datasets/: 200 in ', logs.output[0])
+    
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        """Test that the middleware is skipped when sampling and slow logging are off."""
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+        self.assertNotIn('Server-Timing', self.client.get('/api/datasets/'))
+    
+    def test_phase_outside_sampled_request(self):
+        """Test that phases outside a sampled request are no-ops."""
+        with profiling.phase('parse'):
+            pass
+        self.assertIsNone(profiling._current.get())
+    
+    async def test_async_middleware(self):
+        """Test that the middleware profiles async views too."""
+        async def view(request):
+            await EquipmentDataset.objects.acount()
+            with profiling.phase('serialize'):
+                return HttpResponse()
+        
+        middleware = profiling.ProfilingMiddleware(view)
+        response = await middleware(AsyncRequestFactory().get('/'))
+        timings = self.timings(response)
+        self.assertEqual(timings['db'][1], '1 queries')
+        self.assertIn('serialize', timings)
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    """Test the metrics registry and its Prometheus text output."""
+    
+    def make_registry(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter('test_events_total', 'Events.', ['kind'], registry=registry)
+        histogram = metrics.Histogram('test_seconds', 'Durations.', buckets=(0.1, 1), registry=registry)
+        return registry, counter, histogram
+    
+    def test_exposition(self):
+        """Test counter and cumulative histogram lines."""
+        registry, counter, histogram = self.make_registry()
+        counter.inc(kind='a')
+        counter.inc(2, kind='b"c')
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        
+        lines = registry.exposition().splitlines()
+        self.assertIn('# TYPE test_events_total counter', lines)
+        self.assertIn('test_events_total{kind="a"} 1', lines)
+        self.assertIn('test_events_total{kind="b\\"c"} 2', lines)
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum 5.55', lines)
+        self.assertIn('test_seconds_count 3', lines)
+    
+    def test_labels_checked(self):
+        """Test that wrong label names are rejected."""
+        _, counter, _ = self.make_registry()
+        with self.assertRaises(ValueError):
+            counter.inc(other='a')
+    
+    def test_multiprocess_aggregation(self):
+        """Test that every process's snapshot is summed."""
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        with override_settings(METRICS_DIR=metrics_dir, METRICS_FLUSH_INTERVAL=3600):
+            first, first_counter, first_histogram = self.make_registry()
+            second, second_counter, _ = self.make_registry()
+            first_counter.inc(kind='a')
+            first_counter.inc(kind='a')
+            first_histogram.observe(0.5)
+            second_counter.inc(3, kind='a')
+            second.flush()
+            
+            # Each process writes one file; collecting flushes the caller's own values
+            totals = first.collect()
+            self.assertEqual(len(os.listdir(metrics_dir)), 2)
+        self.assertEqual(totals['test_events_total'][('a',)], 5)
+        self.assertEqual(totals['test_seconds'][()], [0, 1, 0.5, 1])
+    
+    def test_forked_process_starts_empty(self):
+        """Test that a forked worker does not report its parent's values."""
+        registry, counter, _ = self.make_registry()
+        counter.inc(kind='a')
+        with mock.patch('equipment.metrics.os.getpid', return_value=os.getpid() + 1):
+            counter.inc(kind='b')
+            self.assertEqual(registry.collect()['test_events_total'], {('b',): 1})
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, METRICS_DIR='')
+class MetricsEndpointTest(TestCase):
+    """Test instrumentation and the /api/metrics/ endpoint."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.force_authenticate(user=self.admin)
+    
+    def value(self, name, labels=()):
+        return metrics.REGISTRY.collect()[name].get(labels, 0)
+    
+    def test_upload_summary_and_report_instrumented(self):
+        """Test that uploads, summaries and report cache lookups are recorded."""
+        rows = self.value('equipment_ingest_rows_total')
+        uploads = self.value('equipment_upload_bytes', ())
+        uploads = uploads[-1] if uploads else 0
+        misses = self.value('equipment_cache_requests_total', ('report', 'miss'))
+        hits = self.value('equipment_cache_requests_total', ('report', 'hit'))
+        
+        csv_content = b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2\nPump-002,Pump,120.0,22.1,40.0"
+        csv_file = SimpleUploadedFile("test.csv", csv_content, content_type="text/csv")
+        dataset_id = self.client.post('/api/upload/', {'file': csv_file}, format='multipart').data['id']
+        self.client.get(f'/api/datasets/{dataset_id}/summary/')
+        self.client.get(f'/api/datasets/{dataset_id}/report/')
+        self.client.get(f'/api/datasets/{dataset_id}/report/')
+        
+        self.assertEqual(self.value('equipment_ingest_rows_total'), rows + 2)
+        self.assertEqual(self.value('equipment_upload_bytes')[-1], uploads + 1)
+        self.assertEqual(self.value('equipment_cache_requests_total', ('report', 'miss')), misses + 1)
+        self.assertEqual(self.value('equipment_cache_requests_total', ('report', 'hit')), hits + 1)
+        self.assertGreater(self.value('equipment_summary_seconds')[-1], 0)
+        self.assertGreater(self.value('equipment_upload_phase_seconds', ('parse',))[-1], 0)
+        self.assertGreater(self.value('equipment_report_render_seconds', ('preview',))[-1], 0)
+    
+    def test_endpoint(self):
+        """Test the Prometheus text output of the endpoint."""
+        metrics.INGEST_ROWS.inc(0)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn(b'# TYPE equipment_ingest_rows_total counter', response.content)
+        self.assertIn(b'# TYPE equipment_upload_phase_seconds histogram', response.content)
+    
+    def test_admin_only(self):
+        """Test that non-admin users cannot read metrics."""
+        user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(QUERY_BUDGETS='raise')
+class QueryBudgetTest(TestCase):
+    """Test per-view query budgets and N+1 detection."""
+    
+    def setUp(self):
+        self.types = [EquipmentType.objects.create(name=f'Type-{i}') for i in range(3)]
+    
+    def test_within_budget(self):
+        """Test that work inside the budget is counted and passes."""
+        with query_budget(queries=2, rows=3) as budget:
+            list(EquipmentType.objects.all())
+        self.assertEqual(budget.executed, 1)
+        self.assertEqual(budget.fetched, 3)
+    
+    def test_query_ceiling(self):
+        """Test that running more queries than declared raises."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, '2 queries (budget 1)'):
+            with query_budget(queries=1):
+                EquipmentType.objects.count()
+                EquipmentType.objects.exists()
+    
+    def test_repeated_query(self):
+        """Test that the N+1 pattern is reported even within the query ceiling."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'the same query ran 3 times'):
+            with query_budget(queries=10):
+                for equipment_type in self.types:
+                    EquipmentType.objects.get(pk=equipment_type.pk)
+    
+    def test_row_limit(self):
+        """Test that fetching more rows than declared raises."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3 rows fetched (budget 2)'):
+            with query_budget(queries=1, rows=2):
+                list(EquipmentType.objects.all())
+    
+    @override_settings(QUERY_BUDGETS='log')
+    def test_log_mode(self):
+        """Test that log mode warns instead of raising."""
+        with self.assertLogs('equipment.querybudget', 'WARNING') as logs:
+            with query_budget(queries=0, name='counting'):
+                EquipmentType.objects.count()
+        self.assertIn('counting went over its query budget', logs.output[0])
+    
+    @override_settings(QUERY_BUDGETS='off')
+    def test_off(self):
+        """Test that budgets are not checked when switched off."""
+        with query_budget(queries=0):
+            EquipmentType.objects.count()
+    
+    def test_writes_only_log(self):
+        """Test that a budget that saw a committed write logs instead of raising."""
+        with self.assertLogs('equipment.querybudget', 'WARNING'):
+            with query_budget(queries=0):
+                EquipmentType.objects.create(name='Type-new')
+        self.assertTrue(EquipmentType.objects.filter(name='Type-new').exists())
+    
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_sample_upload(self):
+        """Test that uploading the sample CSV stays within the upload budget."""
+        use_temp_media_root(self)
+        user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        path = os.path.join(settings.BASE_DIR.parent, 'sample_equipment_data.csv')
+        with open(path, 'rb') as csv_file:
+            response = client.post('/api/upload/', {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_count'], 15)
+    
+    def test_view_decorator(self):
+        """Test that decorated views, sync and async, are checked under their own name."""
+        @query_budget(queries=0)
+        def sync_view(request):
+            return EquipmentType.objects.count()
+        
+        @query_budget(queries=0)
+        async def async_view(request):
+            return await EquipmentType.objects.acount()
+        
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'sync_view went over'):
+            sync_view(None)
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'async_view went over'):
+            async_to_sync(async_view)(None)
+    
+    def test_endpoints_have_budgets(self):
+        """Test that every API endpoint declares a budget."""
+        from .urls import urlpatterns
+        for pattern in urlpatterns:
+            self.assertTrue(hasattr(pattern.callback, '__wrapped__'), pattern.name)
+
+
+class SQLiteProfileTest(TestCase):
+    """Test the SQLite connection profile."""
+    
+    def open(self, path):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': path, 'OPTIONS': {}})
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+    
+    def use(self, wrapper):
+        """Run ``write_transaction()`` and ``atomic()`` without ``using`` on ``wrapper``."""
+        patcher = mock.patch('django.db.transaction.get_connection', return_value=wrapper)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    @override_settings(SQLITE_BUSY_TIMEOUT_MS=50)
+    def test_pragmas(self):
+        """Test that new connections use WAL, a busy timeout and a larger page cache."""
+        path = os.path.join(tempfile.mkdtemp(), 'profile.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        wrapper = self.open(path)
+        
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 50)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -settings.SQLITE_CACHE_SIZE_KB)
+    
+    @override_settings(SQLITE_BUSY_TIMEOUT_MS=50)
+    def test_write_transaction(self):
+        """Test that only write_transaction() takes the write lock as it begins, and that it commits."""
+        path = os.path.join(tempfile.mkdtemp(), 'profile.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        first, second = self.open(path), self.open(path)
+        first.connection.execute('CREATE TABLE t (x INTEGER)')
+        self.use(first)
+        callbacks = []
+        
+        with transaction.atomic():
+            first.cursor().execute('SELECT * FROM t')
+            second.connection.execute('BEGIN IMMEDIATE')  # reads leave the lock free
+            second.connection.execute('ROLLBACK')
+        
+        with write_transaction():
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                second.connection.execute('BEGIN IMMEDIATE')
+            first.cursor().execute('INSERT INTO t VALUES (1)')
+            transaction.on_commit(lambda: callbacks.append(1))
+            self.assertEqual(callbacks, [])
+        self.assertEqual(callbacks, [1])
+        self.assertTrue(first.get_autocommit())
+        self.assertEqual(second.connection.execute('SELECT x FROM t').fetchall(), [(1,)])
+        
+        with self.assertRaises(ValueError), write_transaction():
+            first.cursor().execute('INSERT INTO t VALUES (2)')
+            raise ValueError
+        self.assertTrue(first.get_autocommit())
+        self.assertEqual(second.connection.execute('SELECT x FROM t').fetchall(), [(1,)])
+    
+    @override_settings(SQLITE_PROFILE=False)
+    def test_disabled(self):
+        """Test that SQLite defaults are kept with the profile off."""
+        path = os.path.join(tempfile.mkdtemp(), 'default.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        wrapper = self.open(path)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)  # the sqlite3 module's default timeout
+
+
+class ReplicaRoutingTest(TestCase):
+    """Test read-replica routing and stickiness."""
+    
+    def setUp(self):
+        use_temp_media_root(self)
+        cache.clear()
+        self.router = replicas.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass123')
+        # stick() only records pins when a replica is configured
+        databases = mock.patch.dict(settings.DATABASES, {replicas.REPLICA: settings.DATABASES['default']})
+        databases.start()
+        self.addCleanup(databases.stop)
+    
+    def route(self, method='get', write=False, user=None):
+        """Return where a replica_reads view reads a dataset from."""
+        @replicas.replica_reads
+        def view(request):
+            if write:
+                self.router.db_for_write(EquipmentDataset)
+            return HttpResponse(self.router.db_for_read(EquipmentDataset))
+        
+        request = getattr(self.factory, method)('/')
+        request.user = user or self.user
+        return view(request).content.decode()
+    
+    def test_safe_reads(self):
+        """Test that GET reads of app models go to the replica, other reads to the primary."""
+        self.assertEqual(self.route(), 'replica')
+        self.assertEqual(self.route('head'), 'replica')
+        self.assertEqual(self.route('post'), 'default')
+        self.assertEqual(self.router.db_for_read(EquipmentDataset), 'default')
+        
+        @replicas.replica_reads
+        def view(request):
+            return HttpResponse(self.router.db_for_read(User))
+        request = self.factory.get('/')
+        request.user = self.user
+        self.assertEqual(view(request).content, b'default')
+    
+    def test_read_after_write(self):
+        """Test that a request reads from the primary once it has written."""
+        self.assertEqual(self.route(write=True), 'default')
+        self.assertEqual(self.router.db_for_write(EquipmentDataset), 'default')
+    
+    def test_sticky_after_upload(self):
+        """Test that an upload pins the uploader, and only them, to the primary."""
+        other = User.objects.create_user('other', 'other@example.com', 'testpass123')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        csv_file = SimpleUploadedFile("test.csv", b"Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-001,Pump,150.5,25.3,45.2")
+        self.assertEqual(client.post('/api/upload/', {'file': csv_file}, format='multipart').status_code, 201)
+        
+        self.assertEqual(self.route(), 'default')
+        self.assertEqual(self.route(user=other), 'replica')
+        
+        # Signed links name their user explicitly
+        @replicas.replica_reads
+        def view(request):
+            replicas.identify(self.user.pk)
+            return HttpResponse(self.router.db_for_read(EquipmentDataset))
+        self.assertEqual(view(self.factory.get('/')).content, b'default')
+    
+    def test_streaming_and_async(self):
+        """Test that streamed content and async views keep the request's routing."""
+        @replicas.replica_reads
+        def stream(request):
+            return StreamingHttpResponse(self.router.db_for_read(EquipmentDataset) for _ in range(2))
+        
+        @replicas.replica_reads
+        async def async_view(request):
+            return HttpResponse(await sync_to_async(self.router.db_for_read)(EquipmentDataset))
+        
+        request = self.factory.get('/')
+        request.user = self.user
+        self.assertEqual(b''.join(stream(request).streaming_content), b'replicareplica')
+        self.assertEqual(async_to_sync(async_view)(request).content, b'replica')
+    
+    def test_migrations_on_primary_only(self):
+        """Test that migrations only run on the primary."""
+        self.assertTrue(self.router.allow_migrate('default', 'equipment'))
+        self.assertFalse(self.router.allow_migrate(replicas.REPLICA, 'equipment'))
+    
+    def test_replica_needs_shared_cache(self):
+        """Test that settings refuse a replica when pins would only be seen by one process."""
+        path = str(settings.BASE_DIR / 'config' / 'settings.py')
+        env = {'DATABASE_REPLICA_URL': 'sqlite:///replica.sqlite3'}
+        with mock.patch.dict(os.environ, {**env, 'CACHE_URL': 'locmem://'}):
+            with self.assertRaises(ImproperlyConfigured):
+                runpy.run_path(path)
+        with mock.patch.dict(os.environ, env):
+            self.assertIn(replicas.REPLICA, runpy.run_path(path)['DATABASES'])
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """Test the database connection pool and the pooled SQLite stand-in backend."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'pool.sqlite3')
+    
+    def connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path, check_same_thread=False)
+    
+    def pool(self, **options):
+        options = {**dbpool.DEFAULTS, **options}
+        return dbpool.ConnectionPool(f'test-{id(self)}', **options)
+    
+    def value(self, metric, *labels):
+        return metrics.REGISTRY.collect()[metric.name].get(labels, 0)
+    
+    def test_reuse_and_rollback(self):
+        """Test that returned connections are rolled back and handed out again."""
+        pool = self.pool()
+        connection = pool.getconn(self.connect)
+        connection.execute('CREATE TABLE t (x)')
+        connection.execute('INSERT INTO t VALUES (1)')
+        self.assertTrue(connection.in_transaction)
+        pool.putconn(connection)
+        
+        self.assertIs(pool.getconn(self.connect), connection)
+        self.assertFalse(connection.in_transaction)
+        self.assertEqual(pool.stats(), {'size': 1, 'idle': 0, 'max_size': 4})
+    
+    def test_timeout(self):
+        """Test that checkouts from a full pool wait, then fail."""
+        pool = self.pool(max_size=1, timeout=0.05)
+        timeouts = self.value(metrics.DB_POOL_CHECKOUTS, pool.alias, 'timeout')
+        connection = pool.getconn(self.connect)
+        with self.assertRaises(dbpool.PoolTimeout):
+            pool.getconn(self.connect)
+        self.assertEqual(self.value(metrics.DB_POOL_CHECKOUTS, pool.alias, 'timeout'), timeouts + 1)
+        
+        threading.Timer(0.01, pool.putconn, [connection]).start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(self.connect), connection)
+    
+    def test_health_check_and_lifetime(self):
+        """Test that broken and expired connections are replaced."""
+        pool = self.pool(check_after=0)
+        broken = pool.getconn(self.connect)
+        pool.putconn(broken)
+        broken.close()
+        replacement = pool.getconn(self.connect)
+        self.assertIsNot(replacement, broken)
+        self.assertEqual(self.value(metrics.DB_POOL_HEALTH_CHECK_FAILURES, pool.alias), 1)
+        self.assertEqual(self.value(metrics.DB_POOL_CONNECTIONS, pool.alias, 'closed'), 1)
+        
+        pool.max_lifetime = 0
+        pool.putconn(replacement)
+        self.assertEqual(pool.stats()['size'], 0)
+    
+    def test_pooled_backend(self):
+        """Test that the pooled SQLite backend connects and closes through its pool."""
+        from .pooled_sqlite.base import DatabaseWrapper
+        settings_dict = {
+            **connection.settings_dict, 'NAME': self.path,
+            'OPTIONS': {'pool': {'max_size': 1, 'timeout': 0.05}},
+        }
+        self.addCleanup(dbpool._pools.pop, ('pooled', self.path, os.getpid()), None)
+        first = DatabaseWrapper(settings_dict, alias='pooled')
+        second = DatabaseWrapper(settings_dict, alias='pooled')
+        first.ensure_connection()
+        raw = first.connection
+        with self.assertRaises(dbpool.PoolTimeout):
+            second.ensure_connection()
+        
+        first.close()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+        second.close()
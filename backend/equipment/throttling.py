@@ -0,0 +1,196 @@
+"""
+Admission control for the password-hashing endpoints.
+
+Login and registration hash passwords with PBKDF2, which is slow on purpose.
+Two things keep bursts of them from tying up every worker:
+
+* Token-bucket throttles per client IP and per username. A bucket holds up
+  to N tokens and refills at N per period (``'10/min'``), so short bursts
+  pass and sustained floods get 429 with ``Retry-After``. Buckets live in
+  the Django cache (``AUTH_THROTTLE_BACKEND = 'cache'``), which every
+  worker shares unless ``CACHE_URL`` is ``locmem://``. Cache updates are
+  read-modify-write, so concurrent processes may let a few extra requests
+  through; this is a load guard, not an exact counter. ``'local'`` keeps
+  them in process memory, which only holds the configured rate with a
+  single worker process: with N workers a client gets up to N times it.
+  The client IP is DRF's ``get_ident``: ``REMOTE_ADDR``, or the address
+  ``NUM_PROXIES`` trusted proxies put in ``X-Forwarded-For``, never a value
+  the client chose.
+* About ``AUTH_HASH_CONCURRENCY`` concurrent password hashes. With a
+  shared cache the slots are cache keys taken with ``add``, which is atomic
+  on redis and memcached, so there the cap holds across workers. On the
+  file and database caches ``add`` checks and then writes, so workers
+  racing for the last slot may both get it: the cap is best-effort, like
+  the buckets. A slot left behind by a killed worker frees itself after
+  ``HASH_SLOT_TTL`` seconds. Without a shared cache it is a per-process
+  semaphore.
+  Requests wait up to ``AUTH_HASH_WAIT`` seconds for a slot and otherwise
+  get 503, leaving threads free for other traffic.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions, status
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+LOCAL_BUCKETS_MAX = 10000
+HASH_SLOT_TTL = 60
+HASH_SLOT_POLL = 0.05
+
+_local_buckets = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Parse ``'<tokens>/<period>'`` into ``(capacity, tokens per second)``."""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+def _refill(bucket, capacity, refill_rate, now):
+    tokens, updated = bucket if bucket else (capacity, now)
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+def take_token(key, rate):
+    """
+    Take a token from bucket ``key``.
+
+    Returns 0 when the request may go ahead, otherwise the seconds until the
+    next token is available.
+    """
+    capacity, refill_rate = parse_rate(rate)
+    now = time.time()
+
+    if settings.AUTH_THROTTLE_BACKEND == 'local':
+        with _local_lock:
+            tokens = _refill(_local_buckets.get(key), capacity, refill_rate, now)
+            allowed = tokens >= 1
+            _local_buckets[key] = (tokens - 1 if allowed else tokens, now)
+            _local_buckets.move_to_end(key)
+            while len(_local_buckets) > LOCAL_BUCKETS_MAX:
+                _local_buckets.popitem(last=False)
+    else:
+        tokens = _refill(cache.get(key), capacity, refill_rate, now)
+        allowed = tokens >= 1
+        # Keep the entry until a full bucket would have refilled anyway
+        cache.set(key, (tokens - 1 if allowed else tokens, now), timeout=int(capacity / refill_rate) + 1)
+
+    return 0 if allowed else (1 - tokens) / refill_rate
+
+
+def clear_local():
+    global _hash_slots
+    with _local_lock:
+        _local_buckets.clear()
+    with _hash_slots_lock:
+        _hash_slots = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle backed by ``take_token``; subclasses pick the bucket key."""
+    rate_setting = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key = self.get_key(request)
+        if key is None:
+            return True
+        self._wait = take_token(f'auth-throttle:{type(self).__name__}:{key}',
+                                getattr(settings, self.rate_setting))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class AuthIPThrottle(TokenBucketThrottle):
+    """Login/registration attempts per client IP."""
+    rate_setting = 'AUTH_THROTTLE_IP_RATE'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class AuthUsernameThrottle(TokenBucketThrottle):
+    """Login/registration attempts per username, whichever IPs they come from."""
+    rate_setting = 'AUTH_THROTTLE_USERNAME_RATE'
+
+    def get_key(self, request):
+        username = request.data.get('username')
+        return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+class AuthBusy(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, please retry shortly.'
+    default_code = 'auth_busy'
+
+
+class LocalHashSlots:
+    """``AUTH_HASH_CONCURRENCY`` slots for this process."""
+
+    def __init__(self, count):
+        self._semaphore = threading.BoundedSemaphore(count)
+
+    def acquire(self, timeout):
+        return self._semaphore.acquire(timeout=timeout)
+
+    def release(self, slot):
+        self._semaphore.release()
+
+
+class SharedHashSlots:
+    """``AUTH_HASH_CONCURRENCY`` slots for every process sharing the Django cache (best-effort, see above)."""
+
+    def __init__(self, count):
+        self.keys = [f'auth-hash-slot:{i}' for i in range(count)]
+
+    def acquire(self, timeout):
+        """Return the key of a free slot, or ``None`` after ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            for key in self.keys:
+                if cache.add(key, True, timeout=HASH_SLOT_TTL):
+                    return key
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(HASH_SLOT_POLL)
+
+    def release(self, slot):
+        cache.delete(slot)
+
+
+_hash_slots = None
+_hash_slots_lock = threading.Lock()
+
+
+def _get_hash_slots():
+    global _hash_slots
+    with _hash_slots_lock:
+        if _hash_slots is None:
+            slots = SharedHashSlots if settings.CACHE_SHARED else LocalHashSlots
+            _hash_slots = slots(settings.AUTH_HASH_CONCURRENCY)
+        return _hash_slots
+
+
+@contextmanager
+def password_hashing_slot():
+    """Hold one of the ``AUTH_HASH_CONCURRENCY`` password-hashing slots."""
+    slots = _get_hash_slots()
+    slot = slots.acquire(timeout=settings.AUTH_HASH_WAIT)
+    if not slot:
+        raise AuthBusy()
+    try:
+        yield
+    finally:
+        slots.release(slot)
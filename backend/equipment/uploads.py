@@ -0,0 +1,29 @@
+"""
+CSV parsing for uploads, with pandas.
+
+Only ``CSVUploadView`` imports this module, when the first upload arrives,
+so workers that never parse a file do not load pandas.
+"""
+
+import pandas as pd
+from django.conf import settings
+
+from . import quotas
+
+EmptyDataError = pd.errors.EmptyDataError
+
+
+def read_csv(csv_file, usage):
+    """
+    Parse an uploaded CSV into a DataFrame.
+
+    Reads in chunks and stops as soon as the rows exceed ``usage``'s quota
+    (``quotas.QuotaExceeded``).
+    """
+    chunks = []
+    parsed_rows = 0
+    for chunk in pd.read_csv(csv_file, chunksize=settings.UPLOAD_PARSE_CHUNK_ROWS):
+        parsed_rows += len(chunk)
+        quotas.check(usage, rows=parsed_rows, nbytes=csv_file.size)
+        chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True)
@@ -1,17 +1,53 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+from .querybudget import query_budget
+from .replicas import replica_reads
+
+
+def light(sync_view, async_view, replica=False, **budget):
+    """Under ASGI (ASYNC_VIEWS) serve the async variant, else the DRF view."""
+    view = async_view if settings.ASYNC_VIEWS else sync_view
+    return query_budget(**budget)(replica_reads(view) if replica else view)
+
+
+def blocking(view, replica=False, **budget):
+    """Under ASGI (ASYNC_VIEWS) run a blocking DRF view on the worker threads."""
+    view = query_budget(**budget)(replica_reads(view) if replica else view)
+    return async_views.offload(view) if settings.ASYNC_VIEWS else view
+
+
+# Query budgets (see querybudget.py). Views reading a whole dataset by design
+# (detail, export, reports) leave rows uncapped, as does the upload, whose
+# response lists every stored row; its queries are uncapped too since bulk
+# inserts are batched by file size. Budgets leave room
+# for the token lookup when the token cache misses. replica=True marks the safe
+# endpoints that may read from the read replica (see replicas.py).
+LIST_ROWS = settings.DATASET_RETENTION_LIMIT + 2
+
 
 urlpatterns = [
     # Authentication
-    path('auth/register/', views.RegisterView.as_view(), name='register'),
-    path('auth/login/', views.login_view, name='login'),
+    path('auth/register/', blocking(views.RegisterView.as_view(), queries=8, rows=2), name='register'),
+    path('auth/login/', light(views.login_view, async_views.login_view, queries=6, rows=2), name='login'),
+    path('auth/logout/', blocking(views.logout_view, queries=3, rows=2), name='logout'),
     
     # CSV Upload
-    path('upload/', views.CSVUploadView.as_view(), name='csv-upload'),
+    path('upload/', blocking(views.CSVUploadView.as_view(), queries=None), name='csv-upload'),
+    path('usage/', blocking(views.StorageUsageView.as_view(), queries=2, rows=2), name='storage-usage'),
     
     # Datasets
-    path('datasets/', views.DatasetListView.as_view(), name='dataset-list'),
-    path('datasets/<int:pk>/', views.DatasetDetailView.as_view(), name='dataset-detail'),
-    path('datasets/<int:pk>/summary/', views.DatasetSummaryView.as_view(), name='dataset-summary'),
-    path('datasets/<int:pk>/report/', views.GeneratePDFReportView.as_view(), name='dataset-report'),
+    path('datasets/', light(views.DatasetListView.as_view(), async_views.dataset_list, replica=True, queries=5, rows=LIST_ROWS), name='dataset-list'),
+    path('datasets/<int:pk>/', light(views.DatasetDetailView.as_view(), async_views.dataset_detail, replica=True, queries=8), name='dataset-detail'),
+    path('datasets/<int:pk>/summary/', light(views.DatasetSummaryView.as_view(), async_views.dataset_summary, replica=True, queries=7, rows=200), name='dataset-summary'),
+    path('datasets/<int:pk>/charts/<slug:chart>.<slug:fmt>', blocking(views.DatasetChartView.as_view(), replica=True, queries=3, rows=2), name='dataset-chart'),
+    path('datasets/<int:pk>/download-url/', blocking(views.DownloadURLView.as_view(), queries=2, rows=2), name='dataset-download-url'),
+    path('datasets/<int:pk>/export/', blocking(views.DatasetExportView.as_view(), replica=True, queries=2), name='dataset-export'),
+    path('datasets/<int:pk>/report/', blocking(views.GeneratePDFReportView.as_view(), replica=True, queries=8), name='dataset-report'),
+    path('datasets/<int:pk>/report/jobs/', blocking(views.ReportJobCreateView.as_view(), queries=3, rows=2), name='report-job-create'),
+    path('reports/jobs/<uuid:job_id>/', blocking(views.ReportJobDetailView.as_view(), queries=2, rows=2), name='report-job-detail'),
+    path('reports/export/', blocking(views.ReportExportView.as_view(), queries=3), name='report-export'),
+    
+    # Monitoring
+    path('metrics/', blocking(views.MetricsView.as_view(), queries=2, rows=2), name='metrics'),
 ]
@@ -1,39 +1,50 @@
-import io
-import pandas as pd
-from django.http import HttpResponse
-from django.db.models import Count
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.contrib.auth.models import User
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 
-from .models import EquipmentDataset, Equipment
+from . import charts, downloads, exports, metrics, quotas, replicas, reports, tasks
+from .profiling import phase
+from .authentication import get_token
+from .throttling import AuthIPThrottle, AuthUsernameThrottle, password_hashing_slot
+from .models import EquipmentDataset, ReportJob
+from .retention import delete_datasets, enforce_retention
+from .storage import default_storage, frame_statistics, get_statistics
+from .sqlite import write_transaction
 from .serializers import (
     UserSerializer, 
     EquipmentDatasetListSerializer,
     EquipmentDatasetDetailSerializer,
-    DatasetSummarySerializer
+    DatasetSummarySerializer,
+    StorageUsageSerializer,
+    ReportJobSerializer
 )
 
 
 class RegisterView(generics.CreateAPIView):
     """User registration endpoint."""
     queryset = User.objects.all()
+    authentication_classes = []
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [AuthIPThrottle, AuthUsernameThrottle]
     serializer_class = UserSerializer
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        with password_hashing_slot():
+            user = serializer.save()
         token, _ = Token.objects.get_or_create(user=user)
         return Response({
             'user': UserSerializer(user).data,
@@ -42,7 +53,9 @@ class RegisterView(generics.CreateAPIView):
 
 
 @api_view(['POST'])
+@authentication_classes([])  # a stale or expired token must not block logging in
 @permission_classes([permissions.AllowAny])
+@throttle_classes([AuthIPThrottle, AuthUsernameThrottle])
 def login_view(request):
     """User login endpoint."""
     from django.contrib.auth import authenticate
@@ -56,10 +69,11 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = authenticate(username=username, password=password)
+    with password_hashing_slot():
+        user = authenticate(username=username, password=password)
     
     if user:
-        token, _ = Token.objects.get_or_create(user=user)
+        token = get_token(user)
         return Response({
             'user': UserSerializer(user).data,
             'token': token.key
@@ -71,6 +85,13 @@ def login_view(request):
     )
 
 
+@api_view(['POST'])
+def logout_view(request):
+    """Revoke the caller's auth token."""
+    Token.objects.filter(user=request.user).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CSVUploadView(APIView):
     """Handle CSV file upload and parsing."""
     parser_classes = [MultiPartParser]
@@ -90,9 +111,18 @@ class CSVUploadView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # pandas is only loaded once a worker parses its first upload
+        from . import uploads
+        
+        metrics.UPLOAD_BYTES.observe(csv_file.size)
         try:
-            # Read CSV with pandas
-            df = pd.read_csv(csv_file)
+            # Reject files that cannot fit in the user's quota before parsing
+            usage = quotas.get_usage(request.user)
+            quotas.check(usage, nbytes=csv_file.size)
+            
+            # Read CSV in chunks, stopping as soon as the row quota is exceeded
+            with phase('parse'), metrics.UPLOAD_PHASE_SECONDS.time(phase='parse'):
+                df = uploads.read_csv(csv_file, usage)
             
             # Validate required columns
             required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
@@ -105,47 +135,48 @@ class CSVUploadView(APIView):
                 )
             
             # Calculate summary statistics
-            total_count = len(df)
-            avg_flowrate = round(df['Flowrate'].mean(), 2)
-            avg_pressure = round(df['Pressure'].mean(), 2)
-            avg_temperature = round(df['Temperature'].mean(), 2)
+            with phase('stats'):
+                total_count = len(df)
+                avg_flowrate = round(df['Flowrate'].mean(), 2)
+                avg_pressure = round(df['Pressure'].mean(), 2)
+                avg_temperature = round(df['Temperature'].mean(), 2)
+                statistics = frame_statistics(df)
             
-            # Create dataset
-            dataset = EquipmentDataset.objects.create(
-                user=request.user,
-                filename=csv_file.name,
-                total_count=total_count,
-                avg_flowrate=avg_flowrate,
-                avg_pressure=avg_pressure,
-                avg_temperature=avg_temperature
-            )
+            # Create dataset and store equipment readings; the quota reservation
+            # is rolled back together with the rows if anything fails
+            storage = default_storage()
+            with phase('store'), metrics.UPLOAD_PHASE_SECONDS.time(phase='store'), write_transaction():
+                quotas.reserve(usage, total_count, csv_file.size)
+                dataset = EquipmentDataset.objects.create(
+                    user=request.user,
+                    filename=csv_file.name,
+                    total_count=total_count,
+                    stored_bytes=csv_file.size,
+                    avg_flowrate=avg_flowrate,
+                    avg_pressure=avg_pressure,
+                    avg_temperature=avg_temperature,
+                    statistics=statistics,
+                    storage=storage.name
+                )
+                storage.write(dataset, df)
+            metrics.INGEST_ROWS.inc(total_count)
+            
+            # Enforce the per-user dataset retention limit
+            enforce_retention(request.user)
             
-            # Create equipment records
-            equipment_records = []
-            for _, row in df.iterrows():
-                equipment_records.append(Equipment(
-                    dataset=dataset,
-                    name=row['Equipment Name'],
-                    equipment_type=row['Type'],
-                    flowrate=row['Flowrate'],
-                    pressure=row['Pressure'],
-                    temperature=row['Temperature']
-                ))
-            Equipment.objects.bulk_create(equipment_records)
+            # Until the replica has caught up, this user reads from the primary
+            replicas.stick(request.user)
             
-            # Enforce 5 dataset limit per user
-            user_datasets = EquipmentDataset.objects.filter(user=request.user).order_by('-uploaded_at')
-            if user_datasets.count() > 5:
-                datasets_to_delete = user_datasets[5:]
-                for ds in datasets_to_delete:
-                    ds.delete()
+            with phase('serialize'):
+                data = EquipmentDatasetDetailSerializer(dataset).data
+            return Response(data, status=status.HTTP_201_CREATED)
             
+        except quotas.QuotaExceeded as e:
             return Response(
-                EquipmentDatasetDetailSerializer(dataset).data,
-                status=status.HTTP_201_CREATED
+                {'error': str(e)},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
-            
-        except pd.errors.EmptyDataError:
+        except uploads.EmptyDataError:
             return Response(
                 {'error': 'CSV file is empty'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -157,12 +188,19 @@ class CSVUploadView(APIView):
             )
 
 
+class StorageUsageView(APIView):
+    """Get the user's stored rows/bytes and quota limits."""
+    
+    def get(self, request):
+        return Response(StorageUsageSerializer(quotas.get_usage(request.user)).data)
+
+
 class DatasetListView(generics.ListAPIView):
-    """List user's datasets (last 5)."""
+    """List user's most recent datasets."""
     serializer_class = EquipmentDatasetListSerializer
     
     def get_queryset(self):
-        return EquipmentDataset.objects.filter(user=self.request.user)[:5]
+        return EquipmentDataset.objects.filter(user=self.request.user)[:settings.DATASET_RETENTION_LIMIT]
 
 
 class DatasetDetailView(generics.RetrieveDestroyAPIView):
@@ -171,12 +209,21 @@ class DatasetDetailView(generics.RetrieveDestroyAPIView):
     
     def get_queryset(self):
         return EquipmentDataset.objects.filter(user=self.request.user)
+    
+    def perform_destroy(self, instance):
+        # Hide the dataset immediately; rows are purged in the background
+        delete_datasets([instance.pk])
+        replicas.stick(self.request.user)
 
 
 class DatasetSummaryView(APIView):
     """Get detailed summary statistics for a dataset."""
     
     def get(self, request, pk):
+        with metrics.SUMMARY_SECONDS.time():
+            return self.summary(request, pk)
+    
+    def summary(self, request, pk):
         try:
             dataset = EquipmentDataset.objects.get(pk=pk, user=request.user)
         except EquipmentDataset.DoesNotExist:
@@ -185,181 +232,269 @@ class DatasetSummaryView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        equipment = dataset.equipment_items.all()
-        
-        # Type distribution
-        type_counts = equipment.values('equipment_type').annotate(count=Count('id'))
-        type_distribution = {item['equipment_type']: item['count'] for item in type_counts}
-        
-        # Min/Max values
-        if equipment.exists():
-            min_values = {
-                'flowrate': round(min(e.flowrate for e in equipment), 2),
-                'pressure': round(min(e.pressure for e in equipment), 2),
-                'temperature': round(min(e.temperature for e in equipment), 2)
-            }
-            max_values = {
-                'flowrate': round(max(e.flowrate for e in equipment), 2),
-                'pressure': round(max(e.pressure for e in equipment), 2),
-                'temperature': round(max(e.temperature for e in equipment), 2)
-            }
-        else:
-            min_values = max_values = {'flowrate': 0, 'pressure': 0, 'temperature': 0}
+        # Type distribution and min/max values
+        stats = get_statistics(dataset)
         
         summary = {
             'total_count': dataset.total_count,
             'avg_flowrate': dataset.avg_flowrate,
             'avg_pressure': dataset.avg_pressure,
             'avg_temperature': dataset.avg_temperature,
-            'type_distribution': type_distribution,
-            'min_values': min_values,
-            'max_values': max_values
+            'type_distribution': stats['type_distribution'],
+            'min_values': stats['min_values'],
+            'max_values': stats['max_values']
         }
         
         return Response(DatasetSummarySerializer(summary).data)
 
 
-class GeneratePDFReportView(APIView):
-    """Generate PDF report for a dataset."""
-    permission_classes = [permissions.AllowAny]  # We handle auth manually for query param support
+class DatasetChartView(APIView):
+    """Render a dataset chart as PNG or SVG from cached server-side drawings."""
     
-    def get(self, request, pk):
-        # Support auth token via query parameter (for direct browser downloads)
-        auth_token = request.GET.get('auth')
-        if auth_token:
-            from rest_framework.authtoken.models import Token
-            try:
-                token = Token.objects.get(key=auth_token)
-                user = token.user
-            except Token.DoesNotExist:
-                return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
-        elif request.user.is_authenticated:
-            user = request.user
-        else:
-            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    def get(self, request, pk, chart, fmt):
+        if chart not in charts.CHARTS:
+            return Response({'error': 'Chart not found'}, status=status.HTTP_404_NOT_FOUND)
+        if fmt not in charts.FORMATS:
+            return Response(
+                {'error': f'Format must be one of: {", ".join(charts.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
-            dataset = EquipmentDataset.objects.get(pk=pk, user=user)
+            dataset = EquipmentDataset.objects.get(pk=pk, user=request.user)
         except EquipmentDataset.DoesNotExist:
             return Response(
                 {'error': 'Dataset not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
-                                topMargin=72, bottomMargin=72)
+        try:
+            content = charts.render_chart(dataset, chart, fmt)
+        except charts.ChartRenderError as e:
+            return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
         
-        elements = []
-        styles = getSampleStyleSheet()
+        response = HttpResponse(content, content_type=charts.FORMATS[fmt])
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    """Render with the first renderer, leaving ``?format=`` to the view."""
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class DatasetExportView(APIView):
+    """Stream a dataset's rows as CSV, Parquet or XLSX (?format=)."""
+    content_negotiation_class = IgnoreFormatNegotiation
+    permission_classes = [permissions.AllowAny]  # Signed ?sig= links are checked in the view
+    
+    def get(self, request, pk):
+        user_id = downloads.request_user_id(request)
         
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=1
-        )
-        elements.append(Paragraph("Equipment Analysis Report", title_style))
-        elements.append(Spacer(1, 12))
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in exports.EXPORT_FORMATS:
+            return Response(
+                {'error': f'format must be one of: {", ".join(exports.EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Dataset info
-        info_style = styles['Normal']
-        elements.append(Paragraph(f"<b>File:</b> {dataset.filename}", info_style))
-        elements.append(Paragraph(f"<b>Uploaded:</b> {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}", info_style))
-        elements.append(Paragraph(f"<b>Total Equipment:</b> {dataset.total_count}", info_style))
-        elements.append(Spacer(1, 20))
+        try:
+            dataset = EquipmentDataset.objects.get(pk=pk, user_id=user_id)
+        except EquipmentDataset.DoesNotExist:
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        # Summary statistics
-        elements.append(Paragraph("Summary Statistics", styles['Heading2']))
-        elements.append(Spacer(1, 10))
+        try:
+            content = exports.stream_dataset(dataset, fmt)
+        except exports.ExportUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
         
-        summary_data = [
-            ['Metric', 'Average', 'Min', 'Max'],
-        ]
+        filename = f'{exports.filename_stem(dataset)}.{fmt}'
+        response = StreamingHttpResponse(content, content_type=exports.EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class GeneratePDFReportView(APIView):
+    """Generate PDF report for a dataset."""
+    permission_classes = [permissions.AllowAny]  # Signed ?sig= links are checked in the view
+    
+    def get(self, request, pk):
+        # Direct browser downloads carry a signed link instead of a header
+        user_id = downloads.request_user_id(request)
         
-        equipment = list(dataset.equipment_items.all())
-        if equipment:
-            flowrates = [e.flowrate for e in equipment]
-            pressures = [e.pressure for e in equipment]
-            temperatures = [e.temperature for e in equipment]
-            
-            summary_data.extend([
-                ['Flowrate', f'{dataset.avg_flowrate:.2f}', f'{min(flowrates):.2f}', f'{max(flowrates):.2f}'],
-                ['Pressure', f'{dataset.avg_pressure:.2f}', f'{min(pressures):.2f}', f'{max(pressures):.2f}'],
-                ['Temperature', f'{dataset.avg_temperature:.2f}', f'{min(temperatures):.2f}', f'{max(temperatures):.2f}']
-            ])
+        try:
+            dataset = EquipmentDataset.objects.get(pk=pk, user_id=user_id)
+        except EquipmentDataset.DoesNotExist:
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        listing = request.GET.get('listing', reports.LISTING_PREVIEW)
+        if listing not in reports.LISTINGS:
+            return Response(
+                {'error': f'listing must be one of: {", ".join(reports.LISTINGS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Near zero when the report is already cached on disk
+        with phase('render'):
+            path = reports.render_report(dataset, listing)
+        filename = f'equipment_report_{dataset.id}.pdf'
         
-        summary_table = Table(summary_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
-        ]))
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        # Let the front-end server stream the file when it is configured to
+        accel_prefix = settings.REPORT_X_ACCEL_REDIRECT_PREFIX
+        if accel_prefix:
+            response = HttpResponse(content_type='application/pdf')
+            response['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{path.name}"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
         
-        # Equipment type distribution
-        elements.append(Paragraph("Equipment Type Distribution", styles['Heading2']))
-        elements.append(Spacer(1, 10))
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename,
+                            content_type='application/pdf')
+
+
+class DownloadURLView(APIView):
+    """Issue a short-lived signed link to a dataset's report or export."""
+    
+    def post(self, request, pk):
+        if not EquipmentDataset.objects.filter(pk=pk, user=request.user).exists():
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        resource = request.data.get('resource', 'report')
+        if resource == 'report':
+            listing = request.data.get('listing') or reports.LISTING_PREVIEW
+            if listing not in reports.LISTINGS:
+                return Response(
+                    {'error': f'listing must be one of: {", ".join(reports.LISTINGS)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            path = reverse('dataset-report', args=[pk])
+            params = {'listing': listing if listing != reports.LISTING_PREVIEW else None}
+        elif resource == 'export':
+            fmt = request.data.get('format') or 'csv'
+            if not isinstance(fmt, str) or fmt not in exports.EXPORT_FORMATS:
+                return Response(
+                    {'error': f'format must be one of: {", ".join(exports.EXPORT_FORMATS)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            path = reverse('dataset-export', args=[pk])
+            params = {'format': fmt}
+        else:
+            return Response(
+                {'error': 'resource must be one of: report, export'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        type_counts = {}
-        for eq in equipment:
-            type_counts[eq.equipment_type] = type_counts.get(eq.equipment_type, 0) + 1
+        url = downloads.sign_url(request.user.pk, path, params)
+        return Response({
+            'url': request.build_absolute_uri(url),
+            'expires_in': settings.DOWNLOAD_URL_MAX_AGE,
+        })
+
+
+class ReportJobCreateView(APIView):
+    """Queue a PDF report render on the background worker pool."""
+    
+    def post(self, request, pk):
+        try:
+            dataset = EquipmentDataset.objects.get(pk=pk, user=request.user)
+        except EquipmentDataset.DoesNotExist:
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        type_data = [['Equipment Type', 'Count', 'Percentage']]
-        for eq_type, count in sorted(type_counts.items()):
-            percentage = (count / len(equipment) * 100) if equipment else 0
-            type_data.append([eq_type, str(count), f'{percentage:.1f}%'])
+        listing = request.data.get('listing') or request.GET.get('listing', reports.LISTING_PREVIEW)
+        if listing not in reports.LISTINGS:
+            return Response(
+                {'error': f'listing must be one of: {", ".join(reports.LISTINGS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        type_table = Table(type_data, colWidths=[2.5*inch, 1.2*inch, 1.2*inch])
-        type_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
-        ]))
-        elements.append(type_table)
-        elements.append(Spacer(1, 20))
+        # Through the dataset, so jobs found come with it attached for the serializer
+        jobs = dataset.report_jobs.filter(listing=listing)
+        if reports.report_path(dataset.pk, listing).exists():
+            # Hand back the finished job rather than adding a row per request
+            job = jobs.filter(status=ReportJob.DONE).first()
+            if job is None:
+                job = ReportJob.objects.create(dataset=dataset, listing=listing,
+                                               status=ReportJob.DONE, finished_at=timezone.now())
+        else:
+            job = jobs.filter(
+                status__in=[ReportJob.PENDING, ReportJob.RUNNING],
+                created_at__gte=timezone.now() - timedelta(seconds=settings.REPORT_JOB_REUSE_SECONDS),
+            ).first()
+            if job is None:
+                job = ReportJob.objects.create(dataset=dataset, listing=listing)
+                transaction.on_commit(lambda: tasks.submit(reports.run_report_job, job.pk))
         
-        # Equipment list
-        elements.append(Paragraph("Equipment List", styles['Heading2']))
-        elements.append(Spacer(1, 10))
+        return Response(
+            ReportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ReportJobDetailView(APIView):
+    """Poll a report job; redirects to the report once it is ready unless ?redirect=0."""
+    
+    def get(self, request, job_id):
+        try:
+            job = ReportJob.objects.select_related('dataset').get(
+                pk=job_id, dataset__user=request.user, dataset__deleted_at__isnull=True
+            )
+        except ReportJob.DoesNotExist:
+            return Response(
+                {'error': 'Report job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        eq_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']]
-        for eq in equipment[:50]:  # Limit to first 50 for PDF
-            eq_data.append([
-                eq.name, eq.equipment_type, 
-                f'{eq.flowrate:.1f}', f'{eq.pressure:.1f}', f'{eq.temperature:.1f}'
-            ])
+        if job.status == ReportJob.DONE and request.GET.get('redirect') != '0':
+            report_url = ReportJobSerializer(job).data['report_url']
+            return HttpResponseRedirect(report_url, status=status.HTTP_303_SEE_OTHER)
         
-        eq_table = Table(eq_data, colWidths=[1.4*inch, 1.2*inch, 0.9*inch, 0.9*inch, 1*inch])
-        eq_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
-        ]))
-        elements.append(eq_table)
+        return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+class ReportExportView(APIView):
+    """Admin-only ZIP export of many dataset reports, rendered in parallel."""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        listing = request.GET.get('listing', reports.LISTING_PREVIEW)
+        if listing not in reports.LISTINGS:
+            return Response(
+                {'error': f'listing must be one of: {", ".join(reports.LISTINGS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        doc.build(elements)
+        try:
+            dataset_ids = [int(pk) for pk in request.GET.getlist('dataset')]
+        except ValueError:
+            return Response({'error': 'dataset must be an integer id'}, status=status.HTTP_400_BAD_REQUEST)
         
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="equipment_report_{dataset.id}.pdf"'
+        datasets = list(exports.select_datasets(request.GET.getlist('user'), dataset_ids))
+        if not datasets:
+            return Response({'error': 'No datasets match the given filters'}, status=status.HTTP_404_NOT_FOUND)
         
+        filename = f"equipment_reports_{timezone.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        response = StreamingHttpResponse(exports.stream_report_zip(datasets, listing),
+                                         content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
+
+
+class MetricsView(APIView):
+    """Admin only: metrics of every worker in the Prometheus text format."""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return HttpResponse(metrics.REGISTRY.exposition(), content_type=metrics.CONTENT_TYPE)
@@ -2,8 +2,9 @@
 API Client for communicating with Django backend.
 """
 
+import time
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 
 
 class APIClient:
@@ -42,7 +43,12 @@ class APIClient:
         return data
     
     def logout(self):
-        """Clear authentication."""
+        """Revoke the auth token on the server and clear it locally."""
+        if self.token:
+            try:
+                requests.post(f"{self.base_url}/auth/logout/", headers=self._get_headers(), timeout=5)
+            except requests.RequestException:
+                pass
         self.token = None
     
     def is_authenticated(self) -> bool:
@@ -98,13 +104,42 @@ class APIClient:
         )
         response.raise_for_status()
     
-    def download_report(self, dataset_id: int, save_path: str):
-        """Download PDF report."""
-        response = requests.get(
-            f"{self.base_url}/datasets/{dataset_id}/report/",
+    def request_report(self, dataset_id: int) -> Dict[str, Any]:
+        """Queue a background PDF report render."""
+        response = requests.post(
+            f"{self.base_url}/datasets/{dataset_id}/report/jobs/",
             headers=self._get_headers()
         )
         response.raise_for_status()
+        return response.json()
+    
+    def download_report(self, dataset_id: int, save_path: str,
+                        poll_interval: float = 1.0, timeout: float = 300.0,
+                        progress: Optional[Callable[[str], None]] = None):
+        """
+        Download PDF report, waiting for the server to render it.
+        
+        Blocks while polling, so GUI code should call it from a worker thread
+        (see ``widgets.ReportDownloadWorker``); ``progress`` is called with the
+        job's status on every poll.
+        """
+        job = self.request_report(dataset_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            if progress:
+                progress(job["status"])
+            # The job URL redirects to the PDF once it is ready
+            response = requests.get(job["url"], headers=self._get_headers(), timeout=30)
+            response.raise_for_status()
+            if response.headers.get("Content-Type") == "application/pdf":
+                break
+            job = response.json()
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"] or "Report rendering failed")
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for the report")
+            time.sleep(poll_interval)
+        
         with open(save_path, 'wb') as f:
             f.write(response.content)
 
@@ -15,7 +15,7 @@ from PyQt5.QtGui import QFont
 from api_client import api_client
 from widgets import (
     LoginWidget, RegisterWidget, DataTableWidget, ChartWidget,
-    StatsWidget, get_stylesheet, COLORS
+    StatsWidget, ReportDownloadWorker, get_stylesheet, COLORS
 )
 
 
@@ -28,6 +28,7 @@ class MainWindow(QMainWindow):
         self.datasets = []
         self.selected_dataset = None
         self.summary = None
+        self.report_worker = None
         
         self.setWindowTitle("Chemical Equipment Visualizer")
         self.setMinimumSize(1200, 800)
@@ -313,7 +314,7 @@ class MainWindow(QMainWindow):
     
     def handle_download_pdf(self):
         """Handle PDF report download."""
-        if not self.selected_dataset:
+        if not self.selected_dataset or self.report_worker is not None:
             return
         
         save_path, _ = QFileDialog.getSaveFileName(
@@ -323,11 +324,38 @@ class MainWindow(QMainWindow):
         )
         
         if save_path:
-            try:
-                api_client.download_report(self.selected_dataset['id'], save_path)
-                QMessageBox.information(self, "Success", "PDF report saved!")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to download report: {e}")
+            # Rendering can take a while; poll on a worker so the window stays responsive
+            self.pdf_btn.setEnabled(False)
+            self.report_worker = ReportDownloadWorker(api_client, self.selected_dataset['id'], save_path, self)
+            self.report_worker.progress.connect(
+                lambda job_status: self.statusBar().showMessage(f"Report {job_status}...")
+            )
+            self.report_worker.succeeded.connect(self.handle_report_saved)
+            self.report_worker.failed.connect(self.handle_report_failed)
+            self.report_worker.finished.connect(self.handle_report_finished)
+            self.report_worker.start()
+    
+    def handle_report_saved(self):
+        """Handle a finished report download."""
+        QMessageBox.information(self, "Success", "PDF report saved!")
+    
+    def handle_report_failed(self, error: str):
+        """Handle a failed report download."""
+        QMessageBox.warning(self, "Error", f"Failed to download report: {error}")
+    
+    def handle_report_finished(self):
+        """Re-enable the report button once the download worker stops."""
+        self.statusBar().clearMessage()
+        self.pdf_btn.setEnabled(self.selected_dataset is not None)
+        self.report_worker.deleteLater()
+        self.report_worker = None
+    
+    def closeEvent(self, event):
+        # A running QThread must not be destroyed with the window
+        if self.report_worker is not None:
+            self.report_worker.requestInterruption()
+            self.report_worker.wait()
+        super().closeEvent(event)
     
     def handle_delete(self):
         """Handle dataset deletion."""
@@ -8,7 +8,7 @@ from PyQt5.QtWidgets import (
     QListWidget, QListWidgetItem, QMessageBox, QFrame, QSplitter,
     QGroupBox, QFormLayout, QHeaderView, QSizePolicy
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -150,6 +150,35 @@ def get_stylesheet():
     """
 
 
+class ReportDownloadWorker(QThread):
+    """Downloads a PDF report off the UI thread while the server renders it."""
+    
+    progress = pyqtSignal(str)
+    succeeded = pyqtSignal()
+    failed = pyqtSignal(str)
+    
+    def __init__(self, api_client, dataset_id: int, save_path: str, parent=None):
+        super().__init__(parent)
+        self.api = api_client
+        self.dataset_id = dataset_id
+        self.save_path = save_path
+    
+    def run(self):
+        try:
+            self.api.download_report(self.dataset_id, self.save_path, progress=self.report_progress)
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.failed.emit(str(e))
+        else:
+            self.succeeded.emit()
+    
+    def report_progress(self, job_status: str):
+        # Called between polls, so an interruption stops the download within one poll interval
+        if self.isInterruptionRequested():
+            raise InterruptedError("Report download cancelled")
+        self.progress.emit(job_status)
+
+
 class LoginWidget(QWidget):
     """Login form widget."""
     
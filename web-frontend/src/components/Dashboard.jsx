@@ -70,7 +70,7 @@ export default function Dashboard({ user, onLogout }) {
     const handleDownloadPDF = async () => {
         if (!selectedDataset) return;
         try {
-            const reportUrl = datasetService.getReportUrl(selectedDataset.id);
+            const reportUrl = await datasetService.requestReport(selectedDataset.id);
             const response = await fetch(reportUrl);
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
@@ -26,7 +26,7 @@ export default function DatasetHistory({ datasets, selectedId, onSelect, onDelet
     const handleDownloadPDF = async (e, id) => {
         e.stopPropagation();
         try {
-            const reportUrl = datasetService.getReportUrl(id);
+            const reportUrl = await datasetService.requestReport(id);
             const response = await fetch(reportUrl);
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
@@ -44,8 +44,14 @@ export const authService = {
     },
 
     logout: () => {
+        const token = localStorage.getItem('token');
         localStorage.removeItem('token');
         localStorage.removeItem('user');
+        // Revoke the token server-side; the local session is gone either way
+        if (token) {
+            api.post('/auth/logout/', null, { headers: { Authorization: `Token ${token}` } })
+                .catch(() => {});
+        }
     },
 
     isAuthenticated: () => {
@@ -92,9 +98,24 @@ export const datasetService = {
         await api.delete(`/datasets/${id}/`);
     },
 
-    getReportUrl: (id) => {
-        const token = localStorage.getItem('token');
-        return `${API_URL}/datasets/${id}/report/?auth=${token}`;
+    // Queue a background render and resolve with the report URL once it is ready;
+    // rejects if rendering fails or takes longer than maxWait milliseconds
+    requestReport: async (id, pollInterval = 1000, maxWait = 300000) => {
+        const deadline = Date.now() + maxWait;
+        const response = await api.post(`/datasets/${id}/report/jobs/`);
+        let job = response.data;
+        while (job.status !== 'done') {
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Report rendering failed');
+            }
+            if (Date.now() >= deadline) {
+                throw new Error('Timed out waiting for the report');
+            }
+            await new Promise((resolve) => setTimeout(resolve, pollInterval));
+            const poll = await api.get(job.url, { params: { redirect: 0 } });
+            job = poll.data;
+        }
+        return job.report_url;
     }
 };
 